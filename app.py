@@ -1,14 +1,45 @@
 ﻿"""app.py - Application Flask (vues HTML + APIs : auth, recherche, reco, listes, séries)."""
+import hmac
 import os
 import sqlite3
-from typing import Dict, Optional, Tuple
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
 
-import numpy as np
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, g, render_template, request, redirect, url_for, session, flash, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
  
-from recommend import recommend_by_content, recommend_for_user, warm_recommendation_model
-from search import SearchEngine
+from catalog import catalog_version
+from corpus import Corpus, load_corpus
+from db import connection, get_pool, pool_stats
+from ratings import average_rating, ensure_ratings_tables, set_rating
+from recommend import (
+    NEIGHBOURS_DIR,
+    ContentModel,
+    build_content_model,
+    build_neighbour_table,
+    content_model,
+    get_user_recommendations,
+    has_neighbour_table,
+    install_content_model,
+    model_lock,
+    neighbours_catalog_version,
+    recommend_by_content,
+    reload_neighbour_table,
+    schedule_user_refresh,
+    update_content_model,
+    warm_recommendation_model,
+)
+from search import INDEX_DIR, SearchEngine, index_catalog_version
+from search_cache import SearchCache
+from series_meta import SeriesMeta
+from series_pages import MAX_PAGE_SIZE, SeriesPages, available_encodings, parse_fields
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus (voir _persist_lock)
+    fcntl = None
 
 app = Flask(__name__)
 app.secret_key = "ton_secret_key"
@@ -16,50 +47,247 @@ app.secret_key = "ton_secret_key"
 DB_PATH = os.path.join(app.root_path, "database", "tvshow.db")
 
 
-# get_db_connection : ouvre une connexion SQLite (row_factory configurée)
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+# get_db_connection : connexion SQLite de la requête en cours (pool db.py),
+# empruntée à la première utilisation et rendue en fin de requête ;
+# readonly=True pour les lectures (connexion en lecture seule)
+def get_db_connection(readonly: bool = False) -> sqlite3.Connection:
+    key = "db_readonly" if readonly else "db"
+    conn = g.get(key)
+    if conn is None:
+        conn = get_pool(DB_PATH, readonly=readonly).acquire()
+        setattr(g, key, conn)
     return conn
 
 
+@app.teardown_appcontext
+# Nom : release_db_connections
+# But : rendre au pool les connexions empruntées pendant la requête
+def release_db_connections(exc):
+    for key, readonly in (("db", False), ("db_readonly", True)):
+        conn = g.pop(key, None)
+        if conn is not None:
+            get_pool(DB_PATH, readonly=readonly).release(conn)
+
+
 search_engine: Optional[SearchEngine] = None
-series_meta_by_name: Dict[str, Tuple[int, Optional[str], Optional[str]]] = {}
-series_meta_by_id: Dict[int, Tuple[str, Optional[str], Optional[str]]] = {}
+# Génération des modèles servis (moteur de recherche + modèle contenu) :
+# incrémentée à chaque remplacement, renvoyée dans l'en-tête X-Index-Generation.
+index_generation = 0
+# Sérialise les remplacements ; les requêtes lisent les références sans verrou.
+# Verrou du modèle contenu (recommend.py) : reconstructions complètes et mises à
+# jour incrémentales (update_content_model) ne s'intercalent jamais.
+_swap_lock = model_lock
+# Cache des réponses /api/search ; SEARCH_CACHE_DB active le niveau SQLite partagé entre workers.
+search_cache = SearchCache(
+    max_entries=1024, ttl=300.0, shared_db_path=os.environ.get("SEARCH_CACHE_DB"), logger=app.logger
+)
+# Métadonnées des séries (par id et par nom), remplacées d'un bloc au rechargement.
+series_meta: Optional[SeriesMeta] = None
+# Pages pré-rendues de /api/series, liées à l'objet series_meta qui les a produites.
+series_pages: Optional[SeriesPages] = None
 
 # init_search : instancie le moteur TF-IDF en mémoire
-def init_search(force: bool = False) -> None:
-    global search_engine
+# (index persistant en mmap si présent, sinon reconstruction depuis la base
+#  ou depuis `corpus` s'il est fourni ; force=True reconstruit toujours)
+def init_search(force: bool = False, corpus: Optional[Corpus] = None) -> None:
     if search_engine is not None and not force:
         return
-    series_counts = SearchEngine.load_series_counts_from_db()
-    search_engine = SearchEngine(series_counts)
-
+    engine = None if force else SearchEngine.load_index()
+    if engine is None:
+        engine = SearchEngine.from_corpus(corpus) if corpus is not None else SearchEngine.from_db()
+    _install_models(engine)
+
+
+# _install_models : remplace d'un coup le moteur servi et, si `content` est
+# fourni (modèle, relire la table de voisins), le modèle contenu, puis passe
+# à la génération suivante
+def _install_models(
+    engine: SearchEngine, content: Optional[Tuple[Optional[ContentModel], bool]] = None
+) -> None:
+    global search_engine, index_generation
+    with _swap_lock:
+        if content is not None:
+            model, reload_neighbours = content
+            install_content_model(model, reload_neighbours=reload_neighbours)
+        search_engine = engine
+        index_generation += 1
+    search_cache.clear()
+
+
+# load_series_meta : met en cache les métadonnées des séries (une requête sur
+# tvshow) ; les APIs de recherche et de recommandation n'interrogent plus la base
+def load_series_meta(force: bool = False) -> SeriesMeta:
+    global series_meta
+    meta = series_meta
+    if meta is not None and not force:
+        return meta
+
+    with connection(DB_PATH, readonly=True) as conn:
+        meta = SeriesMeta.from_db(conn)
+    series_meta = meta
+    # Les réponses en cache embarquent image et synopsis.
+    search_cache.clear()
+    return meta
+
+
+# warm_models : prépare le moteur de recherche et le modèle de recommandation
+# avant la première requête. Le corpus (tout tvshow_term) n'est lu que si un
+# index persistant manque : moteur sans index mmap, ou modèle contenu sans table
+# de voisins valide ; il sert alors aux deux, puis est libéré. Avec les deux index,
+# le modèle contenu (calcul en direct, profils utilisateur) est construit dans un
+# thread en arrière-plan : le démarrage reste rapide et aucune requête ne paie la
+# construction (une requête qui en a besoin attend au plus la fin du thread, via
+# model_lock).
+def warm_models(force: bool = False) -> None:
+    engine = search_engine if not force else None
+    if engine is None and not force:
+        engine = SearchEngine.load_index()
+    needs_content_model = force or not has_neighbour_table()
+    corpus = load_corpus(DB_PATH) if engine is None or needs_content_model else None
+    if engine is None:
+        engine = SearchEngine.from_corpus(corpus)
+    if engine is not search_engine:
+        _install_models(engine)
+    if needs_content_model:
+        warm_recommendation_model(force=force, corpus=corpus)
+    elif content_model() is None:
+        threading.Thread(target=warm_recommendation_model, name="content-model-warmup", daemon=True).start()
+    del corpus
+    load_series_meta(force=force)
+
+
+# Journal WAL dès le démarrage (réglé à l'ouverture de la première connexion
+# en écriture) : les lectures ne bloquent plus les écritures, et inversement.
+with connection(DB_PATH):
+    pass
+
+# Pre-warm search and recommendation models to avoid first-request latency
+warm_models()
 
 
-# load_series_meta : met en cache les métadonnées des séries
-def load_series_meta(force: bool = False) -> Dict[str, Tuple[int, Optional[str], Optional[str]]]:
-    global series_meta_by_name, series_meta_by_id
-    if series_meta_by_name and not force:
-        return series_meta_by_name
-
-    conn = get_db_connection()
+# -----------------------------
+# --- RECONSTRUCTION EN ARRIÈRE-PLAN ---
+# -----------------------------
+# Délai (s) entre deux lectures de catalog_version au fil des requêtes (0 : jamais).
+CATALOG_POLL_SECONDS = float(os.environ.get("CATALOG_POLL_SECONDS", "30"))
+# Jeton de /api/admin/rebuild (en-tête X-Admin-Token) ; sans jeton, accès local uniquement.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+# Verrou (fichier) des écritures de INDEX_DIR / NEIGHBOURS_DIR, partagés par tous les workers.
+PERSIST_LOCK_PATH = os.path.join(app.root_path, "database", ".persist.lock")
+
+_rebuild_lock = threading.Lock()
+_rebuild_pending = False
+_last_catalog_check = 0.0
+rebuild_status: Dict[str, Any] = {
+    "running": False,
+    "completed": 0,
+    "last_duration": None,
+    "last_error": None,
+}
+
+
+# rebuild_models : reconstruit moteur de recherche et modèle contenu hors du
+# chemin des requêtes, puis les échange (les requêtes en cours gardent l'ancien)
+def rebuild_models() -> None:
+    corpus = load_corpus(DB_PATH)
+    engine = SearchEngine.from_corpus(corpus)
+    model = build_content_model(corpus)
+    del corpus
+
+    # Échange d'abord : une erreur d'écriture sur disque ne bloque pas les nouveaux modèles.
+    # La table de voisins est relue, et ignorée tant qu'elle date d'un autre catalogue.
+    _install_models(engine, (model, True))
+    load_series_meta(force=True)
+    _persist_models(engine, model)
+
+
+# _persist_lock : un seul processus à la fois réécrit les index persistants
+# (fcntl absent : pas de verrou, le contrôle de version limite les doublons)
+@contextmanager
+def _persist_lock() -> Iterator[None]:
+    if fcntl is None:
+        yield
+        return
+    with open(PERSIST_LOCK_PATH, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# _persist_models : réécrit les index persistants déjà en place pour le prochain
+# démarrage, sauf si un autre worker l'a déjà fait pour cette version du catalogue ;
+# les erreurs sont seulement tracées (les modèles en mémoire sont déjà servis)
+def _persist_models(engine: SearchEngine, model: Optional[ContentModel]) -> None:
     try:
-        rows = conn.execute("SELECT id, name, image_url, synopsis FROM tvshow").fetchall()
-        series_meta_by_name = {}
-        series_meta_by_id = {}
-        for row in rows:
-            info_name = (row["id"], row["image_url"], row["synopsis"])
-            info_id = (row["name"], row["image_url"], row["synopsis"])
-            series_meta_by_name[row["name"]] = info_name
-            series_meta_by_id[row["id"]] = info_id
-    finally:
-        conn.close()
-    return series_meta_by_name
+        with _persist_lock():
+            if os.path.isdir(INDEX_DIR) and index_catalog_version() != engine.catalog_version:
+                engine.save_index()
+            if (
+                model is not None
+                and os.path.isdir(NEIGHBOURS_DIR)
+                and neighbours_catalog_version() != model.catalog_version
+            ):
+                build_neighbour_table(model=model)
+    except Exception as exc:  # pragma: no cover - simple trace
+        print("Erreur écriture des index persistants:", exc)
+    reload_neighbour_table()
+
+
+def _rebuild_worker() -> None:
+    global _rebuild_pending
+    while True:
+        with _rebuild_lock:
+            if not _rebuild_pending:
+                rebuild_status["running"] = False
+                return
+            # Les demandes arrivées pendant un calcul sont regroupées en un seul suivant.
+            _rebuild_pending = False
+        start = time.perf_counter()
+        try:
+            rebuild_models()
+            rebuild_status["last_error"] = None
+        except Exception as exc:  # pragma: no cover - simple trace
+            print("Erreur reconstruction des modèles:", exc)
+            rebuild_status["last_error"] = str(exc)
+        rebuild_status["completed"] += 1
+        rebuild_status["last_duration"] = round(time.perf_counter() - start, 3)
+
+
+# schedule_rebuild : demande une reconstruction en arrière-plan (un seul thread à la fois)
+def schedule_rebuild() -> None:
+    global _rebuild_pending
+    with _rebuild_lock:
+        _rebuild_pending = True
+        if rebuild_status["running"]:
+            return
+        rebuild_status["running"] = True
+    threading.Thread(target=_rebuild_worker, name="models-rebuild", daemon=True).start()
+
+
+@app.before_request
+# Nom : check_catalog_version
+# But : relancer la reconstruction quand un import a modifié le catalogue
+def check_catalog_version():
+    global _last_catalog_check
+    now = time.monotonic()
+    if CATALOG_POLL_SECONDS <= 0 or now - _last_catalog_check < CATALOG_POLL_SECONDS:
+        return
+    _last_catalog_check = now
+    engine = search_engine
+    if engine is None:
+        return
+    if catalog_version(get_db_connection(readonly=True)) != engine.catalog_version:
+        schedule_rebuild()
 
 
-# Pre-warm recommendation model to avoid first-request latency
-warm_recommendation_model()
+@app.after_request
+# Nom : add_index_generation
+# But : indiquer la génération des modèles servis dans chaque réponse
+def add_index_generation(response):
+    response.headers["X-Index-Generation"] = str(index_generation)
+    return response
 
 
 # -----------------------------
@@ -91,11 +319,10 @@ def forgot_password():
             flash("Indique ton email.", "error")
             return redirect(url_for("forgot_password"))
 
-        conn = get_db_connection()
+        conn = get_db_connection(readonly=True)
         user = conn.execute(
             "SELECT username FROM user WHERE email = ?", (email,)
         ).fetchone()
-        conn.close()
 
         if user:
             session["reset_user"] = user["username"]
@@ -131,7 +358,6 @@ def reset_password_simple():
             (hashed_password, session["reset_user"]),
         )
         conn.commit()
-        conn.close()
 
         session.pop("reset_user", None)
         flash("Mot de passe réinitialisé avec succès.", "success")
@@ -174,7 +400,7 @@ def index():
 # Nom : series_detail
 # But : afficher la fiche HTML (notes, liste, similaires)
 def series_detail(series_id: int):
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     serie = conn.execute("SELECT * FROM tvshow WHERE id = ?", (series_id,)).fetchone()
 
     user_rating = None
@@ -182,17 +408,12 @@ def series_detail(series_id: int):
     avg_rating = None
 
     if serie:
-        avg_row = conn.execute(
-            "SELECT AVG(rating) AS avg_rating FROM ratings WHERE tvshow_name = ?",
-            (serie["name"],),
-        ).fetchone()
-        if avg_row and avg_row["avg_rating"]:
-            avg_rating = round(avg_row["avg_rating"], 1)
+        avg_rating = average_rating(conn, serie["id"])
 
         if "user" in session:
             user_rating_row = conn.execute(
-                "SELECT rating FROM ratings WHERE username = ? AND tvshow_name = ?",
-                (session["user"], serie["name"]),
+                "SELECT rating FROM ratings WHERE username = ? AND tvshow_id = ?",
+                (session["user"], serie["id"]),
             ).fetchone()
             if user_rating_row:
                 user_rating = user_rating_row["rating"]
@@ -203,8 +424,6 @@ def series_detail(series_id: int):
             ).fetchone()
             in_list = bool(in_list_row)
 
-    conn.close()
-
     if not serie:
         flash("Serie introuvable.")
         return redirect(url_for("index"))
@@ -221,6 +440,27 @@ def series_detail(series_id: int):
 # -----------------------------
 # --- API RECHERCHE (TF-IDF) ---
 # -----------------------------
+# _search_payload : enrichit un classement (nom, score) avec les métadonnées des séries
+def _search_payload(ranked, series_meta: SeriesMeta, limit: int = 10):
+    payload = []
+    for name, score in ranked:
+        record = series_meta.by_name.get(name)
+        if record is None:
+            continue
+        payload.append(
+            {
+                "name": name,
+                "image_url": record.image_url,
+                "id": record.id,
+                "synopsis": record.synopsis or "",
+                "score": round(min(score, 1.0), 3),
+            }
+        )
+        if len(payload) >= limit:
+            break
+    return payload
+
+
 @app.route("/api/search")
 # Nom : api_search
 # But : chercher des séries par mots-clés (TF-IDF)
@@ -231,62 +471,129 @@ def api_search():
 
     init_search()
     series_meta = load_series_meta()
+    # Une seule lecture de la référence : une reconstruction peut l'échanger entre-temps.
+    engine = search_engine
 
-    if search_engine is None or not series_meta:
+    if engine is None or not series_meta:
         return jsonify({"query": query, "count": 0, "results": []})
 
     query_counts = SearchEngine._query_to_counts(query)
-    query_tokens = list(query_counts.keys())
-    if not query_tokens:
+    if not query_counts:
         return jsonify({"query": query, "count": 0, "results": []})
 
-    keyword_scores = search_engine.keyword_scores(query_tokens)
-    if not keyword_scores:
-        return jsonify({"query": query, "count": 0, "results": []})
+    cache_key = SearchCache.key_for(query_counts)
+    # Les réponses embarquent image et synopsis : la version du catalogue des
+    # métadonnées fait partie de la version de l'entrée (niveau partagé compris).
+    cache_version = f"{engine.version}:{series_meta.catalog_version}"
+    payload = search_cache.get(cache_key, cache_version)
+    if payload is None:
+        # Index inverse : seules les séries contenant tous les termes sont scorées.
+        payload = _search_payload(engine.rank_query(query_counts), series_meta)
+        search_cache.put(cache_key, cache_version, payload)
+    return jsonify({"query": query, "count": len(payload), "results": payload})
+
+
+@app.route("/api/search/cache")
+# Nom : api_search_cache_stats
+# But : compteurs du cache de recherche (hits, misses, évictions...)
+def api_search_cache_stats():
+    return jsonify(search_cache.stats())
+
 
-    token_indices = search_engine.get_token_indices(query_tokens)
-    tfidf_scores: Dict[str, float] = {}
-    if token_indices and len(token_indices) == len(query_tokens):
-        q_vector = search_engine.vectorize_query(query)
-        sims = (q_vector @ search_engine._X.T).toarray().ravel()
-        coverage_mask = search_engine._X[:, token_indices].getnnz(axis=1) == len(token_indices)
-        candidate_indices = np.where(coverage_mask)[0]
+MAX_BATCH_QUERIES = 5000
 
-        series_names = search_engine.series_names
-        for idx in candidate_indices:
-            name = series_names[idx]
-            if name in keyword_scores:
-                tfidf_scores[name] = float(sims[idx])
+
+@app.route("/api/search/batch", methods=["POST"])
+# Nom : api_search_batch
+# But : rejouer un lot de requêtes en un seul passage (même classement que /api/search)
+def api_search_batch():
+    data = request.get_json() or {}
+    queries = data.get("queries")
+    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+        return jsonify({"error": "Liste de requetes attendue."}), 400
+    if len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({"error": f"Maximum {MAX_BATCH_QUERIES} requetes par lot."}), 400
+
+    try:
+        top_n = int(data.get("top_n", 10))
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_n invalide."}), 400
+
+    init_search()
+    series_meta = load_series_meta()
+    engine = search_engine
+    queries = [q.strip() for q in queries]
+    if engine is None or not series_meta:
+        ranked_lists = [[] for _ in queries]
+    else:
+        ranked_lists = engine.search_many(queries, top_n=top_n)
 
     results = []
-    for name, kw_score in keyword_scores.items():
-        tf_score = tfidf_scores.get(name)
-        if tf_score is None:
-            continue
+    for query, ranked in zip(queries, ranked_lists):
+        payload = _search_payload(ranked, series_meta, limit=top_n)
+        results.append({"query": query, "count": len(payload), "results": payload})
+    return jsonify({"count": len(results), "results": results})
 
-        combined_score = 0.7 * tf_score + 0.3 * kw_score
-        if combined_score < 0.25:
-            continue
 
-        meta = series_meta.get(name)
-        if not meta:
-            continue
-        serie_id, image_url, synopsis = meta
-        results.append((combined_score, name, image_url, serie_id, synopsis))
+# _is_admin_request : jeton ADMIN_TOKEN s'il est défini, sinon requête locale
+def _is_admin_request() -> bool:
+    if ADMIN_TOKEN:
+        return hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN)
+    return request.remote_addr in ("127.0.0.1", "::1")
 
-    results.sort(key=lambda item: item[0], reverse=True)
-    payload = [
-        {
-            "name": name,
-            "image_url": image_url,
-            "id": serie_id,
-            "synopsis": synopsis or "",
-            "score": round(min(score, 1.0), 3),
-        }
-        for score, name, image_url, serie_id, synopsis in results[:10]
-    ]
 
-    return jsonify({"query": query, "count": len(payload), "results": payload})
+@app.route("/api/admin/rebuild", methods=["GET", "POST"])
+# Nom : api_admin_rebuild
+# But : lancer (POST) ou suivre (GET) la reconstruction des modèles en arrière-plan
+def api_admin_rebuild():
+    if not _is_admin_request():
+        return jsonify({"error": "Acces refuse."}), 403
+    if request.method == "POST":
+        schedule_rebuild()
+    engine = search_engine
+    payload = dict(rebuild_status)
+    payload["generation"] = index_generation
+    payload["catalog_version"] = engine.catalog_version if engine is not None else None
+    return jsonify(payload), 202 if request.method == "POST" else 200
+
+
+# Nombre maximal de séries par mise à jour incrémentale (au-delà : /api/admin/rebuild).
+MAX_CONTENT_UPDATE_IDS = 500
+
+
+@app.route("/api/admin/content-update", methods=["POST"])
+# Nom : api_admin_content_update
+# But : recalculer le modèle contenu pour quelques séries (ex. synopsis modifiés
+# par fetch_tvmaze_metadata.py) sans reconstruction complète
+def api_admin_content_update():
+    global index_generation
+    if not _is_admin_request():
+        return jsonify({"error": "Acces refuse."}), 403
+    data = request.get_json(silent=True) or {}
+    show_ids = data.get("show_ids")
+    if not isinstance(show_ids, list) or not all(
+        isinstance(show_id, int) and not isinstance(show_id, bool) for show_id in show_ids
+    ):
+        return jsonify({"error": "Liste d'identifiants de series attendue (show_ids)."}), 400
+    if len(show_ids) > MAX_CONTENT_UPDATE_IDS:
+        return jsonify({"error": f"Maximum {MAX_CONTENT_UPDATE_IDS} series ; utiliser /api/admin/rebuild."}), 400
+
+    if show_ids:
+        with _swap_lock:
+            update_content_model(show_ids)
+            index_generation += 1
+        # Images et synopsis servis avec les résultats.
+        load_series_meta(force=True)
+    return jsonify({"updated": len(set(show_ids)), "generation": index_generation})
+
+
+@app.route("/api/admin/db")
+# Nom : api_admin_db
+# But : compteurs des pools de connexions SQLite (ouvertures, réutilisations, en cours)
+def api_admin_db():
+    if not _is_admin_request():
+        return jsonify({"error": "Acces refuse."}), 403
+    return jsonify({"pools": pool_stats()})
 
 # -----------------------------
 # --- API RECOMMANDATION ---
@@ -299,17 +606,14 @@ def api_similar(series_id: int):
     Retourne les séries similaires à une série donnée.
     Basé sur la similarité TF-IDF des synopsis.
     """
-    # Charger les métadonnées de la série actuelle
-    conn = get_db_connection()
-    serie = conn.execute(
-        "SELECT id, name, image_url, synopsis FROM tvshow WHERE id = ?", (series_id,)
-    ).fetchone()
-    conn.close()
+    # Métadonnées en mémoire : aucune requête SQL
+    series_meta = load_series_meta()
+    serie = series_meta.get(series_id)
 
     if not serie:
         return jsonify({"results": []})
 
-    current_name = serie["name"]
+    current_name = serie.name
 
     # Appeler le moteur de recommandation par contenu
     try:
@@ -318,33 +622,20 @@ def api_similar(series_id: int):
         print("Erreur reco contenu:", e)
         return jsonify({"results": []})
 
-    # Charger les infos des séries similaires depuis la base
-    similar_names = [name for name, _ in similar_series]
-    if not similar_names:
+    if not similar_series:
         return jsonify({"results": []})
 
-    conn = get_db_connection()
-    placeholders = ",".join("?" for _ in similar_names)
-    rows = conn.execute(
-        f"SELECT id, name, image_url, synopsis FROM tvshow WHERE name IN ({placeholders})",
-        similar_names,
-    ).fetchall()
-    conn.close()
-
-    # Créer une table de correspondance nom → meta
-    meta = {row["name"]: row for row in rows}
-
     # Construire la réponse dans le même ordre que les similarités
     results = []
     for name, score in similar_series:
-        if name not in meta:
+        s = series_meta.find(name)
+        if s is None:
             continue
-        s = meta[name]
         results.append({
-            "id": s["id"],
-            "name": s["name"],
-            "image_url": s["image_url"],
-            "synopsis": s["synopsis"] or "",
+            "id": s.id,
+            "name": s.name,
+            "image_url": s.image_url,
+            "synopsis": s.synopsis or "",
             "score": round(score, 3),
         })
 
@@ -361,56 +652,42 @@ def api_similar(series_id: int):
 # -----------------------------
 @app.route("/api/rate", methods=["POST"])
 # Nom : api_rate
-# But : enregistrer une note (1-5) pour une série
+# But : enregistrer une note (1-5) pour une série (serie_id, ou serie_name)
 def api_rate():
     if "user" not in session:
         return jsonify({"success": False, "error": "Vous devez etre connecte pour noter une serie."})
 
     data = request.get_json() or {}
+    serie_id = data.get("serie_id")
     serie_name = data.get("serie_name")
     rating = data.get("rating")
     username = session["user"]
 
-    if not serie_name or rating is None:
+    if (not serie_id and not serie_name) or rating is None:
         return jsonify({"success": False, "error": "Donnees manquantes."})
 
     try:
         rating = int(rating)
         if rating < 1 or rating > 5:
             raise ValueError
-    except ValueError:
+    except (TypeError, ValueError):
         return jsonify({"success": False, "error": "Note invalide."})
 
+    meta = load_series_meta()
+    try:
+        record = meta.get(int(serie_id)) if serie_id else meta.find(serie_name)
+    except (TypeError, ValueError):
+        record = None
+    if record is None:
+        return jsonify({"success": False, "error": "Serie introuvable."})
+
     conn = get_db_connection()
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS ratings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            tvshow_name TEXT NOT NULL,
-            rating INTEGER NOT NULL,
-            UNIQUE(username, tvshow_name)
-        )
-        """
-    )
-    conn.execute(
-        """
-        CREATE UNIQUE INDEX IF NOT EXISTS idx_ratings_user_show
-        ON ratings(username, tvshow_name)
-        """
-    )
-    conn.execute(
-        """
-        INSERT INTO ratings (username, tvshow_name, rating)
-        VALUES (?, ?, ?)
-        ON CONFLICT(username, tvshow_name)
-        DO UPDATE SET rating = excluded.rating
-        """,
-        (username, serie_name, rating),
-    )
-    conn.commit()
-    conn.close()
+    ensure_ratings_tables(conn)
+    # Note et agrégats (rating_stats) dans la même transaction.
+    set_rating(conn, username, record.id, rating)
 
+    # Recos perso précalculées : recalcul en arrière-plan pour cet utilisateur.
+    schedule_user_refresh(username)
     return jsonify({"success": True})
 
 
@@ -459,7 +736,6 @@ def api_toggle_list():
         action = "added"
 
     conn.commit()
-    conn.close()
     return jsonify({"success": True, "action": action})
 
 
@@ -468,25 +744,19 @@ def api_toggle_list():
 # But : recommandations par contenu à partir du nom
 def api_recommend_content(serie_name: str):
     recos = recommend_by_content(serie_name, top_n=5)
-    conn = get_db_connection()
+    series_meta = load_series_meta()
     enriched = []
-    try:
-        for name, score in recos:
-            row = conn.execute(
-                "SELECT id, name, image_url FROM tvshow WHERE lower(name) = ? LIMIT 1",
-                (str(name).lower(),),
-            ).fetchone()
-            if row:
-                enriched.append(
-                    {
-                        "id": row["id"],
-                        "name": row["name"],
-                        "image_url": row["image_url"],
-                        "score": float(score),
-                    }
-                )
-    finally:
-        conn.close()
+    for name, score in recos:
+        record = series_meta.find(name)
+        if record:
+            enriched.append(
+                {
+                    "id": record.id,
+                    "name": record.name,
+                    "image_url": record.image_url,
+                    "score": float(score),
+                }
+            )
     return jsonify({"serie": serie_name, "recommendations": enriched})
 
 
@@ -497,57 +767,82 @@ def api_recommend_user():
     if "user" not in session:
         return jsonify({"error": "Connectez-vous pour voir vos recommandations."})
 
-    recos = recommend_for_user(session["user"], top_n=10)
-    conn = get_db_connection()
+    recos = get_user_recommendations(session["user"], top_n=10)
+    series_meta = load_series_meta()
     enriched = []
-    try:
-        for name, score in recos:
-            row = conn.execute(
-                "SELECT id, name, image_url, synopsis FROM tvshow WHERE lower(name) = ? LIMIT 1",
-                (str(name).lower(),),
-            ).fetchone()
-            if row:
-                enriched.append(
-                    {
-                        "id": row["id"],
-                        "name": row["name"],
-                        "image_url": row["image_url"],
-                        "synopsis": row["synopsis"] or "",
-                        "score": float(score),
-                    }
-                )
-    finally:
-        conn.close()
+    for name, score in recos:
+        record = series_meta.find(name)
+        if record:
+            enriched.append(
+                {
+                    "id": record.id,
+                    "name": record.name,
+                    "image_url": record.image_url,
+                    "synopsis": record.synopsis or "",
+                    "score": float(score),
+                }
+            )
     return jsonify({"user": session["user"], "recommendations": enriched})
 
 # ----------------------------
 # API visibilité des séries
 # ----------------------------
+# get_series_pages : pages de /api/series du catalogue servi ; recréées (cache
+# vide) quand load_series_meta a chargé un nouveau catalogue
+def get_series_pages() -> SeriesPages:
+    global series_pages
+    meta = load_series_meta()
+    pages = series_pages
+    if pages is None or pages.meta is not meta:
+        pages = SeriesPages(meta)
+        series_pages = pages
+    return pages
+
+
 @app.route("/api/series")
 # Nom : api_series_list
-# But : liste JSON des séries (visibilité)
+# But : liste JSON des séries (visibilité), paginée, en cache et compressée
 def api_series_list():
-    """Retourne la liste des séries (id, name, image_url, synopsis)."""
-    conn = get_db_connection()
-    rows = conn.execute(
-        """
-        SELECT id, name, image_url, synopsis
-        FROM tvshow
-        WHERE name IS NOT NULL AND name != ''
-        ORDER BY id ASC
-        """
-    ).fetchall()
-    conn.close()
-    payload = [
-        {
-            "id": row["id"],
-            "name": row["name"],
-            "image_url": row["image_url"],
-            "synopsis": row["synopsis"] or "",
-        }
-        for row in rows
-    ]
-    return jsonify({"count": len(payload), "results": payload})
+    """
+    Retourne les séries (id, name, image_url, synopsis) par ids croissants.
+    - fields=id,name,image_url : champs renvoyés (tous par défaut)
+    - limit=N et cursor=<next_cursor de la page précédente> : pagination
+      (toute la liste sans limit)
+    Réponse pré-rendue, ETag fort (304 si If-None-Match correspond),
+    compressée en br/gzip selon Accept-Encoding.
+    """
+    try:
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    try:
+        cursor = request.args.get("cursor")
+        cursor = int(cursor) if cursor else None
+        limit = request.args.get("limit")
+        limit = min(int(limit), MAX_PAGE_SIZE) if limit else None
+        if limit is not None and limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "cursor et limit doivent etre des entiers (limit >= 1)."}), 400
+
+    page = get_series_pages().page(fields, cursor, limit)
+    encoding = next(
+        (name for name in available_encodings() if request.accept_encodings[name] > 0),
+        None,
+    )
+    body, etag, encoding = page.variant(encoding)
+
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype="application/json")
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    response.headers["Vary"] = "Accept-Encoding"
+    # Toujours revalider : le catalogue change à chaque import.
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 @app.route("/api/series/<int:series_id>")
@@ -555,12 +850,11 @@ def api_series_list():
 # But : détail JSON d'une série
 def api_series_detail(series_id: int):
     """Retourne le détail d'une série."""
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     row = conn.execute(
         "SELECT id, name, image_url, synopsis FROM tvshow WHERE id = ?",
         (series_id,),
     ).fetchone()
-    conn.close()
     if not row:
         return jsonify({"error": "Serie introuvable."}), 404
     return jsonify(
@@ -601,8 +895,6 @@ def api_signup():
         conn.commit()
     except sqlite3.IntegrityError:
         return jsonify({"success": False, "error": "Nom d'utilisateur ou email déjà utilisé."}), 400
-    finally:
-        conn.close()
 
     session["user"] = username
     return jsonify({"success": True, "user": username})
@@ -620,9 +912,8 @@ def api_login():
         return jsonify({"success": False, "error": "Champs manquants."}), 400
 
 
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     user = conn.execute("SELECT * FROM user WHERE username = ?", (username,)).fetchone()
-    conn.close()
 
     if user and check_password_hash(user["password_hash"], password):
         session["user"] = user["username"]
@@ -640,12 +931,12 @@ def api_logout():
 
 
 @app.route("/maliste")
-def maliste():
-    if "user" not in session:
-        flash("Vous devez etre connecte pour acceder a votre liste.")
-        return redirect(url_for("login"))
-
-    conn = get_db_connection()
+def maliste():
+    if "user" not in session:
+        flash("Vous devez etre connecte pour acceder a votre liste.")
+        return redirect(url_for("login"))
+
+    conn = get_db_connection(readonly=True)
     mylist = conn.execute(
         """
         SELECT tvshow.id, tvshow.name, tvshow.image_url
@@ -655,67 +946,60 @@ def maliste():
         """,
         (session["user"],),
     ).fetchall()
-    conn.close()
-
-    return render_template("maliste.html", mylist=mylist)
-
-
-@app.route("/mesnotations")
-# Nom : mesnotations
-# But : afficher les séries notées par l'utilisateur (page HTML)
-def mesnotations():
-    if "user" not in session:
-        flash("Vous devez etre connecte pour voir vos notations.")
-        return redirect(url_for("login"))
-    return render_template("mesnotations.html")
-
-
-@app.route("/api/my_ratings")
-# Nom : api_my_ratings
-# But : retourner les séries notées par l'utilisateur avec sa note et la moyenne globale
-def api_my_ratings():
-    if "user" not in session:
-        return jsonify({"error": "Unauthorized"}), 401
-
-    username = session["user"]
-    conn = get_db_connection()
-    rows = conn.execute(
-        """
-        SELECT
-          tvshow.id AS id,
-          tvshow.name AS name,
-          tvshow.image_url AS image_url,
-          r.rating AS user_rating,
-          (
-            SELECT ROUND(AVG(r2.rating), 1)
-            FROM ratings r2
-            WHERE lower(r2.tvshow_name) = lower(tvshow.name)
-          ) AS avg_rating
-        FROM ratings r
-        JOIN tvshow ON lower(tvshow.name) = lower(r.tvshow_name)
-        WHERE r.username = ?
-        ORDER BY tvshow.name ASC
-        """,
-        (username,),
-    ).fetchall()
-    conn.close()
-
-    results = [
-        {
-            "id": row["id"],
-            "name": row["name"],
-            "image_url": row["image_url"],
-            "user_rating": row["user_rating"],
-            "avg_rating": row["avg_rating"] or 0,
-        }
-        for row in rows
-    ]
-    return jsonify({"count": len(results), "results": results})
-
-
-if __name__ == "__main__":
-    init_search()
-    load_series_meta()
-    warm_recommendation_model()
-    app.run(debug=True)
+
+    return render_template("maliste.html", mylist=mylist)
+
+
+@app.route("/mesnotations")
+# Nom : mesnotations
+# But : afficher les séries notées par l'utilisateur (page HTML)
+def mesnotations():
+    if "user" not in session:
+        flash("Vous devez etre connecte pour voir vos notations.")
+        return redirect(url_for("login"))
+    return render_template("mesnotations.html")
+
+
+@app.route("/api/my_ratings")
+# Nom : api_my_ratings
+# But : retourner les séries notées par l'utilisateur avec sa note et la moyenne globale
+def api_my_ratings():
+    if "user" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    username = session["user"]
+    conn = get_db_connection(readonly=True)
+    rows = conn.execute(
+        """
+        SELECT
+          tvshow.id AS id,
+          tvshow.name AS name,
+          tvshow.image_url AS image_url,
+          r.rating AS user_rating,
+          ROUND(CAST(s.sum AS REAL) / s.count, 1) AS avg_rating
+        FROM ratings r
+        JOIN tvshow ON tvshow.id = r.tvshow_id
+        LEFT JOIN rating_stats s ON s.tvshow_id = r.tvshow_id
+        WHERE r.username = ?
+        ORDER BY tvshow.name ASC
+        """,
+        (username,),
+    ).fetchall()
+
+    results = [
+        {
+            "id": row["id"],
+            "name": row["name"],
+            "image_url": row["image_url"],
+            "user_rating": row["user_rating"],
+            "avg_rating": row["avg_rating"] or 0,
+        }
+        for row in rows
+    ]
+    return jsonify({"count": len(results), "results": results})
+
+
+if __name__ == "__main__":
+    load_series_meta()
+    app.run(debug=True)
 
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+bench_corpus_load.py
+Role : temps et memoire de pointe (RSS) du chargement de tvshow_term, ancienne
+voie (lignes SQLite -> dict de dicts -> DictVectorizer) contre les tableaux
+NumPy remplis par paquets (corpus.load_term_matrix), pour le moteur de
+recherche et pour les features des recommandations. "shared" mesure le
+demarrage de l'application : un seul corpus.load_corpus pour les deux.
+
+Chaque mesure tourne dans un processus neuf : le pic de RSS (ru_maxrss) est
+relu avant et apres le chargement.
+
+Usage:
+    python bench_corpus_load.py [--db database/tvshow.db]
+                                [--loaders legacy-search search legacy-recommend recommend shared]
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List
+
+from sklearn.feature_extraction import DictVectorizer
+
+import recommend
+import search
+from corpus import load_corpus
+from db import connection
+
+LOADERS = ["legacy-search", "search", "legacy-recommend", "recommend", "shared"]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# ----------------------
+# Anciennes voies (copies pour comparaison)
+# ----------------------
+def legacy_search_engine() -> search.SearchEngine:
+    """Lignes nommees -> dict de dicts par serie -> SearchEngine(DictVectorizer)."""
+    series_counts: Dict[str, Dict[str, float]] = {}
+    with connection(search.DB_PATH, readonly=True) as conn:
+        cursor = conn.execute(
+            """
+            SELECT tvshow.name, term.text, tvshow_term.count
+            FROM tvshow_term
+            JOIN tvshow ON tvshow_term.tvshow_id = tvshow.id
+            JOIN term ON tvshow_term.term_id = term.id
+            WHERE tvshow_term.count > 0
+            """
+        )
+        for name, term, count in cursor:
+            bag = series_counts.setdefault(str(name), {})
+            bag[term] = bag.get(term, 0.0) + float(count)
+    return search.SearchEngine(series_counts)
+
+
+def legacy_recommend_features():
+    """Un dict de features par serie (termes + synopsis) puis DictVectorizer."""
+    terms_by_show: Dict[int, List] = {}
+    with connection(recommend.DB_PATH, readonly=True) as conn:
+        shows = conn.execute("SELECT id, name, COALESCE(synopsis, '') AS synopsis FROM tvshow ORDER BY id").fetchall()
+        for row in conn.execute(
+            """
+            SELECT tvshow_term.tvshow_id, term.text, tvshow_term.count
+            FROM tvshow_term JOIN term ON term.id = tvshow_term.term_id
+            WHERE tvshow_term.count > 0
+            """
+        ):
+            terms_by_show.setdefault(row[0], []).append((row[1], row[2]))
+
+    feature_dicts = []
+    for show in shows:
+        features: Dict[str, float] = {}
+        for term, count in terms_by_show.get(show["id"], []):
+            if recommend._keep_token(term):
+                features[f"term::{term}"] = 2.0 * min(8, max(1.0, round(count)))
+        tokens = recommend._tokenise(show["synopsis"])
+        for token, freq in Counter(tokens).items():
+            features[f"syn::{token}"] = 0.6 * freq
+        for left, right in zip(tokens, tokens[1:]):
+            key = f"big::{left}_{right}"
+            features[key] = features.get(key, 0.0) + 0.3
+        if features:
+            feature_dicts.append(features)
+    return DictVectorizer().fit_transform(feature_dicts)
+
+
+def run_loader(name: str) -> None:
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    if name == "legacy-search":
+        shape = legacy_search_engine()._counts.shape
+    elif name == "search":
+        shape = search.SearchEngine.from_db()._counts.shape
+    elif name == "legacy-recommend":
+        shape = legacy_recommend_features().shape
+    elif name == "recommend":
+        shape = recommend._build_feature_space()[3].shape
+    else:
+        corpus = load_corpus(search.DB_PATH)
+        search.SearchEngine.from_corpus(corpus)
+        shape = recommend._build_feature_space(corpus=corpus)[3].shape
+    elapsed = time.perf_counter() - start
+    after = peak_rss_mb()
+    print(f"{name:17s} {elapsed:7.2f}s | RSS max avant {before:7.1f} Mo, apres {after:7.1f} Mo "
+          f"(+{after - before:.1f} Mo) | matrice {shape[0]} x {shape[1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps et memoire du chargement de tvshow_term")
+    parser.add_argument("--db", type=str, default=os.path.join("database", "tvshow.db"), help="Base SQLite")
+    parser.add_argument("--loaders", nargs="+", choices=LOADERS, default=LOADERS, help="Chargements a mesurer")
+    parser.add_argument("--run", choices=LOADERS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    search.DB_PATH = recommend.DB_PATH = args.db
+    if args.run:
+        run_loader(args.run)
+        return
+    for name in args.loaders:
+        subprocess.run([sys.executable, __file__, "--db", args.db, "--run", name], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+bench_db.py
+Role : cout des connexions SQLite par requete, connexion ouverte puis fermee a
+chaque requete (ancienne voie) contre connexion empruntee au pool (db.py).
+
+Chaque "requete" rejoue les lectures de /api/recommend/<serie> : une fiche
+serie par id, puis `--lookups` recherches par nom.
+
+Usage:
+    python bench_db.py [--db database/tvshow.db] [--requests 2000] [--lookups 5]
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+from db import connection, pool_stats
+
+
+def run_queries(conn: sqlite3.Connection, show_id: int, names, lookups: int) -> None:
+    conn.execute("SELECT id, name, image_url, synopsis FROM tvshow WHERE id = ?", (show_id,)).fetchone()
+    for name in names[:lookups]:
+        conn.execute(
+            "SELECT id, name, image_url FROM tvshow WHERE lower(name) = ? LIMIT 1", (name.lower(),)
+        ).fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Connexion par requete contre pool de connexions SQLite")
+    parser.add_argument("--db", type=str, default=os.path.join("database", "tvshow.db"), help="Base SQLite")
+    parser.add_argument("--requests", type=int, default=2000, help="Requetes simulees")
+    parser.add_argument("--lookups", type=int, default=5, help="Recherches par nom par requete")
+    args = parser.parse_args()
+
+    with connection(args.db, readonly=True) as conn:
+        shows = [(row[0], row[1]) for row in conn.execute("SELECT id, name FROM tvshow WHERE name IS NOT NULL")]
+    if not shows:
+        print("Aucune serie dans la base.")
+        return
+    names = [name for _, name in shows]
+
+    def fresh(i: int) -> None:
+        conn = sqlite3.connect(args.db)
+        conn.row_factory = sqlite3.Row
+        try:
+            run_queries(conn, shows[i % len(shows)][0], names[i % len(names):], args.lookups)
+        finally:
+            conn.close()
+
+    def pooled(i: int) -> None:
+        with connection(args.db, readonly=True) as conn:
+            run_queries(conn, shows[i % len(shows)][0], names[i % len(names):], args.lookups)
+
+    timings = {}
+    for label, func in (("connexion par requete", fresh), ("pool", pooled)):
+        start = time.perf_counter()
+        for i in range(args.requests):
+            func(i)
+        timings[label] = (time.perf_counter() - start) / args.requests
+        print(f"{label:22s} {timings[label] * 1e6:8.1f} us/requete")
+    print(f"x{timings['connexion par requete'] / timings['pool']:.1f} | pools : {pool_stats()}")
+
+
+if __name__ == "__main__":
+    main()
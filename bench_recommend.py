@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+bench_recommend.py
+Role : benchmark de la construction du profil dans recommend_for_user,
+ancienne boucle (une matrice creuse par note + cosine_similarity) contre la
+somme ponderee vectorisee.
+
+Usage:
+    python bench_recommend.py [--series 20000] [--features 100000]
+                              [--features-per-series 300] [--ratings 10 1000 10000]
+"""
+
+import argparse
+import time
+from typing import List, Tuple
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+import recommend
+
+
+def legacy_recommend(rated_indices: List[Tuple[int, float]], top_n: int) -> List[Tuple[str, float]]:
+    """Copie de l'ancienne implementation, pour comparaison."""
+    matrix = recommend.content_model().matrix
+    profile = None
+    weight_sum = 0.0
+    for idx, weight in rated_indices:
+        weight = max(weight, 0.0)
+        if weight == 0:
+            continue
+        weight_sum += weight
+        contribution = weight * matrix[idx]
+        profile = contribution if profile is None else profile + contribution
+    if profile is None:
+        return []
+
+    profile = normalize(profile / weight_sum, norm="l2", copy=False)
+    scores = cosine_similarity(profile, matrix).ravel()
+    for idx, _ in rated_indices:
+        scores[idx] = 0.0
+
+    results = []
+    for pos in recommend._top_indices(scores, top_n):
+        if scores[pos] <= 0:
+            continue
+        results.append((recommend.content_model().names[pos], float(scores[pos])))
+        if len(results) >= top_n:
+            break
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de recommend_for_user")
+    parser.add_argument("--series", type=int, default=20_000, help="Nombre de series")
+    parser.add_argument("--features", type=int, default=100_000, help="Nombre de features")
+    parser.add_argument("--features-per-series", type=int, default=300, help="Features non nulles par serie")
+    parser.add_argument("--ratings", type=int, nargs="+", default=[10, 1_000, 10_000], help="Notes par utilisateur")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions par mesure")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    nnz = args.series * args.features_per_series
+    rows = np.repeat(np.arange(args.series), args.features_per_series)
+    cols = rng.integers(0, args.features, size=nnz)
+    matrix = coo_matrix((rng.random(nnz), (rows, cols)), shape=(args.series, args.features)).tocsr()
+    names = [f"serie{i}" for i in range(args.series)]
+    doc_freq = np.bincount(matrix.indices, minlength=args.features)
+    model = recommend.ContentModel(list(range(args.series)), names, {}, matrix, doc_freq)
+    recommend.install_content_model(model)
+
+    for n_ratings in args.ratings:
+        shows = rng.choice(args.series, size=min(n_ratings, args.series), replace=False)
+        rated = [(int(idx), float(rng.integers(1, 6))) for idx in shows]
+
+        timings = {}
+        results = {}
+        vectorised = lambda rated_indices, top_n: recommend._recommend_from_ratings(model, rated_indices, top_n)
+        for label, func in (("boucle", legacy_recommend), ("vectorise", vectorised)):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                results[label] = func(rated, 10)
+            timings[label] = (time.perf_counter() - start) / args.repeat
+
+        same = [name for name, _ in results["boucle"]] == [name for name, _ in results["vectorise"]]
+        print(
+            f"{n_ratings:>6} notes | boucle : {timings['boucle'] * 1000:9.2f} ms | "
+            f"vectorise : {timings['vectorise'] * 1000:8.2f} ms | x{timings['boucle'] / timings['vectorise']:7.1f} | "
+            f"memes recommandations : {'oui' if same else 'NON'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
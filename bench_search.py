@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+bench_search.py
+Role : micro-benchmark de SearchEngine.search() sur un corpus synthetique,
+boucle Python historique (getrow par serie) contre la version vectorisee.
+
+Usage:
+    python bench_search.py [--series 10000 100000] [--terms 50000]
+                           [--terms-per-series 200] [--queries 5]
+"""
+
+import argparse
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import coo_matrix
+
+from search import SearchEngine
+
+
+def synthetic_engine(n_series: int, n_terms: int, terms_per_series: int, seed: int = 0) -> SearchEngine:
+    """Corpus aleatoire avec une distribution de termes de type Zipf."""
+    rng = np.random.default_rng(seed)
+    probabilities = 1.0 / np.arange(1, n_terms + 1)
+    probabilities /= probabilities.sum()
+
+    nnz = n_series * terms_per_series
+    rows = np.repeat(np.arange(n_series), terms_per_series)
+    cols = rng.choice(n_terms, size=nnz, p=probabilities)
+    counts = rng.integers(1, 50, size=nnz).astype(np.float64)
+    matrix = coo_matrix((counts, (rows, cols)), shape=(n_series, n_terms)).tocsr()
+
+    names = [f"serie{i}" for i in range(n_series)]
+    # Noms de termes purement alphabetiques (le tokenizer de requete ignore les chiffres).
+    terms = ["terme" + "".join(chr(97 + i // 26**k % 26) for k in range(4)) for i in range(n_terms)]
+    return SearchEngine.from_counts(names, terms, matrix)
+
+
+def legacy_search(engine: SearchEngine, query: Optional[str], top_n: int = 50) -> List[Tuple[str, float]]:
+    """Copie de l'ancienne implementation (boucle par serie), pour comparaison."""
+    if engine._X.shape[0] == 0 or engine._X.shape[1] == 0 or not query:
+        return []
+
+    qv = engine.vectorize_query(query)
+    sims = (qv @ engine._X.T).toarray().ravel()
+    q_tokens = set(engine._query_to_counts(query).keys())
+    token_indices = [engine.vocabulary[token] for token in q_tokens if token in engine.vocabulary]
+
+    scored: List[Tuple[str, float]] = []
+    for index, name in enumerate(engine.series_names):
+        score = float(sims[index])
+        if score <= 0:
+            continue
+        if token_indices:
+            row = engine._X.getrow(index)
+            if all(row[0, idx] > 0 for idx in token_indices):
+                score = min(1.0, score + 0.05)
+        if score >= 0.05:
+            scored.append((name, score))
+
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:top_n]
+
+
+def time_queries(func, queries: List[str]) -> Tuple[float, list]:
+    start = time.perf_counter()
+    results = [func(query) for query in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de SearchEngine.search()")
+    parser.add_argument("--series", type=int, nargs="+", default=[10_000, 100_000], help="Tailles de corpus")
+    parser.add_argument("--terms", type=int, default=50_000, help="Taille du vocabulaire")
+    parser.add_argument("--terms-per-series", type=int, default=200, help="Termes tires par serie")
+    parser.add_argument("--queries", type=int, default=5, help="Nombre de requetes par mesure")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    for n_series in args.series:
+        engine = synthetic_engine(n_series, args.terms, args.terms_per_series)
+        # Requetes de 1 a 3 termes, melangeant termes frequents et rares.
+        queries = [
+            " ".join(engine.terms[i] for i in rng.integers(0, 2000, size=rng.integers(1, 4)))
+            for _ in range(args.queries)
+        ]
+
+        legacy_time, legacy_results = time_queries(lambda q: legacy_search(engine, q), queries)
+        fast_time, fast_results = time_queries(lambda q: engine.search(q), queries)
+
+        same = all(
+            [name for name, _ in old] == [name for name, _ in new]
+            and np.allclose([s for _, s in old], [s for _, s in new])
+            for old, new in zip(legacy_results, fast_results)
+        )
+        print(
+            f"{n_series:>7} series | boucle : {legacy_time * 1000:9.2f} ms/requete | "
+            f"vectorise : {fast_time * 1000:7.2f} ms/requete | x{legacy_time / fast_time:6.1f} | "
+            f"resultats identiques : {'oui' if same else 'NON'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+bench_subtitles.py
+Role : benchmark du parseur de sous-titres de count_words_series.py, ancien
+decodage (cp1252 + decoupage en lignes + nettoyage regex) contre le parseur
+en un seul passage avec detection d'encodage. Mesure le debit et le nombre
+de mots qui changent entre les deux.
+
+Usage:
+    python bench_subtitles.py [--files 300] [--lines 600] [--repeat 3]
+    python bench_subtitles.py --data-dir sous-titres    # vrais fichiers .srt/.sub
+"""
+
+import argparse
+import random
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from count_words_series import count_words_in_bytes
+
+WORDS = [
+    "été", "déjà", "garçon", "hôpital", "aujourd'hui", "aujourd’hui", "peut-être", "où", "ça",
+    "policier", "détective", "meurtre", "enquête", "vampire", "zombie", "docteur", "capitaine",
+    "don't", "Spider-Man", "New", "York", "OK", "Noël", "cœur", "bientôt", "Très",
+]
+
+
+# ----------------------
+# Ancienne implementation (copie pour comparaison)
+# ----------------------
+def legacy_extract_text_from_srt(content: str) -> str:
+    lines = content.split('\n')
+    text_lines = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.isdigit() or '-->' in line:
+            continue
+        text_lines.append(line)
+    return ' '.join(text_lines)
+
+
+def legacy_extract_text_from_sub(content: str) -> str:
+    lines = content.split('\n')
+    text_lines = []
+    for line in lines:
+        line = line.strip()
+        if not line or re.match(r'^\d{2}:\d{2}:\d{2}', line) or line.isdigit():
+            continue
+        text_lines.append(line)
+    return ' '.join(text_lines)
+
+
+def legacy_clean_text(text: str) -> str:
+    text = re.sub(r'<[^>]+>', '', text)
+    text = text.replace('’', "'").replace('‘', "'")
+    text = text.replace('–', ' ').replace('—', ' ').replace('−', ' ')
+    return text
+
+
+def legacy_count_words(data: bytes, suffix: str) -> Counter:
+    content = data.decode('cp1252', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+    if suffix == '.srt':
+        text = legacy_extract_text_from_srt(content)
+    else:
+        text = legacy_extract_text_from_sub(content)
+    text = legacy_clean_text(text).lower()
+    return Counter(re.findall(r"\w+(?:['-]\w+)*", text, flags=re.UNICODE))
+
+
+# ----------------------
+# Corpus
+# ----------------------
+def synthetic_corpus(n_files: int, n_lines: int, seed: int = 0) -> List[Tuple[str, str, bytes]]:
+    """(encodage, extension, contenu) : un tiers cp1252, un tiers UTF-8, un tiers UTF-8 avec BOM."""
+    rnd = random.Random(seed)
+    corpus = []
+    for i in range(n_files):
+        encoding = ("cp1252", "utf-8", "utf-8-sig")[i % 3]
+        suffix = ".srt" if i % 4 else ".sub"
+        lines = []
+        for n in range(n_lines):
+            text = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 10)))
+            if n % 7 == 0:
+                text = f"<i>{text}</i>"
+            if n % 11 == 0:
+                text = f"- {text} – oui"
+            if suffix == ".srt":
+                lines += [str(n + 1), "00:01:02,000 --> 00:01:04,500", text, ""]
+            else:
+                lines += ["00:01:02:00", text]
+        corpus.append((encoding, suffix, "\r\n".join(lines).encode(encoding, errors="replace")))
+    return corpus
+
+
+def disk_corpus(data_dir: Path) -> List[Tuple[str, str, bytes]]:
+    files = sorted(p for p in data_dir.rglob("*") if p.suffix.lower() in {".srt", ".sub"})
+    return [("fichier", p.suffix.lower(), p.read_bytes()) for p in files]
+
+
+def run(func: Callable, corpus, repeat: int) -> Tuple[float, List[Counter]]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [func(data, suffix) for _, suffix, data in corpus]
+    return (time.perf_counter() - start) / repeat, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du parseur de sous-titres")
+    parser.add_argument("--files", type=int, default=300, help="Nombre de fichiers synthetiques")
+    parser.add_argument("--lines", type=int, default=600, help="Repliques par fichier")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions par mesure")
+    parser.add_argument("--data-dir", type=str, default=None, help="Utiliser les .srt/.sub de ce dossier")
+    args = parser.parse_args()
+
+    corpus = disk_corpus(Path(args.data_dir)) if args.data_dir else synthetic_corpus(args.files, args.lines)
+    total_mb = sum(len(data) for _, _, data in corpus) / (1024 * 1024)
+    print(f"{len(corpus)} fichiers, {total_mb:.1f} Mo")
+
+    legacy_time, legacy_results = run(legacy_count_words, corpus, args.repeat)
+    fast_time, fast_results = run(count_words_in_bytes, corpus, args.repeat)
+    print(f"ancien : {total_mb / legacy_time:7.2f} Mo/s | un passage : {total_mb / fast_time:7.2f} Mo/s | "
+          f"x{legacy_time / fast_time:.2f}")
+
+    # Mots qui changent : |ancien - nouveau| par fichier, ventile par encodage.
+    by_encoding = {}
+    for (encoding, _, _), old, new in zip(corpus, legacy_results, fast_results):
+        stats = by_encoding.setdefault(encoding, Counter())
+        stats["fichiers"] += 1
+        stats["fichiers modifies"] += old != new
+        stats["mots (ancien)"] += sum(old.values())
+        stats["mots modifies"] += sum(((old - new) + (new - old)).values())
+    for encoding, stats in by_encoding.items():
+        share = stats["mots modifies"] / max(2 * stats["mots (ancien)"], 1)
+        print(f"{encoding:>10} : {stats['fichiers modifies']}/{stats['fichiers']} fichiers differents, "
+              f"{stats['mots modifies']} mots differents ({share:.1%})")
+
+    examples = Counter()
+    for (encoding, _, _), old, new in zip(corpus, legacy_results, fast_results):
+        if encoding != "cp1252":
+            examples.update(old - new)
+    if examples:
+        print("exemples de mots corrompus par l'ancien decodage :",
+              ", ".join(word for word, _ in examples.most_common(8)))
+
+
+if __name__ == "__main__":
+    main()
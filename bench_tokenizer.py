@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+bench_tokenizer.py
+Role : benchmark de tokenizer.py (debit, effet du cache de normalisation) et
+comparaison de rappel sur un jeu de requetes : anciens decoupages (ETL
+\\w+(?:['-]\\w+)*, requete en lettres seules avec apostrophes) contre le
+tokenizer commun utilise a l'indexation et a la requete.
+
+Usage:
+    python bench_tokenizer.py [--series 300] [--words 400] [--queries 2000]
+"""
+
+import argparse
+import random
+import re
+import time
+import unicodedata
+from collections import Counter
+from typing import Callable, Dict, List, Tuple
+
+from search import SearchEngine
+from tokenizer import normalize, tokenize
+
+# Mots de sous-titres avec accents, elisions et traits d'union.
+NOUNS = [
+    "hôpital", "enquête", "détective", "meurtre", "policier", "vérité", "frère", "sœur", "mère",
+    "père", "garçon", "fenêtre", "château", "forêt", "île", "bateau", "été", "hiver", "argent",
+    "avocat", "procès", "médecin", "infirmière", "école", "université", "église", "prêtre", "démon",
+    "vampire", "zombie", "sorcière", "dragon", "royaume", "épée", "guerre", "soldat", "général",
+    "président", "élection", "journaliste", "caméra", "téléphone", "ordinateur", "réseau", "hôtel",
+    "aéroport", "avion", "fusée", "planète", "étoile", "espace", "extraterrestre", "homme", "ami",
+]
+COMPOUNDS = ["peut-être", "grand-mère", "après-midi", "arc-en-ciel", "Spider-Man", "vis-à-vis", "week-end"]
+ELISIONS = ["l'", "d'", "qu'", "l’", "d’"]
+FILLER = ["je", "tu", "il", "nous", "vous", "ils", "mais", "donc", "et", "avec", "pour", "dans"]
+
+
+# ----------------------
+# Anciens decoupages (copies pour comparaison)
+# ----------------------
+def legacy_normalize(text: str) -> str:
+    normalized = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in normalized if unicodedata.category(ch) != "Mn").lower()
+
+
+def legacy_index_tokens(text: str) -> List[str]:
+    """count_words_series (\\w+(?:['-]\\w+)*) puis normalisation de load_series_counts_from_db."""
+    text = text.replace("’", "'").replace("‘", "'").lower()
+    return [legacy_normalize(t) for t in re.findall(r"\w+(?:['-]\w+)*", text)]
+
+
+def legacy_query_tokens(query: str) -> List[str]:
+    """Ancien SearchEngine._query_to_counts."""
+    return [legacy_normalize(t) for t in re.findall(r"[^\W\d_]+(?:'[^\W\d_]+)*", query)]
+
+
+# ----------------------
+# Corpus et requetes
+# ----------------------
+def render(word: str, rnd: random.Random) -> str:
+    """Forme ecrite dans un sous-titre : elision, majuscule en debut de replique."""
+    if rnd.random() < 0.4 and word[0].lower() in "aeiouhéèêîô":
+        word = rnd.choice(ELISIONS) + word
+    if rnd.random() < 0.2:
+        word = word.capitalize()
+    return word
+
+
+def synthetic_corpus(n_series: int, n_words: int, seed: int = 0) -> Tuple[List[str], List[List[str]]]:
+    rnd = random.Random(seed)
+    vocabulary = NOUNS + COMPOUNDS
+    texts, base_words = [], []
+    for _ in range(n_series):
+        themes = rnd.sample(vocabulary, 12)
+        words = [rnd.choice(themes) if rnd.random() < 0.5 else rnd.choice(FILLER + vocabulary)
+                 for _ in range(n_words)]
+        texts.append(" ".join(render(word, rnd) for word in words))
+        base_words.append(themes)
+    return texts, base_words
+
+
+def user_query(words: List[str], rnd: random.Random) -> str:
+    """Requete telle qu'un utilisateur la tape : sans accents, sans elision, apostrophe typographique..."""
+    forms = []
+    for word in words:
+        roll = rnd.random()
+        if roll < 0.3:
+            word = legacy_normalize(word)
+        elif roll < 0.5 and word[0].lower() in "aeiouhéèêîô":
+            word = "l’" + word
+        forms.append(word)
+    return " ".join(forms)
+
+
+def recall_at(engine: SearchEngine, tokenizer: Callable[[str], List[str]],
+              queries: List[Tuple[str, int]], top_n: int) -> float:
+    hits = 0
+    for query, target in queries:
+        counts: Dict[str, float] = Counter(tokenizer(query))
+        ranked = engine.rank_query(counts, top_n=top_n)
+        hits += any(name == f"serie{target}" for name, _ in ranked)
+    return hits / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark et rappel de tokenizer.py")
+    parser.add_argument("--series", type=int, default=300, help="Nombre de series synthetiques")
+    parser.add_argument("--words", type=int, default=400, help="Mots par serie")
+    parser.add_argument("--queries", type=int, default=2000, help="Nombre de requetes")
+    parser.add_argument("--top-n", type=int, default=10, help="Rappel mesure sur les top-n resultats")
+    args = parser.parse_args()
+
+    texts, themes = synthetic_corpus(args.series, args.words)
+    total_mb = sum(len(text.encode("utf-8")) for text in texts) / (1024 * 1024)
+
+    # Debit : ancien decoupage d'indexation, tokenizer a froid (cache vide) puis a chaud.
+    start = time.perf_counter()
+    for text in texts:
+        legacy_index_tokens(text)
+    legacy_time = time.perf_counter() - start
+    normalize.cache_clear()
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        for text in texts:
+            tokenize(text)
+        timings.append(time.perf_counter() - start)
+    info = normalize.cache_info()
+    print(f"{len(texts)} textes, {total_mb:.1f} Mo")
+    print(f"ancien : {total_mb / legacy_time:6.2f} Mo/s | tokenizer a froid : {total_mb / timings[0]:6.2f} Mo/s | "
+          f"a chaud : {total_mb / timings[1]:6.2f} Mo/s | cache : {info.currsize} mots, "
+          f"{info.hits / max(info.hits + info.misses, 1):.1%} de hits")
+
+    # Rappel : chaque requete vise une serie dont elle reprend 1 a 2 mots-themes.
+    rnd = random.Random(1)
+    queries = []
+    for _ in range(args.queries):
+        target = rnd.randrange(len(texts))
+        queries.append((user_query(rnd.sample(themes[target], rnd.randint(1, 2)), rnd), target))
+
+    names = [f"serie{i}" for i in range(len(texts))]
+    legacy_engine = SearchEngine({name: Counter(legacy_index_tokens(text)) for name, text in zip(names, texts)})
+    engine = SearchEngine({name: Counter(tokenize(text)) for name, text in zip(names, texts)})
+    legacy_recall = recall_at(legacy_engine, legacy_query_tokens, queries, args.top_n)
+    recall = recall_at(engine, tokenize, queries, args.top_n)
+    print(f"rappel@{args.top_n} : ancien {legacy_recall:.1%} | tokenizer commun {recall:.1%} "
+          f"| vocabulaire {len(legacy_engine.terms)} -> {len(engine.terms)} termes")
+
+
+if __name__ == "__main__":
+    main()
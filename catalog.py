@@ -0,0 +1,43 @@
+"""
+catalog.py
+Role : numero de version du catalogue (table app_meta).
+
+Les scripts qui modifient les series ou leurs termes (import, pipeline des
+sous-titres, metadonnees) l'incrementent dans la meme transaction que leurs
+ecritures. Les modeles en memoire (moteur de recherche, modele contenu)
+retiennent la version dont ils sont issus : l'application les reconstruit en
+arriere-plan quand elle change.
+"""
+
+import sqlite3
+
+APP_META_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS app_meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+"""
+
+CATALOG_VERSION_KEY = "catalog_version"
+
+
+def catalog_version(conn: sqlite3.Connection) -> int:
+    """Version courante du catalogue (0 si elle n'a jamais ete incrementee)."""
+    try:
+        row = conn.execute("SELECT value FROM app_meta WHERE key = ?", (CATALOG_VERSION_KEY,)).fetchone()
+    except sqlite3.OperationalError:
+        # Base creee avant la table app_meta.
+        return 0
+    return int(row[0]) if row else 0
+
+
+def bump_catalog_version(conn: sqlite3.Connection) -> None:
+    """Incremente la version du catalogue (sans commit : a faire avec les ecritures)."""
+    conn.execute(APP_META_TABLE_SQL)
+    conn.execute(
+        """
+        INSERT INTO app_meta (key, value) VALUES (?, 1)
+        ON CONFLICT(key) DO UPDATE SET value = value + 1
+        """,
+        (CATALOG_VERSION_KEY,),
+    )
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 from pathlib import Path
 
+from tokenizer import normalize, tokenize
+
 # Stopwords FR + custom
 STOPWORDS_FR = {
     "alors","au","aucuns","aussi","autre","avant","avec","avoir","bon",
@@ -45,6 +47,14 @@ STOPWORDS_EN = {
 
 ALL_STOPWORDS = STOPWORDS_FR.union(STOPWORDS_EN)
 
+# Les mêmes, sous la forme produite par tokenizer.py (sans accents, apostrophes coupées :
+# "don't" -> "don", "t"), pour filtrer les mots issus de count_words_series.py.
+STOPWORD_TOKENS = frozenset(token for word in ALL_STOPWORDS for token in tokenize(word))
+
+def is_index_token(token: str) -> bool:
+    """Mot gardé dans l'index : ni stopword, ni mot de <= 2 lettres (mêmes règles à la requête)."""
+    return token not in STOPWORD_TOKENS and len(token) > 2
+
 def clean_file(file_path: Path, output_dir: Path):
     output_file = output_dir / file_path.name
     with open(file_path, "r", encoding="utf-8") as f_in, open(output_file, "w", encoding="utf-8") as f_out:
@@ -52,10 +62,10 @@ def clean_file(file_path: Path, output_dir: Path):
             if ":" not in line:
                 continue
             word, count = line.strip().split(":", 1)
-            word_clean = word.strip().lower()
+            word_clean = normalize(word.strip())
             count = count.strip()
             # Supprimer si stopword ou longueur <= 2
-            if word_clean not in ALL_STOPWORDS and len(word_clean) > 2:
+            if is_index_token(word_clean):
                 f_out.write(f"{word}:{count}\n")  # garde le mot tel quel (majuscules incluses)
     print(f"{file_path.name} nettoyé → {output_file}")
 
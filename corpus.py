@@ -0,0 +1,206 @@
+"""
+corpus.py
+Role : corpus commun au moteur de recherche et aux recommandations : series,
+termes normalises et matrice creuse (CSR) des occurrences, lus une seule fois
+dans la base.
+
+Les lignes (tvshow_id, term_id, count) sont lues par paquets (fetchmany) et
+recopiees dans des tableaux prealloues a partir d'un COUNT(*) : aucun objet
+Python n'est conserve par ligne, la memoire de pointe reste proche de la
+taille des tableaux finaux.
+
+SearchEngine.from_corpus et recommend en derivent chacun leur ponderation
+(TF-IDF brut par nom de serie / TF sublineaire + synopsis et bigrammes).
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from catalog import catalog_version
+from db import connection
+
+FETCH_CHUNK_ROWS = 65_536
+
+# Au-dela de ce nombre de termes demandes, toute la table term est lue d'un bloc.
+TERM_LOOKUP_LIMIT = 50_000
+SQL_CHUNK = 900
+
+_ROW_DTYPE = np.dtype([("tvshow_id", np.int64), ("term_id", np.int64), ("count", np.float64)])
+
+
+def _raw_cursor(conn: sqlite3.Connection) -> sqlite3.Cursor:
+    """Curseur renvoyant des tuples bruts, quel que soit le row_factory de la connexion."""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor
+
+
+def _show_filter(show_ids: Optional[Iterable[int]]) -> Tuple[str, Tuple[int, ...]]:
+    if show_ids is None:
+        return "", ()
+    params = tuple(int(show_id) for show_id in show_ids)
+    return f"AND tvshow_id IN ({','.join('?' * len(params)) or 'NULL'})", params
+
+
+def load_term_arrays(
+    conn: sqlite3.Connection,
+    show_ids: Optional[Iterable[int]] = None,
+    chunk_rows: int = FETCH_CHUNK_ROWS,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Colonnes (tvshow_id, term_id, count) des lignes de compte positif de
+    tvshow_term (toutes, ou celles de `show_ids`), sans ordre particulier.
+    """
+    show_filter, params = _show_filter(show_ids)
+    where = f"WHERE count > 0 {show_filter}"
+    n_rows = conn.execute(f"SELECT COUNT(*) FROM tvshow_term {where}", params).fetchone()[0]
+    columns = [np.empty(n_rows, dtype=_ROW_DTYPE[name]) for name in _ROW_DTYPE.names]
+
+    cursor = _raw_cursor(conn)
+    cursor.execute(f"SELECT tvshow_id, term_id, count FROM tvshow_term {where}", params)
+    filled = 0
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        end = filled + len(rows)
+        if end > len(columns[0]):
+            # Lignes inserees entre le COUNT(*) et la lecture.
+            extra = max(end - len(columns[0]), chunk_rows)
+            columns = [np.concatenate([column, np.empty(extra, dtype=column.dtype)]) for column in columns]
+        block = np.fromiter(rows, dtype=_ROW_DTYPE, count=len(rows))
+        for column, name in zip(columns, _ROW_DTYPE.names):
+            column[filled:end] = block[name]
+        filled = end
+    shows, terms, counts = (column[:filled] for column in columns)
+    return shows, terms, counts
+
+
+def load_term_matrix(
+    conn: sqlite3.Connection,
+    show_ids: Optional[Iterable[int]] = None,
+    chunk_rows: int = FETCH_CHUNK_ROWS,
+) -> Tuple[np.ndarray, np.ndarray, csr_matrix]:
+    """
+    Matrice d'occurrences series x termes.
+    Retourne (tvshow_id de chaque ligne, term_id de chaque colonne, matrice CSR),
+    lignes et colonnes triees par id ; seules les series et termes presents y figurent.
+    """
+    shows, terms, counts = load_term_arrays(conn, show_ids, chunk_rows)
+    row_ids, rows = np.unique(shows, return_inverse=True)
+    del shows
+    col_ids, cols = np.unique(terms, return_inverse=True)
+    del terms
+    matrix = csr_matrix((counts, (rows, cols)), shape=(len(row_ids), len(col_ids)))
+    matrix.sum_duplicates()
+    return row_ids, col_ids, matrix
+
+
+def load_term_texts(conn: sqlite3.Connection, term_ids: np.ndarray) -> Dict[int, str]:
+    """Texte normalise des termes `term_ids` (les ids absents de la table term sont omis)."""
+    cursor = _raw_cursor(conn)
+    if len(term_ids) > TERM_LOOKUP_LIMIT:
+        return dict(cursor.execute("SELECT id, text FROM term"))
+    texts: Dict[int, str] = {}
+    ids = [int(term_id) for term_id in term_ids]
+    for start in range(0, len(ids), SQL_CHUNK):
+        chunk = ids[start:start + SQL_CHUNK]
+        texts.update(cursor.execute(f"SELECT id, text FROM term WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+    return texts
+
+
+def _align_rows(counts: csr_matrix, row_ids: np.ndarray, show_ids: np.ndarray) -> csr_matrix:
+    """
+    Replace les lignes de `counts` (series `row_ids`) sur la liste complete
+    `show_ids` : les series sans terme deviennent des lignes vides. Seul indptr
+    est recalcule, data et indices sont repris tels quels.
+    """
+    pos = np.searchsorted(show_ids, row_ids)
+    found = pos < len(show_ids)
+    found[found] = show_ids[pos[found]] == row_ids[found]
+    if not found.all():
+        # Lignes de series supprimees de tvshow.
+        counts = counts[np.flatnonzero(found)]
+        pos = pos[found]
+    row_nnz = np.zeros(len(show_ids) + 1, dtype=counts.indptr.dtype)
+    row_nnz[pos + 1] = np.diff(counts.indptr)
+    indptr = np.cumsum(row_nnz, dtype=counts.indptr.dtype)
+    return csr_matrix((counts.data, counts.indices, indptr), shape=(len(show_ids), counts.shape[1]), copy=False)
+
+
+def drop_empty_rows(matrix: csr_matrix) -> Tuple[csr_matrix, np.ndarray]:
+    """Retire les lignes vides sans recopier data ni indices. Retourne (matrice, lignes gardees)."""
+    kept = np.flatnonzero(np.diff(matrix.indptr) > 0)
+    if len(kept) == matrix.shape[0]:
+        return matrix, kept
+    indptr = np.concatenate([matrix.indptr[:1], matrix.indptr[kept + 1]])
+    return csr_matrix((matrix.data, matrix.indices, indptr), shape=(len(kept), matrix.shape[1]), copy=False), kept
+
+
+class Corpus:
+    """
+    Occurrences des termes de sous-titres, lues une fois pour le moteur de
+    recherche et les recommandations.
+    - show_ids / names / synopses : une entree par serie de tvshow, ids croissants
+    - terms : texte normalise de chaque colonne
+    - counts : matrice CSR series x termes (float64), lignes vides pour les
+      series sans terme
+    - catalog_version : version du catalogue (catalog.py) lue avant les donnees
+    """
+
+    def __init__(
+        self,
+        show_ids: np.ndarray,
+        names: List[str],
+        synopses: List[str],
+        terms: List[str],
+        counts: csr_matrix,
+        catalog_version: int = 0,
+    ):
+        self.show_ids = show_ids
+        self.names = names
+        self.synopses = synopses
+        self.terms = terms
+        self.counts = counts
+        self.catalog_version = catalog_version
+
+    @classmethod
+    def from_db(cls, conn: sqlite3.Connection, show_ids: Optional[Iterable[int]] = None) -> "Corpus":
+        """Lit toutes les series (ou seulement `show_ids`) et leurs termes."""
+        # Lue en premier : une modification pendant la lecture donnera une version plus recente.
+        version = catalog_version(conn)
+        show_ids = None if show_ids is None else [int(show_id) for show_id in show_ids]
+        show_filter = ""
+        if show_ids is not None:
+            show_filter = f"WHERE id IN ({','.join('?' * len(show_ids)) or 'NULL'})"
+        shows = _raw_cursor(conn).execute(
+            f"SELECT id, name, COALESCE(synopsis, '') FROM tvshow {show_filter} ORDER BY id",
+            show_ids or (),
+        ).fetchall()
+        row_ids, term_ids, counts = load_term_matrix(conn, show_ids)
+        texts = load_term_texts(conn, term_ids)
+
+        known = np.array([term_id in texts for term_id in term_ids.tolist()], dtype=bool)
+        if not known.all():
+            counts = counts[:, np.flatnonzero(known)]
+            term_ids = term_ids[known]
+        ids = np.array([show[0] for show in shows], dtype=np.int64)
+        return cls(
+            ids,
+            [str(show[1] or "") for show in shows],
+            [show[2] for show in shows],
+            [texts[term_id] for term_id in term_ids.tolist()],
+            _align_rows(counts, row_ids, ids),
+            version,
+        )
+
+
+def load_corpus(db_path: str, show_ids: Optional[Iterable[int]] = None) -> Corpus:
+    """Lit le corpus de `db_path` (toutes les series, ou seulement `show_ids`)."""
+    with connection(db_path, readonly=True) as conn:
+        return Corpus.from_db(conn, show_ids)
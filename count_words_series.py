@@ -1,75 +1,189 @@
 #!/usr/bin/env python3
+import io
 import os
+import codecs
 import re
+import time
+import zipfile
 import argparse
 from pathlib import Path
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from tokenizer import WORD_PATTERN, normalize
+
+try:
+    import py7zr
+    SEVENZ_AVAILABLE = True
+except ImportError:
+    SEVENZ_AVAILABLE = False
+
+SUBTITLE_EXTENSIONS = {'.srt', '.sub'}
+ARCHIVE_EXTENSIONS = {'.zip', '.7z'}
+
+# Taille max d'un membre 7z lu en mémoire (py7zr >= 1.0).
+MAX_MEMBER_BYTES = 256 * 1024 * 1024
 
 def get_available_series(data_dir: Path):
     if not data_dir.exists():
         return []
     return sorted([item.name for item in data_dir.iterdir() if item.is_dir()])
 
-def extract_text_from_srt(content: str) -> str:
-    lines = content.split('\n')
-    text_lines = []
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        if not line or line.isdigit() or '-->' in line:
-            i += 1
-            continue
-        text_lines.append(line)
-        i += 1
-    return ' '.join(text_lines)
-
-def extract_text_from_sub(content: str) -> str:
-    lines = content.split('\n')
-    text_lines = []
-    for line in lines:
-        line = line.strip()
-        if not line or re.match(r'^\d{2}:\d{2}:\d{2}', line) or line.isdigit():
-            continue
-        text_lines.append(line)
-    return ' '.join(text_lines)
-
-def clean_text(text: str) -> str:
-    text = re.sub(r'<[^>]+>', '', text)
-    text = text.replace('\u2019', "'").replace('\u2018', "'")
-    text = text.replace('\u2013', ' ').replace('\u2014', ' ').replace('\u2212', ' ')
-    return text
+# Un seul passage sur le texte : lignes de numéro/timing et balises sont consommées
+# par la même expression que les mots ; seul le groupe des mots est capturé, donc
+# findall() renvoie '' pour tout le reste. [^\S\n] = blanc hors saut de ligne
+# (couvre le \r des fichiers Windows). Les mots suivent les règles de tokenizer.py.
+_TOKEN = rf"({WORD_PATTERN})"
+_TAG = r"<[^>]+>"
+_SUBTITLE_PATTERNS = {
+    '.srt': re.compile(rf"^(?:[^\S\n]*\d+[^\S\n]*|.*-->.*)$|{_TOKEN}|{_TAG}", re.MULTILINE),
+    '.sub': re.compile(rf"^(?:[^\S\n]*\d+[^\S\n]*|[^\S\n]*\d{{2}}:\d{{2}}:\d{{2}}.*)$|{_TOKEN}|{_TAG}", re.MULTILINE),
+}
 
-def count_words_in_file(file_path: Path) -> Counter:
+def decode_subtitle(data) -> str:
+    """
+    Décode un sous-titre (bytes ou memoryview) : BOM UTF-8/UTF-16 s'il y en a un,
+    sinon UTF-8 s'il est valide, sinon cp1252 (encodage historique des .srt français).
+    """
+    head = bytes(data[:4])
+    if head.startswith(codecs.BOM_UTF8):
+        return str(data, 'utf-8-sig', 'replace')
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return str(data, 'utf-16', 'replace')
     try:
-        with open(file_path, 'r', encoding='cp1252', errors='ignore') as f:
-            content = f.read()
+        return str(data, 'utf-8')
     except UnicodeDecodeError:
-        try:
-            with open(file_path, 'r', encoding='latin-1', errors='ignore') as f:
-                content = f.read()
-        except:
-            return Counter()
-    except:
-        return Counter()
-    
-    if file_path.suffix.lower() == '.srt':
-        text = extract_text_from_srt(content)
-    elif file_path.suffix.lower() == '.sub':
-        text = extract_text_from_sub(content)
-    else:
+        return str(data, 'cp1252', 'ignore')
+
+def iter_subtitle_tokens(data, suffix: str):
+    """Mots normalisés (tokenizer.normalize) d'un fichier .srt/.sub, produits au fil de l'eau."""
+    pattern = _SUBTITLE_PATTERNS.get(suffix.lower())
+    if pattern is None:
+        return
+    text = decode_subtitle(data).lower()
+    if '\n' not in text:
+        text = text.replace('\r', '\n')  # fins de ligne Mac (\r seul)
+    yield from map(normalize, filter(None, pattern.findall(text)))
+
+def count_words_in_bytes(data, suffix: str) -> Counter:
+    return Counter(iter_subtitle_tokens(data, suffix))
+
+def _iter_zip_members(source, label: str):
+    with zipfile.ZipFile(source) as archive:
+        for info in archive.infolist():
+            suffix = Path(info.filename).suffix.lower()
+            if info.is_dir() or suffix not in SUBTITLE_EXTENSIONS | ARCHIVE_EXTENSIONS:
+                continue
+            with archive.open(info) as member:
+                yield f'{label}/{info.filename}', member.read()
+
+def _iter_7z_members(source, label: str):
+    if not SEVENZ_AVAILABLE:
+        print(f'⚠️ py7zr non disponible, archive ignorée : {label}')
+        return
+    with py7zr.SevenZipFile(source, mode='r') as archive:
+        names = [
+            name for name in archive.getnames()
+            if Path(name).suffix.lower() in SUBTITLE_EXTENSIONS | ARCHIVE_EXTENSIONS
+        ]
+        if not names:
+            return
+        if hasattr(archive, 'read'):
+            # py7zr < 1.0
+            for name, content in archive.read(names).items():
+                yield f'{label}/{name}', content.read()
+        else:
+            # Sous-module non importé par `import py7zr` : import explicite.
+            from py7zr.io import BytesIOFactory
+            factory = BytesIOFactory(limit=MAX_MEMBER_BYTES)
+            archive.extract(targets=names, factory=factory)
+            for name in names:
+                product = factory.products.get(name)
+                if product is not None:
+                    product.seek(0)
+                    yield f'{label}/{name}', product.read()
+
+def iter_subtitle_members(source, label: str, suffix: str):
+    """
+    Produit (chemin, contenu) pour chaque sous-titre contenu dans `source` :
+    le fichier lui-même, ou les membres d'une archive (récursivement).
+    Une archive illisible est signalée puis ignorée.
+    """
+    if suffix in SUBTITLE_EXTENSIONS:
+        data = source.read_bytes() if isinstance(source, Path) else source.getvalue()
+        yield label, data
+        return
+
+    reader = _iter_zip_members if suffix == '.zip' else _iter_7z_members
+    try:
+        for name, data in reader(source, label):
+            member_suffix = Path(name).suffix.lower()
+            if member_suffix in ARCHIVE_EXTENSIONS:
+                yield from iter_subtitle_members(io.BytesIO(data), name, member_suffix)
+            else:
+                yield name, data
+    except Exception as e:
+        print(f'⚠️ Archive illisible, ignorée : {label} ({e})')
+
+def count_words_in_source(file_path: Path, data: bytes):
+    """Compte un .srt/.sub, ou tous les sous-titres d'une archive lue en mémoire.
+    Retourne (compteur, nb de sous-titres lus)."""
+    counters = [
+        count_words_in_bytes(content, Path(name).suffix)
+        for name, content in iter_subtitle_members(io.BytesIO(data), str(file_path), file_path.suffix.lower())
+    ]
+    return merge_counters(counters), len(counters)
+
+def count_words_in_file(file_path: Path) -> Counter:
+    try:
+        data = file_path.read_bytes()
+    except OSError:
         return Counter()
-    
-    text = clean_text(text).lower()
-    tokens = re.findall(r"\w+(?:['-]\w+)*", text, flags=re.UNICODE)
-    return Counter(tokens)
+    return count_words_in_source(file_path, data)[0]
+
+def list_subtitle_files(series_dir: Path) -> list:
+    # Fichiers du dossier de la série (sans sous-dossiers), extension sans casse :
+    # sous-titres d'abord, puis archives lues sans extraction. Même liste pour
+    # subtitle_pipeline.py, pour que les deux chemins comptent les mêmes fichiers.
+    if not series_dir.is_dir():
+        return []
+    files = sorted(path for path in series_dir.iterdir() if path.is_file())
+    return ([path for path in files if path.suffix.lower() in SUBTITLE_EXTENSIONS]
+            + [path for path in files if path.suffix.lower() in ARCHIVE_EXTENSIONS])
 
 def count_words_in_series(series_dir: Path) -> Counter:
-    subtitle_files = list(series_dir.glob('*.srt')) + list(series_dir.glob('*.sub'))
     total_counter = Counter()
-    for file_path in subtitle_files:
+    for file_path in list_subtitle_files(series_dir):
         total_counter.update(count_words_in_file(file_path))
     return total_counter
 
+def merge_counters(counters: list) -> Counter:
+    # Fusion en arbre (paires voisines) : meme resultat et meme ordre d'insertion
+    # que des update() successifs, donc meme sortie most_common() que le mode sequentiel.
+    level = list(counters)
+    if not level:
+        return Counter()
+    while len(level) > 1:
+        merged = []
+        for i in range(0, len(level), 2):
+            left = level[i]
+            if i + 1 < len(level):
+                left.update(level[i + 1])
+            merged.append(left)
+        level = merged
+    return level[0]
+
+def count_series_parallel(data_dir: Path, series_list: list, workers: int):
+    # Un fichier = une tache ; les resultats arrivent dans l'ordre de soumission,
+    # chaque serie est rendue des que tous ses fichiers sont comptes.
+    files_by_series = [(name, list_subtitle_files(data_dir / name)) for name in series_list]
+    tasks = [file_path for _, files in files_by_series for file_path in files]
+    chunksize = max(1, len(tasks) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(count_words_in_file, tasks, chunksize=chunksize)
+        for series_name, files in files_by_series:
+            yield series_name, merge_counters([next(results) for _ in files])
+
 def save_word_count(counter: Counter, output_file: Path):
     with open(output_file, 'w', encoding='utf-8') as f:
         for word, count in counter.most_common():
@@ -78,6 +192,7 @@ def save_word_count(counter: Counter, output_file: Path):
 def main():
     parser = argparse.ArgumentParser(description="Compter les mots dans les fichiers SRT/SUB de chaque série")
     parser.add_argument('--data-dir', type=str, required=True, help="Dossier contenant les séries (chaque sous-dossier = une série)")
+    parser.add_argument('--workers', type=int, default=1, help="Nombre de processus (1 = traitement séquentiel)")
     args = parser.parse_args()
     
     data_dir = Path(args.data_dir)
@@ -93,9 +208,13 @@ def main():
         print("❌ Aucun sous-dossier trouvé dans le dossier principal.")
         return
     
-    for series_name in series_list:
-        series_dir = data_dir / series_name
-        word_counter = count_words_in_series(series_dir)
+    start = time.perf_counter()
+    if args.workers > 1:
+        counted = count_series_parallel(data_dir, series_list, args.workers)
+    else:
+        counted = ((name, count_words_in_series(data_dir / name)) for name in series_list)
+
+    for series_name, word_counter in counted:
         if word_counter:
             output_file = word_freq_dir / f"{series_name}.txt"
             save_word_count(word_counter, output_file)
@@ -103,5 +222,11 @@ def main():
         else:
             print(f"⚠️ {series_name}: aucun fichier SRT/SUB trouvé ou vide")
 
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    files = [f for name in series_list for f in list_subtitle_files(data_dir / name)]
+    total_mb = sum(f.stat().st_size for f in files) / (1024 * 1024)
+    print(f"⏱️ {len(files)} fichiers, {total_mb:.1f} Mo en {elapsed:.2f}s "
+          f"({len(files) / elapsed:.1f} fichiers/s, {total_mb / elapsed:.2f} Mo/s, {args.workers} processus)")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,158 @@
+"""
+db.py
+Role : connexions SQLite partagees par app.py, recommend.py, search.py et
+corpus.py.
+
+Un pool par (fichier, mode) : les connexions sont ouvertes une fois, reglees
+(journal WAL, mmap_size, cache_size, busy timeout, cache de requetes
+preparees agrandi) puis rendues au pool apres usage au lieu d'etre fermees.
+Une connexion reutilisee garde son cache de pages et ses requetes preparees
+(sqlite3 les met en cache par texte SQL).
+
+Les connexions en lecture seule sont ouvertes en mode=ro (URI) : les APIs de
+lecture ne peuvent pas ecrire par erreur, et ne prennent jamais de verrou
+d'ecriture.
+
+Reglages par variables d'environnement : SQLITE_MMAP_SIZE (octets),
+SQLITE_CACHE_KIB, SQLITE_POOL_MAX_IDLE.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import quote
+
+MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+CACHE_SIZE_KIB = int(os.environ.get("SQLITE_CACHE_KIB", 16 * 1024))
+# Connexions inactives gardees par pool ; au-dela, elles sont fermees au retour.
+MAX_IDLE = int(os.environ.get("SQLITE_POOL_MAX_IDLE", 16))
+CACHED_STATEMENTS = 256
+BUSY_TIMEOUT = 5.0
+
+
+class ConnectionPool:
+    """
+    Connexions d'un fichier SQLite dans un mode (lecture seule ou non).
+    acquire() reprend une connexion inactive (ou en ouvre une), release() la
+    rend ; une connexion n'est utilisee que par un thread a la fois.
+    """
+
+    def __init__(self, db_path: str, readonly: bool = False, max_idle: int = MAX_IDLE):
+        self.db_path = db_path
+        self.readonly = readonly
+        self.max_idle = max_idle
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._wal_checked = False
+        self._stats = {"opened": 0, "reused": 0, "closed": 0, "in_use": 0, "peak_in_use": 0}
+
+    def _open(self) -> sqlite3.Connection:
+        if self.readonly:
+            uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+            conn = sqlite3.connect(
+                uri, uri=True, timeout=BUSY_TIMEOUT, check_same_thread=False, cached_statements=CACHED_STATEMENTS
+            )
+        else:
+            conn = sqlite3.connect(
+                self.db_path, timeout=BUSY_TIMEOUT, check_same_thread=False, cached_statements=CACHED_STATEMENTS
+            )
+            if not self._wal_checked:
+                # Le mode WAL est enregistre dans le fichier : une fois suffit.
+                conn.execute("PRAGMA journal_mode=WAL")
+                self._wal_checked = True
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Processus fils (fork) : les connexions du parent ne doivent pas etre reprises.
+                self._idle = []
+                self._pid = os.getpid()
+            conn = self._idle.pop() if self._idle else None
+            self._stats["reused" if conn is not None else "opened"] += 1
+            self._stats["in_use"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._stats["in_use"])
+        if conn is None:
+            try:
+                conn = self._open()
+            except sqlite3.Error:
+                with self._lock:
+                    self._stats["in_use"] -= 1
+                raise
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        try:
+            if conn.in_transaction:
+                # Transaction laissee ouverte (exception, oubli de commit) : annulee.
+                conn.rollback()
+            keep = True
+        except sqlite3.Error:
+            keep = False
+        with self._lock:
+            self._stats["in_use"] -= 1
+            if keep and self._pid == os.getpid() and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+            self._stats["closed"] += 1
+        conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            stats: Dict[str, object] = dict(self._stats)
+            stats["idle"] = len(self._idle)
+        stats["db_path"] = self.db_path
+        stats["readonly"] = self.readonly
+        return stats
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._stats["closed"] += len(idle)
+        for conn in idle:
+            conn.close()
+
+
+_pools: Dict[Tuple[str, bool], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, readonly: bool = False) -> ConnectionPool:
+    """Pool partage de `db_path` (un par chemin absolu et par mode)."""
+    key = (os.path.abspath(db_path), readonly)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(key, ConnectionPool(db_path, readonly))
+    return pool
+
+
+@contextmanager
+def connection(db_path: str, readonly: bool = False) -> Iterator[sqlite3.Connection]:
+    """Connexion empruntee au pool de `db_path` le temps du bloc `with`."""
+    with get_pool(db_path, readonly).connection() as conn:
+        yield conn
+
+
+def pool_stats() -> List[Dict[str, object]]:
+    """Compteurs de tous les pools (ouvertures, reutilisations, connexions en cours...)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
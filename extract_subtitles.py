@@ -4,16 +4,33 @@ Script pour extraire toutes les archives (.zip, .7z) dans un dossier principal
 et tous ses sous-dossiers, récursivement, jusqu'à ce qu'il ne reste que les
 fichiers de sous-titres (.srt, .sub).
 
+Les archives sont traitées par une file de travail : le dossier n'est parcouru
+qu'une fois, les archives imbriquées sont ajoutées à la file dès leur
+extraction, et plusieurs archives sont extraites en parallèle (une seule à la
+fois par dossier). Un journal permet de reprendre une extraction interrompue
+sans ré-extraire les archives déjà traitées.
+
+Avec --stream, rien n'est écrit sur le disque : les sous-titres sont lus
+directement dans les archives et comptés (sortie identique à
+count_words_series.py, dans data_word_frequency/).
+
+count_words_series.py et subtitle_pipeline.py lisent eux-mêmes les archives
+en mémoire : cette extraction n'est plus une étape obligatoire du pipeline,
+seulement un moyen d'inspecter les fichiers.
+
 Usage:
-    python extract_all_subtitles.py --data-dir /chemin/vers/dossier
+    python extract_all_subtitles.py --data-dir /chemin/vers/dossier [--workers 4] [--stream]
 """
 
 import os
 import sys
+import json
 import zipfile
 import logging
 import argparse
+import threading
 from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 try:
     import py7zr
@@ -32,27 +49,31 @@ logger = logging.getLogger(__name__)
 
 ARCHIVE_EXTENSIONS = {'.zip', '.7z'}
 SUBTITLE_EXTENSIONS = {'.srt', '.sub'}
+JOURNAL_NAME = '.extraction_journal.jsonl'
 
-def extract_zip(archive_path: Path, extract_to: Path) -> bool:
+def extract_zip(archive_path: Path, extract_to: Path):
+    """Retourne la liste des membres extraits, ou None en cas d'échec."""
     try:
         with zipfile.ZipFile(archive_path, 'r') as zip_ref:
             zip_ref.extractall(extract_to)
-        return True
+            return zip_ref.namelist()
     except Exception as e:
         logger.error(f"Échec extraction ZIP {archive_path}: {e}")
-        return False
+        return None
 
-def extract_7z(archive_path: Path, extract_to: Path) -> bool:
+def extract_7z(archive_path: Path, extract_to: Path):
+    """Retourne la liste des membres extraits, ou None en cas d'échec."""
     if not SEVENZ_AVAILABLE:
         logger.error(f"7Z non supporté (py7zr manquant): {archive_path}")
-        return False
+        return None
     try:
         with py7zr.SevenZipFile(archive_path, mode='r') as z:
+            names = z.getnames()
             z.extractall(extract_to)
-        return True
+            return names
     except Exception as e:
         logger.error(f"Échec extraction 7Z {archive_path}: {e}")
-        return False
+        return None
 
 # Liste des fichiers connus corrompus
 CORRUPT_FILES = {
@@ -64,32 +85,124 @@ CORRUPT_FILES = {
     "xfiless03VF.zip"
 }
 
-def extract_archive(archive_path: Path) -> bool:
+def extract_archive(archive_path: Path):
+    """Extrait l'archive à côté d'elle. Retourne les archives imbriquées extraites, ou None en cas d'échec."""
     if archive_path.name in CORRUPT_FILES:
         logger.info(f"Fichier corrompu détecté, ignoré : {archive_path.name}")
-        return False
+        return None
     # sinon on continue normalement
     extension = archive_path.suffix.lower()
     extract_to = archive_path.parent
     logger.info(f"Extraction {archive_path.name} vers {extract_to}")
     if extension == '.zip':
-        return extract_zip(archive_path, extract_to)
+        members = extract_zip(archive_path, extract_to)
     elif extension == '.7z':
-        return extract_7z(archive_path, extract_to)
+        members = extract_7z(archive_path, extract_to)
     else:
         logger.warning(f"Format non supporté: {extension}")
-        return False
-
-def recursive_extract(data_dir: Path):
-    """Extrait toutes les archives dans data_dir récursivement jusqu'à ce qu'il n'en reste plus."""
-    while True:
-        archives = [p for p in data_dir.rglob("*") if p.suffix.lower() in ARCHIVE_EXTENSIONS]
-        if not archives:
-            break  # Plus aucune archive à extraire
-
-        for archive_path in archives:
-            if extract_archive(archive_path):
-                archive_path.unlink()  # Supprime l'archive après extraction
+        return None
+    if members is None:
+        return None
+    return [extract_to / name for name in members if Path(name).suffix.lower() in ARCHIVE_EXTENSIONS]
+
+class ExtractionJournal:
+    """
+    Journal des archives déjà extraites (une ligne JSON par archive), pour
+    reprendre une extraction interrompue. Une archive est reconnue par son
+    chemin relatif, sa taille et son mtime.
+    """
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = data_dir
+        self.path = data_dir / JOURNAL_NAME
+        self._lock = threading.Lock()
+        self._done = set()
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # ligne tronquée par l'interruption
+                    self._done.add((entry['archive'], entry['size'], entry['mtime_ns']))
+            logger.info(f"Reprise : {len(self._done)} archives déjà extraites d'après {self.path.name}")
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _key(self, archive_path: Path):
+        stat = archive_path.stat()
+        return archive_path.relative_to(self.data_dir).as_posix(), stat.st_size, stat.st_mtime_ns
+
+    def is_done(self, archive_path: Path) -> bool:
+        return self._key(archive_path) in self._done
+
+    def mark_done(self, archive_path: Path):
+        archive, size, mtime_ns = self._key(archive_path)
+        with self._lock:
+            self._done.add((archive, size, mtime_ns))
+            self._file.write(json.dumps({'archive': archive, 'size': size, 'mtime_ns': mtime_ns}) + '\n')
+            self._file.flush()
+
+    def close(self, completed: bool):
+        self._file.close()
+        if completed:
+            self.path.unlink()
+
+def recursive_extract(data_dir: Path, workers: int = 4):
+    """
+    Extrait toutes les archives de data_dir, archives imbriquées comprises.
+    Un seul parcours du dossier ; les archives imbriquées sont mises en file dès leur extraction.
+    """
+    journal = ExtractionJournal(data_dir)
+    dir_locks = {}
+    dir_locks_guard = threading.Lock()
+
+    def process(archive_path: Path):
+        # Une archive à la fois par dossier : deux archives voisines peuvent contenir les mêmes fichiers.
+        with dir_locks_guard:
+            lock = dir_locks.setdefault(archive_path.parent, threading.Lock())
+        with lock:
+            if journal.is_done(archive_path):
+                nested = []  # déjà extraite avant l'interruption ; ses archives imbriquées sont sur le disque
+            else:
+                nested = extract_archive(archive_path)
+                if nested is None:
+                    return []
+                journal.mark_done(archive_path)
+            archive_path.unlink()  # Supprime l'archive après extraction
+        return [p for p in nested if p.exists()]
+
+    archives = [p for p in data_dir.rglob("*") if p.is_file() and p.suffix.lower() in ARCHIVE_EXTENSIONS]
+    extracted = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(process, p) for p in archives}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    extracted += 1
+                    pending.update(pool.submit(process, p) for p in future.result())
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            journal.close(completed=False)
+            raise
+    journal.close(completed=True)
+    logger.info(f"{extracted} archives traitées")
+
+def stream_count(data_dir: Path):
+    """Compte les mots de chaque série directement dans les archives, sans extraction."""
+    from count_words_series import get_available_series, save_word_count
+    from subtitle_pipeline import count_series
+
+    word_freq_dir = data_dir.parent / "data_word_frequency"
+    word_freq_dir.mkdir(exist_ok=True)
+    for series_name in get_available_series(data_dir):
+        counter, _, n_files, _ = count_series(data_dir, series_name)
+        if counter:
+            save_word_count(counter, word_freq_dir / f"{series_name}.txt")
+            logger.info(f"{series_name}: {n_files} sous-titres, {sum(counter.values())} mots")
+        else:
+            logger.warning(f"{series_name}: aucun fichier SRT/SUB trouvé ou vide")
 
 def clean_only_subtitles(data_dir: Path):
     """Supprime tous les fichiers qui ne sont pas des sous-titres (.srt ou .sub)."""
@@ -100,6 +213,9 @@ def clean_only_subtitles(data_dir: Path):
 def main():
     parser = argparse.ArgumentParser(description="Extraction récursive des sous-titres")
     parser.add_argument('--data-dir', type=str, required=True, help='Dossier principal contenant les séries')
+    parser.add_argument('--workers', type=int, default=4, help="Nombre d'archives extraites en parallèle")
+    parser.add_argument('--stream', action='store_true',
+                        help="Lit les sous-titres dans les archives et écrit data_word_frequency/ sans rien extraire")
     args = parser.parse_args()
 
     data_dir = Path(args.data_dir)
@@ -107,8 +223,13 @@ def main():
         logger.error(f"Dossier non trouvé: {data_dir}")
         sys.exit(1)
 
+    if args.stream:
+        logger.info(f"Comptage en flux depuis : {data_dir}")
+        stream_count(data_dir)
+        return
+
     logger.info(f"Début de l'extraction récursive depuis : {data_dir}")
-    recursive_extract(data_dir)
+    recursive_extract(data_dir, workers=args.workers)
     logger.info("Extraction terminée. Nettoyage des fichiers inutiles...")
     clean_only_subtitles(data_dir)
     logger.info("Nettoyage terminé. Il ne reste plus que les fichiers .srt et .sub.")
@@ -16,6 +16,8 @@ import argparse
 import requests
 import os
 
+from catalog import bump_catalog_version
+
 # -------------------
 # ARGUMENTS
 # -------------------
@@ -105,6 +107,7 @@ def main():
 
             if changed:
                 cur.execute("UPDATE tvshow SET synopsis=?, image_url=? WHERE id=?", (synopsis, image_url, serie_id))
+                bump_catalog_version(conn)
                 conn.commit()
                 updated += 1
                 print(f"[{i}/{total}] Metadata mis à jour: {name}")
@@ -18,6 +18,8 @@ import re
 import os
 from urllib import request, parse
 
+from catalog import bump_catalog_version
+
 # -------------------
 # ARGUMENTS
 # -------------------
@@ -117,6 +119,7 @@ def main():
 
             if changed:
                 cur.execute("UPDATE tvshow SET synopsis=?, image_url=? WHERE id=?", (synopsis, image_url, serie_id))
+                bump_catalog_version(conn)
                 conn.commit()
                 updated += 1
                 print(f"[{i}/{total}] Updated: {name}")
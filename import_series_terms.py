@@ -1,86 +1,193 @@
 #!/usr/bin/env python3
 import os
+import time
+from contextlib import contextmanager
 from pathlib import Path
 import sqlite3
 import argparse
 
+from catalog import bump_catalog_version
+from tokenizer import term_tokens
+
+TERM_INDEX_NAME = "idx_tvshow_term_show_term"
+TERM_INDEX_SQL = f"CREATE INDEX IF NOT EXISTS {TERM_INDEX_NAME} ON tvshow_term(tvshow_id, term_id)"
+
+# Limite de parametres d'une requete SQLite (SQLITE_MAX_VARIABLE_NUMBER des anciennes versions).
+SQL_CHUNK = 900
+
 # -------------------
-# ARGUMENTS
+# CHARGEMENT EN MASSE
 # -------------------
-parser = argparse.ArgumentParser(description="Importer les fichiers clean dans la base SQLite")
-parser.add_argument('--dir', type=str, required=False,
-                    help="Chemin vers le dossier 'data_word_frequency_clean'")
-parser.add_argument('--db', type=str, default=os.path.join('database', 'tvshow.db'),
-                    help="Chemin vers le fichier SQLite")
-args = parser.parse_args()
+@contextmanager
+def bulk_session(conn, drop_index=False):
+    """
+    Reglages SQLite pour un chargement massif : journal WAL, synchronous=OFF
+    (remis a sa valeur initiale en sortie) et, en option, suppression de l'index
+    secondaire de tvshow_term, reconstruit une seule fois a la fin.
+    Le journal reste en WAL : c'est le mode de la base (db.py le regle a chaque
+    connexion de l'application), le quitter generait les connexions ouvertes.
+    """
+    previous_sync = conn.execute("PRAGMA synchronous").fetchone()[0]
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    if drop_index:
+        conn.execute(f"DROP INDEX IF EXISTS {TERM_INDEX_NAME}")
+    try:
+        yield conn
+    finally:
+        if drop_index:
+            start = time.perf_counter()
+            conn.execute(TERM_INDEX_SQL)
+            conn.commit()
+            print(f"Index {TERM_INDEX_NAME} reconstruit en {time.perf_counter() - start:.2f}s")
+        conn.execute(f"PRAGMA synchronous={previous_sync}")
+
+
+def bulk_insert_terms(conn, rows, or_clause="OR IGNORE"):
+    """Insere un iterable de (tvshow_id, term_id, count) en un seul executemany. Retourne le nb de lignes."""
+    cur = conn.executemany(
+        f"INSERT {or_clause} INTO tvshow_term (tvshow_id, term_id, count) VALUES (?, ?, ?)",
+        rows,
+    )
+    return cur.rowcount
+
 
 # -------------------
-# CHEMINS
+# DICTIONNAIRE DES TERMES
 # -------------------
-DATA_DIR = Path(args.dir) if args.dir else Path("data_word_frequency_clean")
-DB_PATH = Path(args.db)
+class TermDictionary:
+    """
+    Correspondance texte normalise -> term.id, chargee une fois puis completee
+    au fil de l'import : les termes absents sont crees (INSERT OR IGNORE) puis
+    relus par paquets.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._ids = dict(conn.execute("SELECT text, id FROM term"))
+
+    def ids(self, words):
+        """Ids de `words` (dictionnaire partage : ne pas le modifier)."""
+        missing = [word for word in dict.fromkeys(words) if word not in self._ids]
+        if missing:
+            self.conn.executemany("INSERT OR IGNORE INTO term (text) VALUES (?)", ((word,) for word in missing))
+            for start in range(0, len(missing), SQL_CHUNK):
+                chunk = missing[start:start + SQL_CHUNK]
+                self._ids.update(self.conn.execute(
+                    f"SELECT text, id FROM term WHERE text IN ({', '.join('?' * len(chunk))})", chunk
+                ))
+        return self._ids
+
+
+def refresh_term_df(conn):
+    """Recalcule term.df (nombre de series contenant le terme) depuis tvshow_term."""
+    conn.execute(
+        """
+        UPDATE term SET df = (
+            SELECT COUNT(*) FROM tvshow_term WHERE tvshow_term.term_id = term.id AND tvshow_term.count > 0
+        )
+        """
+    )
+
+
+def aggregate_terms(rows):
+    """Somme les (mot, compte) par terme normalise (tokenizer.term_tokens)."""
+    counts = {}
+    for word, count in rows:
+        for token in term_tokens(word):
+            counts[token] = counts.get(token, 0.0) + count
+    return counts
+
+
+def show_ids_by_name(conn, names):
+    """Nom -> id pour `names`, en creant les series absentes (premier id si doublon)."""
+    ids = {}
+    for show_id, name in conn.execute("SELECT id, name FROM tvshow ORDER BY id"):
+        ids.setdefault(name, show_id)
+    missing = [(name,) for name in names if name not in ids]
+    conn.executemany("INSERT INTO tvshow (name) VALUES (?)", missing)
+    if missing:
+        for show_id, name in conn.execute("SELECT id, name FROM tvshow ORDER BY id"):
+            ids.setdefault(name, show_id)
+    return ids
+
+
+def iter_word_counts(file_path):
+    """Paires (mot, compte) d'un fichier 'mot:compte'."""
+    with file_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if ":" not in line:
+                continue
+            term, count_str = line.split(":", 1)
+            try:
+                count = float(count_str.strip())
+            except ValueError:
+                continue
+            yield term.strip(), count
+
+
+def iter_term_rows(conn, data_dir, show_ids):
+    """
+    Lignes (tvshow_id, term_id, count) des fichiers de data_dir. Les mots sont
+    normalises et agreges par serie avant l'insertion.
+    """
+    terms = TermDictionary(conn)
+    for serie_name, serie_id in show_ids:
+        file_path = data_dir / f"{serie_name}.txt"
+        if not file_path.exists():
+            continue
+        counts = aggregate_terms(iter_word_counts(file_path))
+        ids = terms.ids(counts)
+        for token, count in counts.items():
+            yield serie_id, ids[token], count
 
 # -------------------
 # FONCTION PRINCIPALE
 # -------------------
 def main():
-    if not DATA_DIR.exists():
-        print(f"Le dossier {DATA_DIR} n'existe pas ! Lancer depuis la racine du projet.")
-        return
+    parser = argparse.ArgumentParser(description="Importer les fichiers clean dans la base SQLite")
+    parser.add_argument('--dir', type=str, required=False,
+                        help="Chemin vers le dossier 'data_word_frequency_clean'")
+    parser.add_argument('--db', type=str, default=os.path.join('database', 'tvshow.db'),
+                        help="Chemin vers le fichier SQLite")
+    parser.add_argument('--drop-index', action='store_true',
+                        help=f"Supprime {TERM_INDEX_NAME} pendant l'import et le reconstruit à la fin")
+    args = parser.parse_args()
 
-    if not DB_PATH.exists():
-        print(f"Base de données introuvable: {DB_PATH}. Initialisez-la d'abord.")
+    data_dir = Path(args.dir) if args.dir else Path("data_word_frequency_clean")
+    db_path = Path(args.db)
+
+    if not data_dir.exists():
+        print(f"Le dossier {data_dir} n'existe pas ! Lancer depuis la racine du projet.")
         return
 
-    # Connexion SQLite
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    # --- Ajouter les séries dans tvshow ---
-    print("Ajout des séries dans TVShow...")
-    tvshows = []
-    for file_path in sorted(DATA_DIR.glob("*.txt")):
-        serie_name = file_path.stem
-        tvshows.append(serie_name)
-        cur.execute("INSERT OR IGNORE INTO tvshow (name) VALUES (?)", (serie_name,))
-    conn.commit()
-    print(f"{len(tvshows)} séries ajoutées (ou déjà existantes).")
-
-    # --- Ajouter les termes dans tvshow_term ---
-    print("Ajout des termes dans TVShowTerm...")
-    for serie_name in tvshows:
-        cur.execute("SELECT id FROM tvshow WHERE name = ?", (serie_name,))
-        row = cur.fetchone()
-        if not row:
-            continue
-        serie_id = row[0]
+    if not db_path.exists():
+        print(f"Base de données introuvable: {db_path}. Initialisez-la d'abord.")
+        return
 
-        file_path = DATA_DIR / f"{serie_name}.txt"
-        if not file_path.exists():
-            continue
+    conn = sqlite3.connect(db_path)
+    start = time.perf_counter()
+    with bulk_session(conn, drop_index=args.drop_index):
+        with conn:
+            # --- Ajouter les séries dans tvshow ---
+            print("Ajout des séries dans TVShow...")
+            tvshows = [file_path.stem for file_path in sorted(data_dir.glob("*.txt"))]
+            ids = show_ids_by_name(conn, tvshows)
+            print(f"{len(tvshows)} séries ajoutées (ou déjà existantes).")
 
-        with file_path.open("r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if ":" not in line:
-                    continue
-                term, count_str = line.split(":", 1)
-                term = term.strip()
-                try:
-                    count = float(count_str.strip())
-                except ValueError:
-                    continue
-                cur.execute("""
-                    INSERT OR IGNORE INTO tvshow_term (tvshow_id, term, count)
-                    VALUES (?, ?, ?)
-                """, (serie_id, term, count))
-    conn.commit()
+            # --- Ajouter les termes dans tvshow_term (une seule transaction) ---
+            print("Ajout des termes dans TVShowTerm...")
+            n_rows = bulk_insert_terms(conn, iter_term_rows(conn, data_dir, [(name, ids[name]) for name in tvshows]))
+            refresh_term_df(conn)
+            bump_catalog_version(conn)
     conn.close()
-    print("Import terminé !")
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"Import terminé ! {n_rows} termes en {elapsed:.2f}s ({n_rows / elapsed:,.0f} lignes/s)")
 
 # -------------------
 # LANCEMENT
 # -------------------
 if __name__ == "__main__":
     main()
-
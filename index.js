@@ -199,7 +199,8 @@ document.addEventListener("DOMContentLoaded", () => {
       </div>
     `;
 
-    fetch("/api/series")
+    // Seules deux rangées (80 séries) sont affichées : inutile de charger tout le catalogue
+    fetch("/api/series?limit=80")
       .then((res) => {
         if (!res.ok) throw new Error(`HTTP ${res.status}`);
         return res.json();
@@ -1,11 +1,16 @@
 import os
 import sqlite3
 
+from catalog import APP_META_TABLE_SQL
+from ratings import RATING_STATS_TABLE_SQL, RATINGS_TABLE_SQL, uses_show_names
+
 DB_PATH = os.path.join(os.path.dirname(__file__), "tvshow.db")
 
 def main():
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     conn = sqlite3.connect(DB_PATH)
+    # Journal WAL enregistre dans le fichier : mode attendu par l'application et les imports.
+    conn.execute("PRAGMA journal_mode=WAL")
     cur = conn.cursor()
 
     # Users
@@ -32,32 +37,34 @@ def main():
         """
     )
 
-    # Terms (bag of words)
+    # Term dictionary (normalized text, tokenizer.py) and document frequency
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS tvshow_term (
+        CREATE TABLE IF NOT EXISTS term (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            tvshow_id INTEGER NOT NULL,
-            term TEXT NOT NULL,
-            count REAL NOT NULL,
-            UNIQUE(tvshow_id, term) ON CONFLICT REPLACE
+            text TEXT NOT NULL UNIQUE,
+            df INTEGER NOT NULL DEFAULT 0
         )
         """
     )
 
-    # Ratings (current schema used by app.py)
+    # Terms (bag of words), keyed by term id
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS ratings (
+        CREATE TABLE IF NOT EXISTS tvshow_term (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            tvshow_name TEXT NOT NULL,
-            rating INTEGER NOT NULL,
-            UNIQUE(username, tvshow_name) ON CONFLICT REPLACE
+            tvshow_id INTEGER NOT NULL,
+            term_id INTEGER NOT NULL,
+            count REAL NOT NULL,
+            UNIQUE(tvshow_id, term_id) ON CONFLICT REPLACE
         )
         """
     )
 
+    # Ratings by show id, with per-show count and sum (ratings.py)
+    cur.execute(RATINGS_TABLE_SQL)
+    cur.execute(RATING_STATS_TABLE_SQL)
+
     # My list
     cur.execute(
         """
@@ -70,9 +77,47 @@ def main():
         """
     )
 
+    # Precomputed personal recommendations (recommend.build_user_recommendations)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_recommendations (
+            username TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            tvshow_name TEXT NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (username, rank)
+        )
+        """
+    )
+
+    # ETL manifest (subtitle_pipeline.py --incremental)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS etl_manifest (
+            path TEXT PRIMARY KEY,
+            series TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            digest TEXT NOT NULL,
+            counts TEXT NOT NULL
+        )
+        """
+    )
+
+    # Application metadata (catalog.py : catalog_version)
+    cur.execute(APP_META_TABLE_SQL)
+
     # Indexes
     cur.execute("CREATE INDEX IF NOT EXISTS idx_tvshow_name ON tvshow(name)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_tvshow_term_show_term ON tvshow_term(tvshow_id, term)")
+    tvshow_term_columns = {row[1] for row in cur.execute("PRAGMA table_info(tvshow_term)")}
+    if "term_id" in tvshow_term_columns:
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_tvshow_term_show_term ON tvshow_term(tvshow_id, term_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_tvshow_term_term ON tvshow_term(term_id)")
+    else:
+        print("tvshow_term utilise encore des termes texte : lancer python migrate_term_ids.py")
+    if uses_show_names(conn):
+        print("ratings utilise encore des noms de series : lancer python migrate_ratings.py")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_etl_manifest_series ON etl_manifest(series)")
 
     conn.commit()
     conn.close()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+migrate_ratings.py
+Role : migration de la table ratings vers les identifiants de series.
+
+Avant : ratings(username, tvshow_name TEXT, rating), jointe a tvshow par
+lower(name). Apres : ratings(username, tvshow_id, rating) et rating_stats
+(tvshow_id, count, sum), voir ratings.py.
+
+Chaque nom est resolu comme dans l'application (series_meta.py) : nom exact,
+sinon a la casse pres ; pour des homonymes, la serie de plus petit id. Si deux
+anciennes notes d'un utilisateur tombent sur la meme serie ("Lost" et "lost"),
+la plus recente est gardee. Les notes dont le nom ne correspond a aucune serie
+sont conservees dans ratings_unmatched au lieu d'etre perdues.
+
+La migration se fait en une transaction : ratings est renommee, la nouvelle
+table remplie, puis l'ancienne supprimee.
+
+Usage:
+    python migrate_ratings.py [--db database/tvshow.db]
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Tuple
+
+from ratings import RATINGS_TABLE_SQL, ensure_ratings_tables, rebuild_rating_stats, uses_show_names
+from series_meta import SeriesMeta
+
+UNMATCHED_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS ratings_unmatched (
+        username TEXT NOT NULL,
+        tvshow_name TEXT NOT NULL,
+        rating INTEGER NOT NULL
+    )
+"""
+
+
+def migrate(conn: sqlite3.Connection) -> Tuple[int, int]:
+    """Migre ratings ; retourne (notes migrees, notes sans serie correspondante)."""
+    meta = SeriesMeta.from_db(conn)
+    migrated = []
+    unmatched = []
+    # Ordre d'insertion : en cas de doublon, la note la plus recente ecrase les autres.
+    for username, name, rating in conn.execute(
+        "SELECT username, tvshow_name, rating FROM ratings ORDER BY id"
+    ):
+        record = meta.find(name)
+        if record is None:
+            unmatched.append((username, name, rating))
+        else:
+            migrated.append((username, record.id, rating))
+
+    with conn:
+        # BEGIN explicite : sinon sqlite3 validerait chaque ordre DDL a part.
+        conn.execute("BEGIN")
+        conn.execute("ALTER TABLE ratings RENAME TO ratings_legacy")
+        # Supprime aussi les index de l'ancienne table (dont idx_ratings_user_show).
+        conn.execute("DROP INDEX IF EXISTS idx_ratings_user_show")
+        conn.execute(RATINGS_TABLE_SQL)
+        conn.executemany(
+            """
+            INSERT INTO ratings (username, tvshow_id, rating)
+            VALUES (?, ?, ?)
+            ON CONFLICT(username, tvshow_id)
+            DO UPDATE SET rating = excluded.rating
+            """,
+            migrated,
+        )
+        if unmatched:
+            conn.execute(UNMATCHED_TABLE_SQL)
+            conn.executemany(
+                "INSERT INTO ratings_unmatched (username, tvshow_name, rating) VALUES (?, ?, ?)",
+                unmatched,
+            )
+        conn.execute("DROP TABLE ratings_legacy")
+        rebuild_rating_stats(conn)
+    return len(migrated), len(unmatched)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrer ratings des noms de series vers tvshow_id")
+    parser.add_argument("--db", type=str, default=os.path.join("database", "tvshow.db"),
+                        help="Chemin vers le fichier SQLite")
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    if not db_path.exists():
+        print(f"Base de données introuvable: {db_path}. Initialisez-la d'abord.")
+        return
+
+    conn = sqlite3.connect(db_path)
+    try:
+        if not uses_show_names(conn):
+            with conn:
+                ensure_ratings_tables(conn)
+                n_series = rebuild_rating_stats(conn)
+            print(f"ratings utilise déjà tvshow_id : rating_stats recalculée ({n_series} séries notées).")
+            return
+        start = time.perf_counter()
+        n_migrated, n_unmatched = migrate(conn)
+        n_series = conn.execute("SELECT COUNT(*) FROM rating_stats").fetchone()[0]
+        print(
+            f"Migration terminée : {n_migrated} notes, {n_series} séries notées "
+            f"en {time.perf_counter() - start:.2f}s"
+        )
+        if n_unmatched:
+            print(f"{n_unmatched} notes sans série correspondante, gardées dans ratings_unmatched.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
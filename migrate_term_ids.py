@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+migrate_term_ids.py
+Role : migration de tvshow_term vers le dictionnaire de termes.
+
+Avant : tvshow_term(tvshow_id, term TEXT, count), termes bruts par serie.
+Apres : term(id, text, df) avec les termes normalises (tokenizer.py) et
+tvshow_term(tvshow_id, term_id, count). Les anciens termes sont decoupes et
+normalises une seule fois ici ("Aujourd'hui" -> "aujourd", "hui"), et leurs
+comptes additionnes par (serie, terme).
+
+La migration se fait en une transaction : tvshow_term est renommee, la
+nouvelle table remplie, puis l'ancienne supprimee. VACUUM rend ensuite la
+place liberee (sauf --no-vacuum). Une table tvshow_term_legacy laissee par
+une migration interrompue est remise en place avant de recommencer.
+
+Usage:
+    python migrate_term_ids.py [--db database/tvshow.db] [--no-vacuum]
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from catalog import bump_catalog_version
+from import_series_terms import TERM_INDEX_SQL, bulk_insert_terms
+from tokenizer import term_tokens
+
+TERM_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS term (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        text TEXT NOT NULL UNIQUE,
+        df INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+TVSHOW_TERM_TABLE_SQL = """
+    CREATE TABLE tvshow_term (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tvshow_id INTEGER NOT NULL,
+        term_id INTEGER NOT NULL,
+        count REAL NOT NULL,
+        UNIQUE(tvshow_id, term_id) ON CONFLICT REPLACE
+    )
+"""
+
+
+def needs_migration(conn: sqlite3.Connection) -> bool:
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(tvshow_term)")}
+    return "term" in columns and "term_id" not in columns
+
+
+def restore_legacy_table(conn: sqlite3.Connection) -> bool:
+    """
+    Remet tvshow_term_legacy (anciens termes en texte) a la place de tvshow_term
+    si une migration precedente s'est arretee en cours de route. Retourne True
+    si la table a ete restauree.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(tvshow_term_legacy)")}
+    if "term" not in columns:
+        return False
+    with conn:
+        conn.execute("BEGIN")
+        conn.execute("DROP TABLE IF EXISTS tvshow_term")
+        conn.execute("ALTER TABLE tvshow_term_legacy RENAME TO tvshow_term")
+    return True
+
+
+def iter_migrated_rows(conn: sqlite3.Connection, term_ids: dict, doc_freq: dict):
+    """
+    Lignes (tvshow_id, term_id, count) de la nouvelle table, une serie a la fois
+    (l'ancienne table est lue triee par serie). Remplit term_ids et doc_freq.
+    """
+    cursor = conn.execute(
+        "SELECT tvshow_id, term, count FROM tvshow_term_legacy WHERE count > 0 ORDER BY tvshow_id"
+    )
+    current_show = None
+    bag = {}
+    for show_id, term, count in cursor:
+        if show_id != current_show:
+            yield from _flush(current_show, bag, term_ids, doc_freq)
+            current_show, bag = show_id, {}
+        for token in term_tokens(term or ""):
+            bag[token] = bag.get(token, 0.0) + float(count)
+    yield from _flush(current_show, bag, term_ids, doc_freq)
+
+
+def _flush(show_id, bag: dict, term_ids: dict, doc_freq: dict):
+    for token, count in bag.items():
+        term_id = term_ids.setdefault(token, len(term_ids) + 1)
+        doc_freq[term_id] = doc_freq.get(term_id, 0) + 1
+        yield show_id, term_id, count
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Migre tvshow_term ; retourne le nombre de lignes de la nouvelle table."""
+    term_ids: dict = {}
+    doc_freq: dict = {}
+    with conn:
+        # BEGIN explicite : sinon sqlite3 validerait chaque ordre DDL a part.
+        conn.execute("BEGIN")
+        conn.execute("DROP TABLE IF EXISTS term")
+        conn.execute(TERM_TABLE_SQL)
+        conn.execute("ALTER TABLE tvshow_term RENAME TO tvshow_term_legacy")
+        conn.execute(TVSHOW_TERM_TABLE_SQL)
+        # L'ancienne table est lue (curseur a part) pendant que la nouvelle est remplie.
+        n_rows = bulk_insert_terms(conn, iter_migrated_rows(conn, term_ids, doc_freq))
+        conn.executemany(
+            "INSERT INTO term (id, text, df) VALUES (?, ?, ?)",
+            ((term_id, text, doc_freq.get(term_id, 0)) for text, term_id in term_ids.items()),
+        )
+        # Supprime aussi les index de l'ancienne table (dont idx_tvshow_term_show_term).
+        conn.execute("DROP TABLE tvshow_term_legacy")
+        conn.execute(TERM_INDEX_SQL)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tvshow_term_term ON tvshow_term(term_id)")
+        bump_catalog_version(conn)
+    return n_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrer tvshow_term vers le dictionnaire de termes (term_id)")
+    parser.add_argument("--db", type=str, default=os.path.join("database", "tvshow.db"),
+                        help="Chemin vers le fichier SQLite")
+    parser.add_argument("--no-vacuum", action="store_true",
+                        help="Ne pas lancer VACUUM apres la migration")
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    if not db_path.exists():
+        print(f"Base de données introuvable: {db_path}. Initialisez-la d'abord.")
+        return
+
+    conn = sqlite3.connect(db_path)
+    try:
+        if restore_legacy_table(conn):
+            print("Migration précédente interrompue : tvshow_term_legacy restaurée.")
+        if not needs_migration(conn):
+            print("tvshow_term utilise déjà term_id : rien à migrer.")
+            return
+        size_before = db_path.stat().st_size
+        start = time.perf_counter()
+        # Pas de bulk_session (synchronous=OFF) : la migration transforme l'unique
+        # copie des termes, elle garde le reglage synchronous par defaut.
+        n_rows = migrate(conn)
+        n_terms = conn.execute("SELECT COUNT(*) FROM term").fetchone()[0]
+        print(f"Migration terminée : {n_rows} lignes, {n_terms} termes en {time.perf_counter() - start:.2f}s")
+        if not args.no_vacuum:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            size_after = db_path.stat().st_size
+            print(f"Taille de la base : {size_before / 1e6:.1f} Mo -> {size_after / 1e6:.1f} Mo")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+ratings.py
+Role : notes des utilisateurs, indexees par tvshow_id, et agregats par serie.
+
+ratings(username, tvshow_id, rating) garde une note par (utilisateur, serie) ;
+rating_stats(tvshow_id, count, sum) en garde le nombre et la somme, mis a jour
+dans la meme transaction que chaque note : la moyenne d'une serie se lit en
+une ligne (cle primaire) au lieu d'un AVG sur toutes ses notes.
+
+Les anciennes bases (ratings.tvshow_name) se convertissent avec
+migrate_ratings.py.
+"""
+
+import sqlite3
+from typing import Optional
+
+RATINGS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS ratings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        tvshow_id INTEGER NOT NULL,
+        rating INTEGER NOT NULL,
+        UNIQUE(username, tvshow_id)
+    )
+"""
+
+RATING_STATS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS rating_stats (
+        tvshow_id INTEGER PRIMARY KEY,
+        count INTEGER NOT NULL,
+        sum INTEGER NOT NULL
+    )
+"""
+
+
+def ensure_ratings_tables(conn: sqlite3.Connection) -> None:
+    conn.execute(RATINGS_TABLE_SQL)
+    conn.execute(RATING_STATS_TABLE_SQL)
+
+
+def uses_show_names(conn: sqlite3.Connection) -> bool:
+    """True si ratings est encore indexee par nom de serie (a migrer)."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(ratings)")}
+    return "tvshow_name" in columns and "tvshow_id" not in columns
+
+
+def set_rating(conn: sqlite3.Connection, username: str, tvshow_id: int, rating: int) -> None:
+    """
+    Enregistre (ou remplace) la note de `username` pour une serie et met
+    rating_stats a jour : +1 note si elle est nouvelle, somme corrigee de
+    l'ecart avec l'ancienne sinon. Le verrou d'ecriture est pris avant de
+    lire l'ancienne note, pour que deux notes simultanees ne comptent pas
+    double.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT rating FROM ratings WHERE username = ? AND tvshow_id = ?",
+            (username, tvshow_id),
+        ).fetchone()
+        previous = row[0] if row else None
+        conn.execute(
+            """
+            INSERT INTO ratings (username, tvshow_id, rating)
+            VALUES (?, ?, ?)
+            ON CONFLICT(username, tvshow_id)
+            DO UPDATE SET rating = excluded.rating
+            """,
+            (username, tvshow_id, rating),
+        )
+        conn.execute(
+            """
+            INSERT INTO rating_stats (tvshow_id, count, sum)
+            VALUES (?, ?, ?)
+            ON CONFLICT(tvshow_id)
+            DO UPDATE SET count = count + excluded.count, sum = sum + excluded.sum
+            """,
+            (tvshow_id, 0 if previous is not None else 1, rating - (previous or 0)),
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def rebuild_rating_stats(conn: sqlite3.Connection) -> int:
+    """Recalcule rating_stats depuis ratings (sans commit) ; retourne le nombre de series notees."""
+    conn.execute(RATING_STATS_TABLE_SQL)
+    conn.execute("DELETE FROM rating_stats")
+    cursor = conn.execute(
+        """
+        INSERT INTO rating_stats (tvshow_id, count, sum)
+        SELECT tvshow_id, COUNT(*), SUM(rating) FROM ratings GROUP BY tvshow_id
+        """
+    )
+    return cursor.rowcount
+
+
+def average_rating(conn: sqlite3.Connection, tvshow_id: int) -> Optional[float]:
+    """Moyenne des notes d'une serie (arrondie a 0.1), None si elle n'est pas notee."""
+    try:
+        row = conn.execute(
+            "SELECT count, sum FROM rating_stats WHERE tvshow_id = ?", (tvshow_id,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # Base sans rating_stats (aucune note encore enregistree).
+        return None
+    if not row or not row[0]:
+        return None
+    return round(row[1] / row[0], 1)
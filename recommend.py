@@ -2,22 +2,37 @@
 
 from __future__ import annotations
 
+import argparse
+import json
 import os
-import re
+import queue
+import shutil
 import sqlite3
-import unicodedata
-from collections import Counter, defaultdict
+import threading
+import time
+from collections import Counter
 from typing import Dict, Iterable, List, Sequence, Tuple
 
 import numpy as np
-from scipy.sparse import csr_matrix
+from scipy.sparse import csr_matrix, hstack, vstack
 from sklearn.feature_extraction import DictVectorizer
-from sklearn.feature_extraction.text import TfidfTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import normalize
 
+from catalog import catalog_version
+from corpus import Corpus, load_corpus
+from db import connection
+from tokenizer import iter_tokens
+
 DB_PATH = os.path.join(os.path.dirname(__file__), "database", "tvshow.db")
 
+# Table des K plus proches voisins par série, calculée hors ligne (build_neighbour_table).
+NEIGHBOURS_DIR = os.path.join(os.path.dirname(__file__), "database", "content_neighbours")
+NEIGHBOURS_FORMAT_VERSION = 1
+NEIGHBOURS_TOP_K = 20
+
+# Recommandations personnalisées précalculées (table user_recommendations).
+USER_RECOS_TOP_N = 20
+
 # Very small bilingual stop-word list to keep only meaningful terms.
 STOP_WORDS = {
     "a",
@@ -63,159 +78,285 @@ STOP_WORDS = {
     "vous",
 }
 
-# Cached recommendation artefacts (lazy loaded).
-_series_names: List[str] = []
-_name_to_index: Dict[str, int] = {}
-_content_matrix: csr_matrix | None = None
-
-TOKEN_RE = re.compile(r"[\w']+", re.UNICODE)
-
-
-# ---------------------------------------------------------------------------
-# Database helper
-# ---------------------------------------------------------------------------
-# Nom : get_db_connection
-# But : ouvrir une connexion SQLite avec row_factory
-def get_db_connection() -> sqlite3.Connection:
-    """Ouvre une connexion SQLite avec row_factory."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Cached content model (lazy loaded). Readers take one reference to the
+# snapshot; rebuilds and updates replace it whole (see ContentModel).
+_model: ContentModel | None = None
+# Sérialise les constructions, mises à jour et remplacements du modèle (pas les
+# lectures). Public : app.py installe ses reconstructions sous le même verrou, pour
+# qu'une mise à jour incrémentale parte toujours du modèle réellement servi.
+model_lock = threading.RLock()
 
+# Table de voisins chargée en mmap : (noms, index par nom, voisins [n, K], scores [n, K]).
+_neighbours: Tuple[List[str], Dict[str, int], np.ndarray, np.ndarray] | None = None
+_neighbours_loaded = False
 
 # ---------------------------------------------------------------------------
 # Text helpers
 # ---------------------------------------------------------------------------
-def _normalise_token(token: str) -> str:
-    token = unicodedata.normalize("NFKC", token or "").lower()
-    token = token.strip("_'")
-    if len(token) <= 2 or token in STOP_WORDS:
-        return ""
-    return token
+# Découpage et normalisation : tokenizer.py (les mêmes mots que la recherche),
+# puis filtrage des mots courts et des stop-words.
+def _keep_token(token: str) -> bool:
+    return len(token) > 2 and token not in STOP_WORDS
 
 
 def _tokenise(text: str) -> List[str]:
-    tokens = []
-    for raw in TOKEN_RE.findall(text.lower()):
-        token = _normalise_token(raw)
-        if token:
-            tokens.append(token)
-    return tokens
+    return [token for token in iter_tokens(text) if _keep_token(token)]
 
 
 # ---------------------------------------------------------------------------
 # Feature construction
 # ---------------------------------------------------------------------------
-# Nom : _build_feature_space
-# But : assembler les features (termes, synopsis, bigrammes) pondérées pour chaque série
-def _build_feature_space(
-    max_repeat: int = 8,
-    term_weight: float = 2.0,
+# Nom : _term_weights
+# But : poids des termes de sous-titres à partir de leurs occurrences (tableau numpy)
+def _term_weights(counts: np.ndarray, max_repeat: int = 8, term_weight: float = 2.0) -> np.ndarray:
+    """
+    Subtitle terms are given a stronger weight than synopsis tokens; repeated
+    terms count at most `max_repeat` times.
+    """
+    return term_weight * np.clip(np.round(counts), 1.0, max_repeat)
+
+
+# Nom : _synopsis_features
+# But : features pondérées (tokens, bigrammes) du synopsis d'une seule série
+def _synopsis_features(
+    synopsis: str,
     synopsis_weight: float = 0.6,
     bigram_weight: float = 0.3,
-) -> Tuple[List[str], List[Dict[str, float]]]:
+) -> Dict[str, float]:
+    """Synopsis tokens and bigrams as one feature dictionary."""
+    synopsis_tokens = _tokenise(synopsis or "")
+    term_features: Dict[str, float] = {}
+
+    if synopsis_tokens:
+        counts = Counter(synopsis_tokens)
+        for token, freq in counts.items():
+            key = f"syn::{token}"
+            term_features[key] = term_features.get(key, 0.0) + synopsis_weight * freq
+
+        if bigram_weight > 0 and len(synopsis_tokens) >= 2:
+            for left, right in zip(synopsis_tokens, synopsis_tokens[1:]):
+                key = f"big::{left}_{right}"
+                term_features[key] = term_features.get(key, 0.0) + bigram_weight
+
+    return term_features
+
+
+# Nom : _build_feature_space
+# But : matrice de features brutes (termes, synopsis, bigrammes) de chaque série (ou d'une sélection d'ids)
+def _build_feature_space(
+    show_ids: Sequence[int] | None = None,
+    corpus: Corpus | None = None,
+) -> Tuple[List[int], List[str], List[str], csr_matrix]:
     """
-    Build feature dictionaries for every show by combining indexed terms and synopsis.
-    Terms (from subtitles) are given a stronger weight than synopsis tokens.
+    Build the raw feature matrix for every show (or only `show_ids`) from the
+    shared corpus (corpus.py; read from the database when not given).
+    Returns the show ids, names, feature keys ("term::", "syn::", "big::")
+    and the matrix rows of the shows that have at least one feature.
+    Subtitle term counts are weighted as arrays; only synopses go through
+    per-show dictionaries.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
+    if corpus is None:
+        corpus = load_corpus(DB_PATH, show_ids)
 
-    shows = cur.execute(
-        """
-        SELECT id, name, COALESCE(synopsis, '') AS synopsis
-        FROM tvshow
-        ORDER BY id
-        """
-    ).fetchall()
+    rows = [pos for pos, name in enumerate(corpus.names) if name.strip()]
+    if not rows:
+        return [], [], [], csr_matrix((0, 0))
+    ids = corpus.show_ids[rows].tolist()
+    names = [corpus.names[pos].strip() for pos in rows]
 
-    term_rows = cur.execute(
-        """
-        SELECT tvshow_id, term, count
-        FROM tvshow_term
-        WHERE count > 0
-        ORDER BY tvshow_id
-        """
-    ).fetchall()
-    conn.close()
+    # Termes déjà normalisés à l'import (table term) : seul le filtrage reste à faire,
+    # une fois par terme du vocabulaire et non par ligne.
+    kept_terms = np.flatnonzero([_keep_token(term) for term in corpus.terms])
+    term_features = corpus.counts[rows][:, kept_terms]
+    term_features.data = _term_weights(term_features.data)
 
-    terms_by_show: Dict[int, List[Tuple[str, float]]] = defaultdict(list)
-    for row in term_rows:
-        terms_by_show[row["tvshow_id"]].append((row["term"], row["count"]))
+    vectorizer = DictVectorizer()
+    synopsis_features = vectorizer.fit_transform([_synopsis_features(corpus.synopses[pos]) for pos in rows])
+    raw_features = hstack([term_features, synopsis_features], format="csr")
+    keys = [f"term::{corpus.terms[col]}" for col in kept_terms.tolist()]
+    keys += list(vectorizer.get_feature_names_out())
 
-    names: List[str] = []
-    feature_dicts: List[Dict[str, float]] = []
+    has_features = np.diff(raw_features.indptr) > 0
+    if not has_features.all():
+        raw_features = raw_features[has_features]
+        ids = [show_id for show_id, keep in zip(ids, has_features) if keep]
+        names = [name for name, keep in zip(names, has_features) if keep]
+    return ids, names, keys, raw_features
 
-    for show in shows:
-        name = (show["name"] or "").strip()
-        if not name:
-            continue
 
-        synopsis_tokens = _tokenise(show["synopsis"] or "")
-        term_features: Dict[str, float] = {}
+def _tfidf_from_counts(raw_features: csr_matrix, doc_freq: np.ndarray) -> csr_matrix:
+    """
+    Same weighting as TfidfTransformer(sublinear_tf=True, smooth_idf=True, norm="l2"),
+    but with the IDF taken from maintained document-frequency counters.
+    """
+    n_docs = raw_features.shape[0]
+    idf = np.log((1.0 + n_docs) / (1.0 + doc_freq)) + 1.0
+    tfidf = raw_features.astype(np.float64, copy=True)
+    np.log(tfidf.data, out=tfidf.data)
+    tfidf.data += 1.0
+    tfidf.data *= idf[tfidf.indices]
+    return normalize(tfidf, norm="l2", copy=False)
 
-        for term, count in terms_by_show.get(show["id"], []):
-            token = _normalise_token(term)
-            if not token:
-                continue
-            try:
-                freq = float(count)
-            except (TypeError, ValueError):
-                continue
-            if freq <= 0:
-                continue
-            weight = term_weight * min(max_repeat, max(1.0, round(freq)))
-            key = f"term::{token}"
-            term_features[key] = term_features.get(key, 0.0) + weight
-
-        if synopsis_tokens:
-            counts = Counter(synopsis_tokens)
-            for token, freq in counts.items():
-                key = f"syn::{token}"
-                term_features[key] = term_features.get(key, 0.0) + synopsis_weight * freq
-
-            if bigram_weight > 0 and len(synopsis_tokens) >= 2:
-                for left, right in zip(synopsis_tokens, synopsis_tokens[1:]):
-                    key = f"big::{left}_{right}"
-                    term_features[key] = term_features.get(key, 0.0) + bigram_weight
-
-        if term_features:
-            names.append(name)
-            feature_dicts.append(term_features)
-
-    return names, feature_dicts
-
-
-def _ensure_content_model(force: bool = False) -> None:
-    """Construit/charge la matrice TF-IDF contenu si nécessaire (cache global)."""
-    global _series_names, _name_to_index, _content_matrix
-
-    if _content_matrix is not None and not force:
-        return
 
-    names, feature_dicts = _build_feature_space()
+class ContentModel:
+    """
+    Snapshot of the content model: show ids and names, raw features (kept for
+    incremental updates), document frequencies and the TF-IDF matrix.
+    Never modified in place: a rebuild or an update builds a new snapshot and
+    installs it with a single assignment, so a request never sees a
+    half-updated model.
+    """
+
+    def __init__(
+        self,
+        ids: List[int],
+        names: List[str],
+        feature_index: Dict[str, int],
+        raw_features: csr_matrix,
+        doc_freq: np.ndarray,
+        catalog_version: int | None = None,
+    ):
+        self.ids = ids
+        self.names = names
+        self.id_to_index = {show_id: idx for idx, show_id in enumerate(ids)}
+        self.name_to_index = {name.lower(): idx for idx, name in enumerate(names)}
+        self.feature_index = feature_index
+        self.raw_features = raw_features
+        self.doc_freq = doc_freq
+        self.matrix = _tfidf_from_counts(raw_features, doc_freq)
+        self.catalog_version = catalog_version
+
+
+# Nom : build_content_model
+# But : construire un modèle contenu complet sans l'installer (reconstruction en arrière-plan)
+def build_content_model(corpus: Corpus | None = None) -> ContentModel | None:
+    """
+    Build a full content model from `corpus` (shared with the search engine;
+    read from the database when not given). None when no show has features.
+    """
+    if corpus is None:
+        corpus = load_corpus(DB_PATH)
+    ids, names, keys, raw_features = _build_feature_space(corpus=corpus)
     if not names:
-        _series_names = []
-        _name_to_index = {}
-        _content_matrix = None
-        return
+        return None
+    doc_freq = np.bincount(raw_features.indices, minlength=raw_features.shape[1])
+    return ContentModel(
+        ids, names, {key: i for i, key in enumerate(keys)}, raw_features, doc_freq, corpus.catalog_version
+    )
 
-    vectorizer = DictVectorizer()
-    counts_matrix = vectorizer.fit_transform(feature_dicts)
-    transformer = TfidfTransformer(norm="l2", sublinear_tf=True, smooth_idf=True)
-    tfidf_matrix = transformer.fit_transform(counts_matrix)
-    _content_matrix = normalize(tfidf_matrix, norm="l2", copy=False)
 
-    _series_names = names
-    _name_to_index = {name.lower(): idx for idx, name in enumerate(names)}
+# Nom : install_content_model
+# But : remplacer le modèle servi d'un seul coup
+def install_content_model(model: ContentModel | None, reload_neighbours: bool = True) -> None:
+    """
+    Swap in `model`. The precomputed neighbour table is re-read on next use
+    (reload_neighbours, e.g. after build_neighbour_table) or ignored until
+    the next build_neighbour_table().
+    """
+    global _model, _neighbours, _neighbours_loaded
+    _model = model
+    if reload_neighbours:
+        _neighbours_loaded = False
+    else:
+        _neighbours = None
+        _neighbours_loaded = True
 
 
-def warm_recommendation_model(force: bool = False) -> None:
+def _ensure_content_model(force: bool = False, corpus: Corpus | None = None) -> ContentModel | None:
+    """
+    Construit/charge le modèle contenu si nécessaire (cache global), à partir
+    de `corpus` s'il est fourni (partagé avec le moteur de recherche).
+    Retourne le modèle courant.
+    """
+    model = _model
+    if model is not None and not force:
+        return model
+
+    with model_lock:
+        # Une autre requête a pu le construire pendant l'attente du verrou.
+        if _model is not None and not force:
+            return _model
+        # Une reconstruction forcée relit aussi la table de voisins (peut-être régénérée).
+        model = build_content_model(corpus)
+        install_content_model(model)
+    return model
+
+
+# Nom : update_content_model
+# But : ajouter / remplacer / retirer les lignes de quelques séries sans tout recalculer
+def update_content_model(show_ids: Iterable[int]) -> None:
+    """
+    Incrementally refresh the content model for the given show ids, e.g. after
+    fetch_tvmaze_metadata.py changed a synopsis. Only those shows are re-read
+    from the database; their rows are added, replaced or removed in the raw
+    feature matrix, document frequencies are adjusted and the TF-IDF weights
+    are recomputed from them (no DictVectorizer/TfidfTransformer refit).
+    Does nothing when `show_ids` is empty.
+    """
+    show_ids = list(dict.fromkeys(int(show_id) for show_id in show_ids))
+    if not show_ids:
+        return
+    with model_lock:
+        model = _ensure_content_model()
+        if model is None:
+            # Pas encore de modèle : la construction complète couvre déjà ces séries.
+            return
+        _update_content_model(model, show_ids)
+
+
+def _update_content_model(model: ContentModel, show_ids: List[int]) -> None:
+    new_ids, new_names, new_keys, new_features = _build_feature_space(show_ids)
+
+    # Colonnes locales -> colonnes du modèle (les nouvelles features sont ajoutées à la fin).
+    feature_index = dict(model.feature_index)
+    columns = np.array([feature_index.setdefault(key, len(feature_index)) for key in new_keys], dtype=np.int64)
+    n_features = len(feature_index)
+    new_rows = csr_matrix(
+        (new_features.data, columns[new_features.indices], new_features.indptr),
+        shape=(new_features.shape[0], n_features),
+    )
+    new_rows.sort_indices()
+
+    # On retire les anciennes lignes des séries concernées puis on ajoute les nouvelles.
+    touched = set(show_ids)
+    keep = [pos for pos, show_id in enumerate(model.ids) if show_id not in touched]
+    old_rows = model.raw_features[[pos for pos, show_id in enumerate(model.ids) if show_id in touched]]
+    kept_rows = model.raw_features[keep]
+    kept_rows.resize((kept_rows.shape[0], n_features))
+
+    doc_freq = np.zeros(n_features, dtype=np.int64)
+    doc_freq[: len(model.doc_freq)] = model.doc_freq
+    doc_freq[: old_rows.shape[1]] -= np.bincount(old_rows.indices, minlength=old_rows.shape[1])
+    doc_freq += np.bincount(new_rows.indices, minlength=n_features)
+
+    raw_features = vstack([kept_rows, new_rows], format="csr")
+    ids = [model.ids[pos] for pos in keep] + new_ids
+    names = [model.names[pos] for pos in keep] + new_names
+    if not names:
+        _ensure_content_model(force=True)
+        return
+    # Les voisins précalculés ne reflètent plus le modèle : calcul en direct
+    # jusqu'à la prochaine reconstruction complète. Le modèle ne correspond plus à
+    # une version de catalogue (None) : _load_neighbours refuse alors toute table.
+    install_content_model(
+        ContentModel(ids, names, feature_index, raw_features, doc_freq, None),
+        reload_neighbours=False,
+    )
+
+
+def warm_recommendation_model(force: bool = False, corpus: Corpus | None = None) -> None:
     """
     Public helper used at app startup to ensure the TF-IDF matrix
     is computed before the first request (avoids long latency).
+    `corpus` lets the caller share one database read with the search engine.
     """
-    _ensure_content_model(force=force)
+    _ensure_content_model(force=force, corpus=corpus)
+
+
+# Nom : content_model
+# But : modèle contenu actuellement servi (None s'il n'est pas encore construit)
+def content_model() -> ContentModel | None:
+    return _model
 
 
 # ---------------------------------------------------------------------------
@@ -230,6 +371,167 @@ def _top_indices(scores: np.ndarray, top_n: int) -> Iterable[int]:
     return ordered
 
 
+# ---------------------------------------------------------------------------
+# Precomputed neighbour table
+# ---------------------------------------------------------------------------
+# Nom : build_neighbour_table
+# But : calculer hors ligne les K voisins de chaque série par blocs de lignes
+def build_neighbour_table(
+    top_k: int = NEIGHBOURS_TOP_K,
+    block_size: int = 256,
+    out_dir: str = NEIGHBOURS_DIR,
+    model: ContentModel | None = None,
+) -> int:
+    """
+    Compute the top-K content neighbours of every show and store them as .npy
+    arrays. Similarities are computed block by block (block_size rows against
+    the whole matrix) so memory stays bounded by block_size x n_series.
+    Uses `model` when given (e.g. a model not installed yet), otherwise
+    rebuilds the model from the database. Returns the number of shows written.
+    """
+    if model is None:
+        model = _ensure_content_model(force=True)
+    if model is None:
+        return 0
+
+    content_matrix = model.matrix
+    n_series = content_matrix.shape[0]
+    k = max(0, min(top_k, n_series - 1))
+    neighbours = np.zeros((n_series, k), dtype=np.int32)
+    scores = np.zeros((n_series, k), dtype=np.float64)
+    transposed = content_matrix.T.tocsr()
+
+    for start in range(0, n_series, block_size):
+        stop = min(start + block_size, n_series)
+        block = (content_matrix[start:stop] @ transposed).toarray()
+        rows = np.arange(stop - start)
+        block[rows, rows + start] = -np.inf  # la série elle-même
+        if k == 0:
+            continue
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        # Score décroissant, puis indice croissant pour un ordre stable.
+        order = np.lexsort((top, -top_scores), axis=1)
+        neighbours[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, "neighbours.npy"), neighbours)
+    np.save(os.path.join(tmp_dir, "scores.npy"), scores)
+    with open(os.path.join(tmp_dir, "series.json"), "w", encoding="utf-8") as f:
+        json.dump(model.names, f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "format_version": NEIGHBOURS_FORMAT_VERSION,
+                "catalog_version": model.catalog_version,
+                "top_k": k,
+                "n_series": n_series,
+            },
+            f,
+        )
+
+    old_dir = f"{out_dir}.old-{os.getpid()}"
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return n_series
+
+
+def neighbours_catalog_version(out_dir: str = NEIGHBOURS_DIR) -> int | None:
+    """Version du catalogue de la table de voisins écrite dans `out_dir` (None si absente)."""
+    try:
+        with open(os.path.join(out_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format_version") != NEIGHBOURS_FORMAT_VERSION:
+        return None
+    return meta.get("catalog_version")
+
+
+# Nom : reload_neighbour_table
+# But : relire la table de voisins à la prochaine utilisation (après sa réécriture)
+def reload_neighbour_table() -> None:
+    global _neighbours_loaded
+    _neighbours_loaded = False
+
+
+def _load_neighbours() -> Tuple[List[str], Dict[str, int], np.ndarray, np.ndarray] | None:
+    """
+    Charge (une fois) la table de voisins en mmap ; None si absente, invalide ou
+    calculée pour une autre version du catalogue que le modèle servi (ou, sans
+    modèle chargé, que la base).
+    """
+    global _neighbours, _neighbours_loaded
+    if _neighbours_loaded:
+        return _neighbours
+    _neighbours_loaded = True
+    _neighbours = None
+
+    meta_path = os.path.join(NEIGHBOURS_DIR, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != NEIGHBOURS_FORMAT_VERSION:
+            return None
+        model = _model
+        if model is not None:
+            # None : modèle mis à jour par update_content_model, aucune table ne lui correspond.
+            if model.catalog_version is None:
+                return None
+            expected_version = model.catalog_version
+        else:
+            with connection(DB_PATH, readonly=True) as conn:
+                expected_version = catalog_version(conn)
+        if meta.get("catalog_version") != expected_version:
+            print("Table de voisins ignorée (catalogue modifié depuis son calcul):", NEIGHBOURS_DIR)
+            return None
+        with open(os.path.join(NEIGHBOURS_DIR, "series.json"), "r", encoding="utf-8") as f:
+            names = json.load(f)
+        neighbours = np.load(os.path.join(NEIGHBOURS_DIR, "neighbours.npy"), mmap_mode="r")
+        scores = np.load(os.path.join(NEIGHBOURS_DIR, "scores.npy"), mmap_mode="r")
+    except (OSError, ValueError, sqlite3.Error) as exc:
+        print("Erreur chargement table de voisins:", exc)
+        return None
+
+    if neighbours.shape != scores.shape or neighbours.shape[0] != len(names):
+        return None
+    _neighbours = (names, {name.lower(): idx for idx, name in enumerate(names)}, neighbours, scores)
+    return _neighbours
+
+
+# Nom : has_neighbour_table
+# But : savoir si une table de voisins valide (même catalogue) peut être servie
+def has_neighbour_table() -> bool:
+    return _load_neighbours() is not None
+
+
+def _neighbours_from_table(serie_name: str, top_n: int) -> List[Tuple[str, float]] | None:
+    """Voisins lus dans la table en O(K) ; None s'il faut calculer en direct."""
+    table = _load_neighbours()
+    if table is None:
+        return None
+    names, index, neighbours, scores = table
+    if top_n > neighbours.shape[1]:
+        return None
+    idx = index.get((serie_name or "").lower())
+    if idx is None:
+        return None
+
+    results: List[Tuple[str, float]] = []
+    for pos, score in zip(neighbours[idx], scores[idx]):
+        if score <= 0 or len(results) >= top_n:
+            break
+        results.append((names[pos], float(score)))
+    return results
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
@@ -238,17 +540,23 @@ def _top_indices(scores: np.ndarray, top_n: int) -> Iterable[int]:
 def recommend_by_content(serie_name: str, top_n: int = 5) -> List[Tuple[str, float]]:
     """
     Return the closest series based on subtitles and synopsis similarity.
+    Served from the precomputed neighbour table when available, computed
+    live otherwise.
     """
-    _ensure_content_model()
-    if _content_matrix is None:
+    precomputed = _neighbours_from_table(serie_name, top_n)
+    if precomputed is not None:
+        return precomputed
+
+    model = _ensure_content_model()
+    if model is None:
         return []
 
-    idx = _name_to_index.get((serie_name or "").lower())
+    idx = model.name_to_index.get((serie_name or "").lower())
     if idx is None:
         return []
 
-    row = _content_matrix[idx]
-    scores = (row @ _content_matrix.T).toarray().ravel()
+    row = model.matrix[idx]
+    scores = (row @ model.matrix.T).toarray().ravel()
     scores[idx] = 0.0
 
     results: List[Tuple[str, float]] = []
@@ -256,7 +564,7 @@ def recommend_by_content(serie_name: str, top_n: int = 5) -> List[Tuple[str, flo
         score = float(scores[pos])
         if score <= 0:
             continue
-        results.append((_series_names[pos], score))
+        results.append((model.names[pos], score))
         if len(results) >= top_n:
             break
     return results
@@ -268,61 +576,254 @@ def recommend_for_user(username: str, top_n: int = 5) -> List[Tuple[str, float]]
     """
     Blend user ratings with the content matrix to surface unseen similar shows.
     """
-    _ensure_content_model()
-    if _content_matrix is None:
+    model = _ensure_content_model()
+    if model is None:
         return []
 
-    conn = get_db_connection()
-    rows = conn.execute(
-        "SELECT tvshow_name, rating FROM ratings WHERE username = ?",
-        (username,),
-    ).fetchall()
-    conn.close()
+    with connection(DB_PATH, readonly=True) as conn:
+        rows = conn.execute(
+            "SELECT tvshow_id, rating FROM ratings WHERE username = ?",
+            (username,),
+        ).fetchall()
 
     if not rows:
         return []
 
     rated_indices: List[Tuple[int, float]] = []
     for row in rows:
-        idx = _name_to_index.get((row["tvshow_name"] or "").lower())
+        idx = model.id_to_index.get(row["tvshow_id"])
         if idx is not None:
             rated_indices.append((idx, float(row["rating"])))
 
+    return _recommend_from_ratings(model, rated_indices, top_n)
+
+
+def _recommend_from_ratings(
+    model: ContentModel, rated_indices: List[Tuple[int, float]], top_n: int
+) -> List[Tuple[str, float]]:
+    """
+    Score the catalogue against a rating profile. The profile is one sparse
+    weighted sum (weights vector @ rated rows); since the content matrix rows
+    are already L2-normalised, cosine similarity reduces to a dot product.
+    """
     if not rated_indices:
         return []
 
-    profile: csr_matrix | None = None
-    weight_sum = 0.0
-    for idx, weight in rated_indices:
-        weight = max(weight, 0.0)
-        if weight == 0:
-            continue
-        weight_sum += weight
-        contribution = weight * _content_matrix[idx]
-        profile = contribution if profile is None else profile + contribution
-
-    if profile is None or weight_sum == 0.0:
+    indices = np.fromiter((idx for idx, _ in rated_indices), dtype=np.int64, count=len(rated_indices))
+    weights = np.fromiter((weight for _, weight in rated_indices), dtype=np.float64, count=len(rated_indices))
+    positive = weights > 0
+    if not positive.any():
         return []
 
-    profile = profile / weight_sum
+    # La moyenne pondérée n'est pas divisée par la somme des poids : la
+    # normalisation L2 qui suit l'annule de toute façon.
+    profile = csr_matrix(weights[positive]) @ model.matrix[indices[positive]]
     profile = normalize(profile, norm="l2", copy=False)
 
-    scores = cosine_similarity(profile, _content_matrix).ravel()
-    for idx, _ in rated_indices:
-        scores[idx] = 0.0
+    scores = np.asarray(model.matrix @ profile.T.toarray()).ravel()
+    scores[indices] = 0.0
 
     results: List[Tuple[str, float]] = []
     for pos in _top_indices(scores, top_n):
         score = float(scores[pos])
         if score <= 0:
             continue
-        results.append((_series_names[pos], score))
+        results.append((model.names[pos], score))
         if len(results) >= top_n:
             break
     return results
 
 
+# ---------------------------------------------------------------------------
+# Batch user recommendations
+# ---------------------------------------------------------------------------
+def _ensure_user_recommendations_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_recommendations (
+            username TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            tvshow_name TEXT NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (username, rank)
+        )
+        """
+    )
+
+
+# Nom : build_user_recommendations
+# But : calculer en lot les recommandations de tous les utilisateurs (ou de certains)
+def build_user_recommendations(
+    usernames: Iterable[str] | None = None,
+    top_n: int = USER_RECOS_TOP_N,
+    block_size: int = 512,
+) -> int:
+    """
+    Build a users x series rating matrix from the ratings table, compute every
+    profile with one sparse product against the content matrix, and store the
+    top-N unseen shows per user in user_recommendations. Scoring is the same as
+    recommend_for_user. Returns the number of users written.
+    """
+    model = _ensure_content_model()
+
+    with connection(DB_PATH, readonly=True) as conn:
+        if usernames is None:
+            rows = conn.execute("SELECT username, tvshow_id, rating FROM ratings").fetchall()
+            targets = sorted({row["username"] for row in rows})
+        else:
+            targets = sorted(set(usernames))
+            placeholders = ",".join("?" for _ in targets) or "NULL"
+            rows = conn.execute(
+                f"SELECT username, tvshow_id, rating FROM ratings WHERE username IN ({placeholders})",
+                targets,
+            ).fetchall()
+
+    user_index = {username: pos for pos, username in enumerate(targets)}
+    id_to_index = model.id_to_index if model is not None else {}
+    entries = [
+        (user_index[row["username"]], id_to_index.get(row["tvshow_id"]), float(row["rating"]))
+        for row in rows
+    ]
+    entries = [(user, idx, rating) for user, idx, rating in entries if idx is not None]
+
+    recommendations: Dict[str, List[Tuple[str, float]]] = {username: [] for username in targets}
+    if model is not None and entries and top_n > 0:
+        content_matrix = model.matrix
+        n_series = content_matrix.shape[0]
+        users = np.array([user for user, _, _ in entries], dtype=np.int64)
+        shows = np.array([idx for _, idx, _ in entries], dtype=np.int64)
+        weights = np.maximum(np.array([rating for _, _, rating in entries]), 0.0)
+
+        shape = (len(targets), n_series)
+        weight_matrix = csr_matrix((weights, (users, shows)), shape=shape)
+        weight_matrix.eliminate_zeros()
+        rated = csr_matrix((np.ones(len(entries)), (users, shows)), shape=shape)
+
+        # Tous les profils en un seul produit creux, puis normalisation L2 par ligne.
+        profiles = normalize(weight_matrix @ content_matrix, norm="l2", copy=False)
+        transposed = content_matrix.T.tocsr()
+        k = min(top_n, n_series)
+
+        for start in range(0, len(targets), block_size):
+            stop = min(start + block_size, len(targets))
+            scores = (profiles[start:stop] @ transposed).toarray()
+            rated_rows, rated_cols = rated[start:stop].nonzero()
+            scores[rated_rows, rated_cols] = 0.0
+
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+            for offset in range(stop - start):
+                recommendations[targets[start + offset]] = [
+                    (model.names[pos], float(score))
+                    for pos, score in zip(top[offset], top_scores[offset])
+                    if score > 0
+                ]
+
+    with connection(DB_PATH) as conn:
+        _ensure_user_recommendations_table(conn)
+        with conn:
+            if usernames is None:
+                conn.execute("DELETE FROM user_recommendations")
+            else:
+                conn.executemany(
+                    "DELETE FROM user_recommendations WHERE username = ?",
+                    [(username,) for username in targets],
+                )
+            conn.executemany(
+                "INSERT INTO user_recommendations (username, rank, tvshow_name, score) VALUES (?, ?, ?, ?)",
+                [
+                    (username, rank, name, score)
+                    for username, recos in recommendations.items()
+                    for rank, (name, score) in enumerate(recos)
+                ],
+            )
+    return len(targets)
+
+
+# Nom : get_user_recommendations
+# But : lire les recommandations précalculées (calcul direct en secours)
+def get_user_recommendations(username: str, top_n: int = 5) -> List[Tuple[str, float]]:
+    """
+    Read the precomputed recommendations of a user; falls back to
+    recommend_for_user when none are stored yet (or more are requested).
+    """
+    if top_n <= USER_RECOS_TOP_N:
+        try:
+            with connection(DB_PATH, readonly=True) as conn:
+                rows = conn.execute(
+                    """
+                    SELECT tvshow_name, score
+                    FROM user_recommendations
+                    WHERE username = ?
+                    ORDER BY rank
+                    LIMIT ?
+                    """,
+                    (username, top_n),
+                ).fetchall()
+        except sqlite3.OperationalError:
+            # Table pas encore créée (aucun build_user_recommendations).
+            rows = []
+        if rows:
+            return [(row["tvshow_name"], float(row["score"])) for row in rows]
+    return recommend_for_user(username, top_n=top_n)
+
+
+_refresh_queue: "queue.Queue[str]" = queue.Queue()
+_refresh_thread: threading.Thread | None = None
+_refresh_lock = threading.Lock()
+
+
+def _refresh_worker() -> None:
+    while True:
+        usernames = {_refresh_queue.get()}
+        # Regroupe les demandes arrivées entre-temps en un seul lot.
+        while True:
+            try:
+                usernames.add(_refresh_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            build_user_recommendations(usernames)
+        except Exception as exc:  # pragma: no cover - simple trace
+            print("Erreur rafraichissement recommandations:", exc)
+
+
+# Nom : schedule_user_refresh
+# But : recalculer en arrière-plan les recommandations d'un utilisateur après une note
+def schedule_user_refresh(username: str) -> None:
+    """Queue a background refresh of one user's stored recommendations."""
+    global _refresh_thread
+    with _refresh_lock:
+        if _refresh_thread is None or not _refresh_thread.is_alive():
+            _refresh_thread = threading.Thread(target=_refresh_worker, name="user-recos-refresh", daemon=True)
+            _refresh_thread.start()
+    _refresh_queue.put(username)
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recommandations SUBSTREAM")
+    parser.add_argument("--build-neighbours", action="store_true", help="Calculer la table des voisins par contenu")
+    parser.add_argument("--build-user-recos", action="store_true", help="Précalculer les recommandations de tous les utilisateurs")
+    parser.add_argument("--top-k", type=int, default=NEIGHBOURS_TOP_K, help="Voisins conservés par série")
+    parser.add_argument("--block-size", type=int, default=256, help="Lignes par bloc de produit matriciel")
+    args = parser.parse_args()
+
+    if args.build_neighbours:
+        start = time.perf_counter()
+        written = build_neighbour_table(top_k=args.top_k, block_size=args.block_size)
+        print(f"Table de voisins : {written} séries ({time.perf_counter() - start:.2f}s) -> {NEIGHBOURS_DIR}")
+        raise SystemExit(0)
+
+    if args.build_user_recos:
+        start = time.perf_counter()
+        written = build_user_recommendations()
+        print(f"Recommandations utilisateurs : {written} utilisateurs ({time.perf_counter() - start:.2f}s)")
+        raise SystemExit(0)
+
     _ensure_content_model(force=True)
     print(">>> Test reco par contenu pour 'Lost':")
     print(recommend_by_content("Lost", top_n=5))
@@ -10,6 +10,8 @@ import os
 from urllib import request, parse
 import re
 
+from catalog import bump_catalog_version
+
 # Project-relative paths
 DB_PATH = os.path.join("database", "tvshow.db")
 IMG_DIR = os.path.join("static", "images", "tvshow_images")
@@ -50,6 +52,7 @@ def main():
 
     # Optionnel : vider synopsis et image_url pour forcer le fetch
     cur.execute("UPDATE tvshow SET synopsis=NULL, image_url=NULL")
+    bump_catalog_version(conn)
     conn.commit()
     print("Réinitialisation des synopsis et images OK")
 
@@ -76,6 +79,7 @@ def main():
 
         # Mettre à jour la base
         cur.execute("UPDATE tvshow SET synopsis=?, image_url=? WHERE id=?", (synopsis, image_url, serie_id))
+        bump_catalog_version(conn)
         conn.commit()
         print(f"[{i}/{total}] Mis à jour: {name}")
 
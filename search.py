@@ -5,26 +5,36 @@ Role : moteur de recherche TF-IDF (normalisation, vectorisation, similarites).
 
 from __future__ import annotations
 
+import argparse
+import hashlib
+import json
 import os
-import re
+import shutil
 import sqlite3
-import unicodedata
+import time
 from typing import Dict, List, Optional, Tuple
 
-import numpy as np  # noqa: F401 (kept for potential future extensions)
-from scipy.sparse import csr_matrix
+import numpy as np
+from scipy.sparse import csr_matrix, hstack
 from sklearn.feature_extraction import DictVectorizer
 from sklearn.feature_extraction.text import TfidfTransformer
 from sklearn.preprocessing import normalize
 
+from clean_word_frequency import is_index_token
+from corpus import Corpus, drop_empty_rows, load_corpus
+from db import connection
+from tokenizer import tokenize
+
 DB_PATH = os.path.join(os.path.dirname(__file__), "database", "tvshow.db")
 
+# Index TF-IDF persistant (construit hors ligne, chargé en np.load(mmap_mode="r")).
+INDEX_DIR = os.path.join(os.path.dirname(__file__), "database", "search_index")
+INDEX_FORMAT_VERSION = 3
 
-def get_db_connection():
-    """Ouvre une connexion SQLite avec row_factory active."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Score combine de /api/search : similarite TF-IDF + somme des occurrences.
+TFIDF_WEIGHT = 0.7
+KEYWORD_WEIGHT = 0.3
+MIN_COMBINED_SCORE = 0.25
 
 
 class SearchEngine:
@@ -35,68 +45,146 @@ class SearchEngine:
     """
 
     def __init__(self, series_counts: Dict[str, Dict[str, float]]):
-        self._series_counts: Dict[str, Dict[str, float]] = series_counts
-        self.series_names: List[str] = list(series_counts.keys())
-        self._name_to_index: Dict[str, int] = {name: i for i, name in enumerate(self.series_names)}
-
-        self._dv = DictVectorizer()
-        counts_list = [series_counts[name] for name in self.series_names]
+        series_names = list(series_counts.keys())
+        counts_list = [series_counts[name] for name in series_names]
 
         if not counts_list:
-            self._dv.fit([{}])
-            self._tfidf = TfidfTransformer(norm="l2", use_idf=True, smooth_idf=True)
-            self._X = csr_matrix((0, 0))
+            self._attach(series_names, [], np.zeros(0), csr_matrix((0, 0)), csr_matrix((0, 0)))
             return
 
-        X_counts = self._dv.fit_transform(counts_list)
-        self._tfidf = TfidfTransformer(norm="l2", use_idf=True, smooth_idf=True)
-        self._X = self._tfidf.fit_transform(X_counts)
-        self._X = normalize(self._X, norm="l2", copy=False)
+        dv = DictVectorizer()
+        X_counts = dv.fit_transform(counts_list)
+        self._fit(series_names, list(dv.get_feature_names_out()), X_counts)
+
+    @classmethod
+    def from_counts(cls, series_names: List[str], terms: List[str], counts: csr_matrix) -> "SearchEngine":
+        """Construit le moteur a partir d'une matrice d'occurrences series x termes deja assemblee."""
+        engine = cls.__new__(cls)
+        engine._fit(list(series_names), list(terms), counts)
+        return engine
+
+    def _fit(self, series_names: List[str], terms: List[str], counts: csr_matrix) -> None:
+        X_counts = csr_matrix(counts, dtype=np.float64)
+        X_counts.sort_indices()
+        tfidf = TfidfTransformer(norm="l2", use_idf=True, smooth_idf=True).fit(X_counts)
+        idf = tfidf.idf_.astype(np.float64)
+
+        # Même structure creuse que X_counts (indices et indptr partagés) : seules les valeurs changent.
+        X = csr_matrix((X_counts.data * idf[X_counts.indices], X_counts.indices, X_counts.indptr),
+                       shape=X_counts.shape, copy=False)
+        X = normalize(X, norm="l2", copy=False)
+
+        self._attach(series_names, terms, idf, X_counts, X)
+
+    def _attach(
+        self,
+        series_names: List[str],
+        terms: List[str],
+        idf: np.ndarray,
+        counts: csr_matrix,
+        X: csr_matrix,
+        version: Optional[str] = None,
+        postings: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None,
+        catalog_version: Optional[int] = None,
+    ) -> None:
+        self.series_names: List[str] = series_names
+        self._name_to_index: Dict[str, int] = {name: i for i, name in enumerate(series_names)}
+        self.terms: List[str] = terms
+        self.vocabulary: Dict[str, int] = {term: i for i, term in enumerate(terms)}
+        self.idf: np.ndarray = idf
+        self._counts: csr_matrix = counts
+        self._X: csr_matrix = X
+        self._version: Optional[str] = version
+        # Version du catalogue (catalog.py) dont l'index est issu ; None si inconnue.
+        self.catalog_version: Optional[int] = catalog_version
+
+        # Index inverse : terme -> (series, occurrences, poids TF-IDF), lignes triees.
+        if postings is None:
+            postings = self._build_postings(counts, X)
+        self._post_indptr, self._post_rows, self._post_counts, self._post_weights = postings
+        self._batch_cache: Optional[Tuple[csr_matrix, csr_matrix]] = None
+
+    @property
+    def version(self) -> str:
+        """
+        Empreinte du contenu de l'index : identique d'un worker a l'autre pour un
+        meme corpus (sert de cle d'invalidation aux caches de resultats).
+        """
+        if self._version is None:
+            digest = hashlib.blake2b(digest_size=12)
+            for array in (self._X.indptr, self._X.indices, self._counts.data):
+                digest.update(np.ascontiguousarray(array))
+            digest.update("\n".join(self.series_names).encode("utf-8"))
+            digest.update("\n".join(self.terms).encode("utf-8"))
+            self._version = digest.hexdigest()
+        return self._version
+
+    @staticmethod
+    def _build_postings(
+        counts: csr_matrix, X: csr_matrix
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Transpose la structure CSR en listes de postings (ordre colonne, series croissantes)."""
+        n_series, n_terms = X.shape
+        rows = np.repeat(np.arange(n_series, dtype=X.indices.dtype), np.diff(X.indptr))
+        # Tri stable par terme : les series restent croissantes dans chaque liste.
+        order = np.argsort(X.indices, kind="stable")
+        indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(X.indices, minlength=n_terms), out=indptr[1:])
+        return indptr, rows[order], np.asarray(counts.data)[order], np.asarray(X.data)[order]
 
     # ----------------------
     # Helpers
     # ----------------------
-    @staticmethod
-    def _normalize_text(text: str) -> str:
-        if not text:
-            return ""
-        normalized = unicodedata.normalize("NFD", text)
-        stripped = "".join(ch for ch in normalized if unicodedata.category(ch) != "Mn")
-        return stripped.lower()
-
-    @staticmethod
-    def load_series_counts_from_db() -> Dict[str, Dict[str, float]]:
-        """Charge les occurrences de mots depuis la table tvshow_term."""
-        series_counts: Dict[str, Dict[str, float]] = {}
-        conn = get_db_connection()
-        try:
-            cursor = conn.execute(
-                """
-                SELECT tvshow.name, tvshow_term.term, tvshow_term.count
-                FROM tvshow_term
-                JOIN tvshow ON tvshow_term.tvshow_id = tvshow.id
-                WHERE tvshow_term.count > 0
-                """
+    @classmethod
+    def from_corpus(cls, corpus: Corpus) -> "SearchEngine":
+        """
+        Moteur TF-IDF derive du corpus partage (corpus.py) : une ligne par nom de
+        serie (les homonymes sont fusionnes), series sans terme retirees. Sans
+        homonyme, les tableaux du corpus sont repris sans copie.
+        """
+        counts, rows = drop_empty_rows(corpus.counts)
+        row_names = [corpus.names[i] for i in rows.tolist()]
+        name_rows: Dict[str, int] = {}
+        targets = [name_rows.setdefault(name, len(name_rows)) for name in row_names]
+        if len(name_rows) != len(targets):
+            merge = csr_matrix(
+                (np.ones(len(targets)), (targets, np.arange(len(targets)))), shape=(len(name_rows), len(targets))
             )
-            for raw_name, term, count in cursor:
-                term_norm = SearchEngine._normalize_text(term or "")
-                if not term_norm or count <= 0:
-                    continue
-                bag = series_counts.setdefault(str(raw_name), {})
-                bag[term_norm] = bag.get(term_norm, 0.0) + float(count)
-        except Exception as exc:  # pragma: no cover - simple trace
+            counts = (merge @ counts).tocsr()
+
+        terms = corpus.terms
+        used = np.bincount(counts.indices, minlength=counts.shape[1]) > 0
+        if not used.all():
+            counts = counts[:, np.flatnonzero(used)]
+            terms = [term for term, keep in zip(terms, used) if keep]
+        if not name_rows or not terms:
+            engine = cls({})
+        else:
+            engine = cls.from_counts(list(name_rows), terms, counts)
+        engine.catalog_version = corpus.catalog_version
+        return engine
+
+    @classmethod
+    def from_db(cls) -> "SearchEngine":
+        """Construit le moteur depuis la base (tvshow_term + term)."""
+        try:
+            corpus = load_corpus(DB_PATH)
+        except sqlite3.Error as exc:  # pragma: no cover - simple trace
             print("Erreur chargement DB:", exc)
-        finally:
-            conn.close()
-        return series_counts
+            return cls({})
+        return cls.from_corpus(corpus)
 
     @staticmethod
     def _query_to_counts(query: str) -> Dict[str, float]:
-        token_re = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)*")
-        tokens = [SearchEngine._normalize_text(token) for token in token_re.findall(query)]
+        """
+        Occurrences des mots de la requete, filtres comme a l'indexation
+        (clean_word_frequency.is_index_token) : "l'enquete" ne garde que "enquete",
+        sinon le "l" absent de l'index ferait echouer la recherche conjonctive.
+        """
         counts: Dict[str, float] = {}
-        for token in tokens:
-            counts[token] = counts.get(token, 0.0) + 1.0
+        for token in tokenize(query):
+            if is_index_token(token):
+                counts[token] = counts.get(token, 0.0) + 1.0
         return counts
 
     def vectorize_query(self, query: str) -> csr_matrix:
@@ -104,12 +192,124 @@ class SearchEngine:
             return csr_matrix((1, 0))
 
         counts = self._query_to_counts(query)
-        if not counts:
-            return csr_matrix((1, self._X.shape[1]))
+        columns: List[int] = []
+        values: List[float] = []
+        for token, count in counts.items():
+            idx = self.vocabulary.get(token)
+            if idx is not None:
+                columns.append(idx)
+                values.append(count * float(self.idf[idx]))
+
+        vec = csr_matrix(
+            (values, ([0] * len(columns), columns)), shape=(1, self._X.shape[1]), dtype=np.float64
+        )
+        return normalize(vec, norm="l2")
 
-        vec = self._dv.transform([counts])
-        vec_tfidf = self._tfidf.transform(vec)
-        return normalize(vec_tfidf, norm="l2")
+    # ----------------------
+    # Index persistant (mmap)
+    # ----------------------
+    def save_index(self, index_dir: str = INDEX_DIR) -> None:
+        """
+        Ecrit l'index sur disque (tableaux CSR, vocabulaire, IDF, noms de series).
+        L'ecriture passe par un dossier temporaire puis un renommage, pour que les
+        workers qui chargent l'index ne voient jamais un dossier a moitie ecrit.
+        """
+        nnz = int(self._X.nnz)
+        index_dtype = np.int32 if max(nnz, self._X.shape[1]) < np.iinfo(np.int32).max else np.int64
+
+        parent = os.path.dirname(os.path.abspath(index_dir))
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = f"{index_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        arrays = {
+            "indptr": self._X.indptr.astype(index_dtype),
+            "indices": self._X.indices.astype(index_dtype),
+            "counts": np.asarray(self._counts.data, dtype=np.float64),
+            "tfidf": np.asarray(self._X.data, dtype=np.float64),
+            "idf": np.asarray(self.idf, dtype=np.float64),
+            "postings_indptr": self._post_indptr.astype(np.int64),
+            "postings_rows": self._post_rows.astype(index_dtype),
+            "postings_counts": np.asarray(self._post_counts, dtype=np.float64),
+            "postings_tfidf": np.asarray(self._post_weights, dtype=np.float64),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        with open(os.path.join(tmp_dir, "terms.json"), "w", encoding="utf-8") as f:
+            json.dump(self.terms, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, "series.json"), "w", encoding="utf-8") as f:
+            json.dump(self.series_names, f, ensure_ascii=False)
+
+        meta = {
+            "format_version": INDEX_FORMAT_VERSION,
+            "version": self.version,
+            "catalog_version": self.catalog_version,
+            "n_series": int(self._X.shape[0]),
+            "n_terms": int(self._X.shape[1]),
+            "nnz": nnz,
+        }
+        # meta.json en dernier : sa presence marque un index complet.
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        old_dir = f"{index_dir}.old-{os.getpid()}"
+        if os.path.exists(index_dir):
+            os.rename(index_dir, old_dir)
+        os.rename(tmp_dir, index_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load_index(cls, index_dir: str = INDEX_DIR) -> Optional["SearchEngine"]:
+        """
+        Charge un index ecrit par save_index() en memory-map (pages partagees
+        entre workers). Retourne None si l'index est absent ou d'un autre format.
+        """
+        meta_path = os.path.join(index_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format_version") != INDEX_FORMAT_VERSION:
+                print("Index de recherche ignore (format obsolete):", index_dir)
+                return None
+
+            def load_array(name: str) -> np.ndarray:
+                return np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+
+            with open(os.path.join(index_dir, "terms.json"), "r", encoding="utf-8") as f:
+                terms = json.load(f)
+            with open(os.path.join(index_dir, "series.json"), "r", encoding="utf-8") as f:
+                series_names = json.load(f)
+
+            shape = (int(meta["n_series"]), int(meta["n_terms"]))
+            indptr = load_array("indptr")
+            indices = load_array("indices")
+            counts = csr_matrix((load_array("counts"), indices, indptr), shape=shape, copy=False)
+            X = csr_matrix((load_array("tfidf"), indices, indptr), shape=shape, copy=False)
+            idf = load_array("idf")
+            postings = tuple(
+                load_array(f"postings_{name}") for name in ("indptr", "rows", "counts", "tfidf")
+            )
+        except (OSError, ValueError, KeyError) as exc:
+            print("Erreur chargement index de recherche:", exc)
+            return None
+
+        if len(terms) != shape[1] or len(series_names) != shape[0]:
+            print("Index de recherche incoherent, ignore:", index_dir)
+            return None
+
+        # Les tableaux sont en lecture seule : on evite tout tri en place par scipy.
+        counts.has_sorted_indices = True
+        X.has_sorted_indices = True
+
+        engine = cls.__new__(cls)
+        engine._attach(
+            series_names, terms, idf, counts, X, version=meta.get("version"), postings=postings,
+            catalog_version=meta.get("catalog_version"),
+        )
+        return engine
 
     # ----------------------
     # Recherche TF-IDF
@@ -121,34 +321,62 @@ class SearchEngine:
         if not query:
             return []
 
-        qv = self.vectorize_query(query)
-        sims = (qv @ self._X.T).toarray().ravel()
-
-        q_counts = self._query_to_counts(query)
-        q_tokens = set(q_counts.keys())
-        token_indices = [self._dv.vocabulary_.get(token) for token in q_tokens if token in self._dv.vocabulary_]
-
-        scored: List[Tuple[str, float]] = []
-        for index, name in enumerate(self.series_names):
-            score = float(sims[index])
-            if score <= 0:
-                continue
-
-            # Bonus si tous les mots de la requete sont presents
-            if token_indices:
-                try:
-                    row = self._X.getrow(index)
-                    has_all = all(row[0, idx] > 0 for idx in token_indices)
-                except Exception:
-                    has_all = False
-                if has_all:
-                    score = min(1.0, score + 0.05)
+        token_indices, query_weights = self._query_weights(self._query_to_counts(query))
+        if not token_indices or top_n <= 0:
+            return []
 
-            if score >= 0.05:
-                scored.append((name, score))
+        # Similarite et couverture calculees sur les seules postings des termes.
+        rows = np.concatenate([self.postings(idx)[0] for idx in token_indices])
+        weights = np.concatenate(
+            [q_weight * self.postings(idx)[2] for idx, q_weight in zip(token_indices, query_weights)]
+        )
+        n_series = self._X.shape[0]
+        scores = np.bincount(rows, weights=weights, minlength=n_series)
+        positive = scores > 0
+
+        # Bonus si tous les mots de la requete sont presents
+        bonus = positive & self._coverage_mask(token_indices, rows)
+        scores[bonus] = np.minimum(1.0, scores[bonus] + 0.05)
+
+        kept = np.flatnonzero(positive & (scores >= 0.05))
+        order = self._top_order(kept, scores[kept], top_n)
+        return [(self.series_names[i], float(scores[i])) for i in kept[order]]
+
+    def _query_weights(self, query_counts: Dict[str, float]) -> Tuple[List[int], np.ndarray]:
+        """Termes connus de la requete et leurs poids TF-IDF normalises (cf. vectorize_query)."""
+        token_indices: List[int] = []
+        values: List[float] = []
+        for token, count in query_counts.items():
+            idx = self.vocabulary.get(token)
+            if idx is not None:
+                token_indices.append(idx)
+                values.append(count * float(self.idf[idx]))
+        weights = np.asarray(values, dtype=np.float64)
+        if weights.size:
+            weights /= np.linalg.norm(weights)
+        return token_indices, weights
+
+    def _coverage_mask(self, token_indices: List[int], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Masque des series contenant tous les termes (postings concatenees si deja calculees)."""
+        if rows is None:
+            rows = np.concatenate([self.postings(idx)[0] for idx in token_indices])
+        return np.bincount(rows, minlength=self._X.shape[0]) == len(token_indices)
 
-        scored.sort(key=lambda item: item[1], reverse=True)
-        return scored[:top_n]
+    @staticmethod
+    def _top_order(rows: np.ndarray, scores: np.ndarray, top_n: int) -> np.ndarray:
+        """
+        Positions des top_n meilleurs scores, par score decroissant puis indice de
+        serie croissant (meme ordre qu'un tri stable). argpartition evite le tri complet.
+        """
+        if top_n <= 0:
+            return np.zeros(0, dtype=np.int64)
+        if len(scores) > top_n:
+            cutoff = scores[np.argpartition(scores, len(scores) - top_n)[len(scores) - top_n]]
+            candidates = np.flatnonzero(scores >= cutoff)
+        else:
+            candidates = np.arange(len(scores))
+        order = np.lexsort((rows[candidates], -scores[candidates]))
+        return candidates[order[:top_n]]
 
     # ----------------------
     # Utilitaires d'accès interne
@@ -160,13 +388,12 @@ class SearchEngine:
         series_idx = self._name_to_index.get(series_name)
         if series_idx is None:
             return False
-        row = self._X.getrow(series_idx)
-        return all(row[0, idx] > 0 for idx in token_indices)
+        return bool(self._coverage_mask(list(dict.fromkeys(token_indices)))[series_idx])
 
     def get_token_indices(self, tokens: List[str]) -> List[int]:
         indices: List[int] = []
         for token in tokens:
-            idx = self._dv.vocabulary_.get(token)
+            idx = self.vocabulary.get(token)
             if idx is None:
                 return []
             indices.append(idx)
@@ -177,12 +404,134 @@ class SearchEngine:
         if not tokens:
             return {}
 
-        scores: Dict[str, float] = {}
-        for name in self.series_names:
-            term_counts = self._series_counts.get(name, {})
-            if all(token in term_counts for token in tokens):
-                scores[name] = float(sum(term_counts[token] for token in tokens))
-        return scores
+        rows, keyword, _ = self.conjunctive_scores(dict.fromkeys(tokens, 1.0))
+        return {self.series_names[i]: float(score) for i, score in zip(rows, keyword)}
+
+    def postings(self, term_idx: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Liste de postings d'un terme : (series triees, occurrences, poids TF-IDF)."""
+        start, end = int(self._post_indptr[term_idx]), int(self._post_indptr[term_idx + 1])
+        return (
+            self._post_rows[start:end],
+            self._post_counts[start:end],
+            self._post_weights[start:end],
+        )
+
+    def conjunctive_scores(
+        self, query_counts: Dict[str, float]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Series contenant tous les termes de la requete, via l'index inverse.
+        Retourne (indices de series croissants, score mots-cles = somme des
+        occurrences, similarite cosinus TF-IDF avec la requete). Seules les
+        postings des termes demandes sont parcourues.
+        """
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0))
+        term_ids, query_weights = self._query_weights(query_counts)
+        if not term_ids or len(term_ids) != len(query_counts):
+            return empty
+
+        lists = [self.postings(idx) for idx in term_ids]
+        # Intersection en partant de la liste la plus courte.
+        candidates = min(lists, key=lambda posting: len(posting[0]))[0]
+        for rows, _, _ in lists:
+            if len(candidates) == 0:
+                return empty
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+
+        keyword = np.zeros(len(candidates))
+        tfidf = np.zeros(len(candidates))
+        for (rows, counts, weights), q_weight in zip(lists, query_weights):
+            positions = np.searchsorted(rows, candidates)
+            keyword += counts[positions]
+            tfidf += q_weight * weights[positions]
+        return candidates, keyword, tfidf
+
+    def rank_query(
+        self, query_counts: Dict[str, float], top_n: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """Classement de /api/search : series couvrant tous les termes, score combine."""
+        rows, keyword, tfidf = self.conjunctive_scores(query_counts)
+        combined = TFIDF_WEIGHT * tfidf + KEYWORD_WEIGHT * keyword
+        kept = combined >= MIN_COMBINED_SCORE
+        rows, combined = rows[kept], combined[kept]
+        order = self._top_order(rows, combined, len(rows) if top_n is None else top_n)
+        return [(self.series_names[i], float(combined[pos])) for i, pos in zip(rows[order], order)]
+
+    def _batch_operands(self) -> Tuple[csr_matrix, csr_matrix]:
+        """[X | counts].T en CSR et son motif binaire, construits au premier lot puis gardes."""
+        if self._batch_cache is None:
+            right = hstack([self._X, self._counts], format="csr").T.tocsr()
+            pattern = csr_matrix((np.ones(right.nnz), right.indices, right.indptr), shape=right.shape)
+            self._batch_cache = (right, pattern)
+        return self._batch_cache
+
+    def search_many(
+        self, queries: List[str], top_n: Optional[int] = 10
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Version par lots de rank_query() : les vecteurs de toutes les requetes sont
+        empiles dans une matrice CSR et scores en deux produits creux contre le
+        corpus (score combine et couverture des termes), au lieu d'un passage
+        par requete.
+        """
+        results: List[List[Tuple[str, float]]] = [[] for _ in queries]
+        n_series, n_terms = self._X.shape
+        if not queries or n_series == 0 or n_terms == 0:
+            return results
+
+        rows: List[int] = []
+        cols: List[int] = []
+        weights: List[float] = []
+        n_tokens = np.zeros(len(queries), dtype=np.int64)
+        for qi, query in enumerate(queries):
+            query_counts = self._query_to_counts(query or "")
+            term_ids, query_weights = self._query_weights(query_counts)
+            # Comme /api/search : un terme inconnu du corpus ne peut rien couvrir.
+            if not term_ids or len(term_ids) != len(query_counts):
+                continue
+            rows.extend([qi] * len(term_ids))
+            cols.extend(term_ids)
+            weights.extend(query_weights.tolist())
+            n_tokens[qi] = len(term_ids)
+        if not rows:
+            return results
+
+        # [0.7 * q_tfidf | 0.3 * q_binaire] @ [X | counts].T donne le score combine.
+        shape = (len(queries), n_terms)
+        Q = csr_matrix((weights, (rows, cols)), shape=shape)
+        B = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=shape)
+        left = hstack([TFIDF_WEIGHT * Q, KEYWORD_WEIGHT * B], format="csr")
+        right, right_pattern = self._batch_operands()
+        combined = left @ right
+
+        # Meme produit sur les motifs binaires : chaque terme couvert compte 2
+        # (colonne TF-IDF + colonne occurrences). Sa structure peut differer de
+        # celle de `combined` (zeros elimines) : les series sont realignees par indice.
+        left_pattern = csr_matrix((np.ones(left.nnz), left.indices, left.indptr), shape=left.shape)
+        coverage = left_pattern @ right_pattern
+        combined.sort_indices()
+        coverage.sort_indices()
+
+        for qi in np.flatnonzero(n_tokens):
+            start, end = combined.indptr[qi], combined.indptr[qi + 1]
+            series = combined.indices[start:end]
+            scores = combined.data[start:end]
+            covered = self._aligned_row(coverage, qi, series)
+            kept = (covered == 2 * n_tokens[qi]) & (scores >= MIN_COMBINED_SCORE)
+            series, scores = series[kept], scores[kept]
+            order = self._top_order(series, scores, len(series) if top_n is None else top_n)
+            results[qi] = [(self.series_names[i], float(scores[pos])) for i, pos in zip(series[order], order)]
+        return results
+
+    @staticmethod
+    def _aligned_row(matrix: csr_matrix, row: int, columns: np.ndarray) -> np.ndarray:
+        """Valeurs de `matrix[row]` aux colonnes `columns` (0 si absentes) ; indices tries."""
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        row_columns, row_values = matrix.indices[start:end], matrix.data[start:end]
+        if len(row_columns) == 0:
+            return np.zeros(len(columns))
+        positions = np.minimum(np.searchsorted(row_columns, columns), len(row_columns) - 1)
+        return np.where(row_columns[positions] == columns, row_values[positions], 0.0)
 
     def similar_by_name(self, series_name: str, top_n: int = 5) -> List[Tuple[str, float]]:
         """Retourne les séries les plus proches en cosinus TF-IDF."""
@@ -223,34 +572,30 @@ def keyword_search(query: str, top_n: int = 50) -> List[Tuple[str, float]]:
     """
     from collections import defaultdict
 
-    query_terms = [token.lower() for token in (query or "").split() if len(token) > 2]
-    if not query_terms:
+    # Les termes sont stockes normalises (table term) : memes tokens qu'a la requete.
+    words = sorted({token for token in tokenize(query or "") if is_index_token(token)})
+    if not words:
         return []
 
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-
     scores = defaultdict(float)
     found_terms = defaultdict(set)
-    try:
-        for term in query_terms:
-            cursor = conn.execute(
-                """
-                SELECT tvshow.name, tvshow_term.count
-                FROM tvshow_term
-                JOIN tvshow ON tvshow_term.tvshow_id = tvshow.id
-                WHERE lower(tvshow_term.term) = ?
-                """,
-                (term,),
-            )
-            for row in cursor:
-                name = row["name"]
-                scores[name] += float(row["count"] or 0.0)
-                found_terms[name].add(term)
-    finally:
-        conn.close()
-
-    must_have = set(query_terms)
+    with connection(DB_PATH, readonly=True) as conn:
+        cursor = conn.execute(
+            f"""
+            SELECT tvshow.name, term.text, tvshow_term.count
+            FROM term
+            JOIN tvshow_term ON tvshow_term.term_id = term.id
+            JOIN tvshow ON tvshow_term.tvshow_id = tvshow.id
+            WHERE term.text IN ({", ".join("?" * len(words))})
+            """,
+            words,
+        )
+        for row in cursor:
+            name = row["name"]
+            scores[name] += float(row["count"] or 0.0)
+            found_terms[name].add(row["text"])
+
+    must_have = set(words)
     filtered: List[Tuple[str, float]] = [
         (name, scores[name])
         for name, terms in found_terms.items()
@@ -258,3 +603,35 @@ def keyword_search(query: str, top_n: int = 50) -> List[Tuple[str, float]]:
     ]
     filtered.sort(key=lambda item: item[1], reverse=True)
     return filtered[:top_n]
+
+
+def index_catalog_version(index_dir: str = INDEX_DIR) -> Optional[int]:
+    """Version du catalogue de l'index ecrit dans `index_dir` (None si absent ou d'un autre format)."""
+    try:
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format_version") != INDEX_FORMAT_VERSION:
+        return None
+    return meta.get("catalog_version")
+
+
+def build_index(index_dir: str = INDEX_DIR) -> SearchEngine:
+    """Construit le moteur depuis la base et l'ecrit sur disque (tache hors ligne)."""
+    engine = SearchEngine.from_db()
+    engine.save_index(index_dir)
+    return engine
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construire l'index TF-IDF persistant")
+    parser.add_argument("--index-dir", type=str, default=INDEX_DIR, help="Dossier de sortie de l'index")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    built = build_index(args.index_dir)
+    print(
+        f"Index ecrit dans {args.index_dir} : {built._X.shape[0]} series, "
+        f"{built._X.shape[1]} termes, {built._X.nnz} entrees ({time.perf_counter() - start:.2f}s)"
+    )
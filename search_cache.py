@@ -0,0 +1,179 @@
+"""
+search_cache.py
+Role : cache LRU + TTL des reponses de /api/search, avec un second niveau
+SQLite optionnel partage entre workers.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+CacheKey = Tuple[Tuple[str, float], ...]
+
+SHARED_PURGE_EVERY = 256
+
+
+class SearchCache:
+    """
+    Cache borne des resultats de recherche.
+    - Cle : tokens normalises de la requete (tokenizer.py, via SearchEngine._query_to_counts)
+    - Chaque entree est liee a la version de l'index qui l'a produite ; une entree
+      d'une autre version est ignoree (compteur "stale"), jamais servie
+    - Expiration apres `ttl` secondes, eviction LRU au-dela de `max_entries`
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 300.0,
+        shared_db_path: Optional[str] = None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_db_path = shared_db_path
+        # Erreurs du niveau partage (app.logger cote application).
+        self.logger = logger or logging.getLogger(__name__)
+        self._entries: "OrderedDict[CacheKey, Tuple[str, float, list]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shared_writes = 0
+        self._counters: Dict[str, int] = dict.fromkeys(
+            ("hits", "misses", "evictions", "expirations", "stale", "shared_hits"), 0
+        )
+        if shared_db_path:
+            try:
+                self._shared_connection().execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS search_cache (
+                        cache_key TEXT NOT NULL,
+                        index_version TEXT NOT NULL,
+                        payload TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        PRIMARY KEY (cache_key, index_version)
+                    )
+                    """
+                )
+            except sqlite3.Error as exc:
+                self.logger.warning("Erreur cache partage: %s", exc)
+
+    @staticmethod
+    def key_for(query_counts: Dict[str, float]) -> CacheKey:
+        """Cle independante de l'ordre des mots dans la requete."""
+        return tuple(sorted(query_counts.items()))
+
+    # ----------------------
+    # Acces
+    # ----------------------
+    def get(self, key: CacheKey, index_version: str) -> Optional[list]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                version, expires_at, payload = entry
+                if version == index_version and expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return payload
+                del self._entries[key]
+                self._counters["expirations" if version == index_version else "stale"] += 1
+
+        payload = self._shared_get(key, index_version)
+        with self._lock:
+            if payload is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["shared_hits"] += 1
+            self._store(key, index_version, payload, now)
+        return payload
+
+    def put(self, key: CacheKey, index_version: str, payload: list) -> None:
+        with self._lock:
+            self._store(key, index_version, payload, time.monotonic())
+        self._shared_put(key, index_version, payload)
+
+    def clear(self) -> None:
+        """
+        Vide le cache local (appele a chaque reconstruction de l'index). Le niveau
+        partage n'est pas vide : ses entrees sont cle par version, celles des autres
+        workers restent valables ; seules les entrees expirees sont purgees.
+        """
+        with self._lock:
+            self._entries.clear()
+        self._shared_purge()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "size": len(self._entries), "max_entries": self.max_entries}
+
+    def _store(self, key: CacheKey, index_version: str, payload: list, now: float) -> None:
+        self._entries[key] = (index_version, now + self.ttl, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    # ----------------------
+    # Niveau partage (SQLite)
+    # ----------------------
+    def _shared_connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            # Processus fils (fork, comme dans db.py) : la connexion du parent n'est pas reprise.
+            conn = sqlite3.connect(self.shared_db_path, timeout=1.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _shared_get(self, key: CacheKey, index_version: str) -> Optional[list]:
+        if not self.shared_db_path:
+            return None
+        try:
+            row = self._shared_connection().execute(
+                "SELECT payload FROM search_cache WHERE cache_key = ? AND index_version = ? AND expires_at > ?",
+                (json.dumps(key), index_version, time.time()),
+            ).fetchone()
+        except sqlite3.Error as exc:
+            self.logger.warning("Erreur cache partage: %s", exc)
+            return None
+        return json.loads(row[0]) if row else None
+
+    def _shared_put(self, key: CacheKey, index_version: str, payload: List[dict]) -> None:
+        if not self.shared_db_path:
+            return
+        try:
+            conn = self._shared_connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO search_cache (cache_key, index_version, payload, expires_at) VALUES (?, ?, ?, ?)",
+                    (json.dumps(key), index_version, json.dumps(payload), time.time() + self.ttl),
+                )
+        except sqlite3.Error as exc:
+            self.logger.warning("Erreur cache partage: %s", exc)
+            return
+        # Purge periodique des entrees expirees (pas de processus de nettoyage dedie).
+        with self._lock:
+            self._shared_writes += 1
+            purge = self._shared_writes % SHARED_PURGE_EVERY == 0
+        if purge:
+            self._shared_purge()
+
+    def _shared_purge(self) -> None:
+        """Supprime les entrees expirees du niveau partage (dont celles des anciennes versions)."""
+        if not self.shared_db_path:
+            return
+        try:
+            conn = self._shared_connection()
+            with conn:
+                conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as exc:
+            self.logger.warning("Erreur cache partage: %s", exc)
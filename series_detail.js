@@ -70,7 +70,7 @@
           const res = await fetch("/api/rate", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ serie_name: serieName, rating }),
+            body: JSON.stringify({ serie_id: serieId, serie_name: serieName, rating }),
           });
           const data = await res.json();
           if (!data.success) {
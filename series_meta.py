@@ -0,0 +1,62 @@
+"""
+series_meta.py
+Role : metadonnees des series (id, nom, image, synopsis) en memoire.
+
+La table tvshow est lue en une requete puis indexee par id, par nom exact et
+par nom sans casse : les APIs de recherche et de recommandation enrichissent
+leurs resultats sans requete SQL. Un rechargement construit un nouvel objet
+qui remplace l'ancien d'un bloc (jamais modifie en place).
+"""
+
+import sqlite3
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from catalog import catalog_version
+
+
+class SeriesRecord(NamedTuple):
+    id: int
+    name: str
+    image_url: Optional[str]
+    synopsis: Optional[str]
+
+
+class SeriesMeta:
+    """
+    Index en memoire des series.
+    - records : toutes les series, ids croissants
+    - by_id / by_name : acces par id et par nom exact
+    - find(name) : nom exact, sinon a la casse pres
+    Pour des homonymes, la serie de plus petit id est retenue.
+    """
+
+    def __init__(self, records: Iterable[SeriesRecord], catalog_version: int = 0):
+        self.records: List[SeriesRecord] = sorted(records, key=lambda record: record.id)
+        self.by_id: Dict[int, SeriesRecord] = {record.id: record for record in self.records}
+        self.by_name: Dict[str, SeriesRecord] = {}
+        self._by_lower_name: Dict[str, SeriesRecord] = {}
+        for record in self.records:
+            self.by_name.setdefault(record.name, record)
+            self._by_lower_name.setdefault(record.name.lower(), record)
+        self.catalog_version = catalog_version
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, series_id: int) -> Optional[SeriesRecord]:
+        return self.by_id.get(series_id)
+
+    def find(self, name: Optional[str]) -> Optional[SeriesRecord]:
+        """Serie de nom `name` (comparaison exacte puis sans casse)."""
+        if name is None:
+            return None
+        record = self.by_name.get(name)
+        if record is None:
+            record = self._by_lower_name.get(str(name).lower())
+        return record
+
+    @classmethod
+    def from_db(cls, conn: sqlite3.Connection) -> "SeriesMeta":
+        version = catalog_version(conn)
+        rows = conn.execute("SELECT id, name, image_url, synopsis FROM tvshow ORDER BY id").fetchall()
+        return cls((SeriesRecord(row[0], str(row[1] or ""), row[2], row[3]) for row in rows), version)
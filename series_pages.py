@@ -0,0 +1,131 @@
+"""
+series_pages.py
+Role : pages pre-rendues de /api/series (JSON serialise, ETag, gzip/brotli).
+
+Une page est definie par (champs, curseur, limite). Elle est serialisee une
+seule fois, avec son ETag fort ; ses variantes compressees sont calculees a la
+premiere demande puis gardees. Les pages sont liees a un SeriesMeta : un
+nouveau catalogue (nouvel objet SeriesMeta) s'accompagne d'un nouveau
+SeriesPages, l'ancien n'est jamais modifie.
+
+Pagination par curseur : `cursor` est le dernier id recu, la page suivante
+commence au premier id strictement superieur (next_cursor dans la reponse,
+null en fin de liste).
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+from series_meta import SeriesMeta
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SERIES_FIELDS = ("id", "name", "image_url", "synopsis")
+MAX_PAGE_SIZE = 1000
+# En dessous, la compression ne vaut pas l'en-tete Content-Encoding.
+MIN_COMPRESS_BYTES = 1024
+
+PageKey = Tuple[Tuple[str, ...], Optional[int], Optional[int]]
+
+
+def parse_fields(value: Optional[str]) -> Tuple[str, ...]:
+    """
+    Champs demandes ("id,name,image_url") dans l'ordre de SERIES_FIELDS ;
+    tous si `value` est vide. ValueError pour un champ inconnu.
+    """
+    if not value:
+        return SERIES_FIELDS
+    requested = {field.strip() for field in value.split(",") if field.strip()}
+    unknown = requested.difference(SERIES_FIELDS)
+    if unknown:
+        raise ValueError(f"Champs inconnus : {', '.join(sorted(unknown))}")
+    return tuple(field for field in SERIES_FIELDS if field in requested) or SERIES_FIELDS
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Encodages proposes, par ordre de preference (br seulement si brotli est installe)."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+class RenderedPage:
+    """Corps JSON d'une page, son ETag et ses variantes compressees."""
+
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+        self._encoded: Dict[str, bytes] = {}
+
+    def variant(self, encoding: Optional[str]) -> Tuple[bytes, str, Optional[str]]:
+        """
+        (corps, ETag, encodage applique) pour `encoding` ("br", "gzip" ou None ;
+        une petite page n'est pas compressee). Chaque variante a son propre
+        ETag fort : le corps envoye n'est pas le meme.
+        """
+        if encoding is None or len(self.body) < MIN_COMPRESS_BYTES:
+            return self.body, self.etag, None
+        data = self._encoded.get(encoding)
+        if data is None:
+            # Deux requetes simultanees peuvent compresser deux fois : resultat identique.
+            if encoding == "br":
+                data = brotli.compress(self.body, quality=9)
+            else:
+                data = gzip.compress(self.body, compresslevel=9, mtime=0)
+            self._encoded[encoding] = data
+        return data, f"{self.etag}-{encoding}", encoding
+
+
+class SeriesPages:
+    """
+    Pages de /api/series pour un catalogue (SeriesMeta), en cache LRU borne
+    a `max_entries` combinaisons (champs, curseur, limite).
+    """
+
+    def __init__(self, meta: SeriesMeta, max_entries: int = 256):
+        self.meta = meta
+        self.max_entries = max_entries
+        # Comme l'ancienne requete SQL : series sans nom exclues, ids croissants.
+        self._records = [record for record in meta.records if record.name]
+        self._ids = [record.id for record in self._records]
+        self._entries: "OrderedDict[PageKey, RenderedPage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def page(self, fields: Sequence[str], cursor: Optional[int] = None, limit: Optional[int] = None) -> RenderedPage:
+        key: PageKey = (tuple(fields), cursor, limit)
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None:
+                self._entries.move_to_end(key)
+                return page
+
+        page = self._render(key)
+        with self._lock:
+            self._entries[key] = page
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return page
+
+    def _render(self, key: PageKey) -> RenderedPage:
+        fields, cursor, limit = key
+        start = bisect_right(self._ids, cursor) if cursor is not None else 0
+        stop = len(self._records) if limit is None else min(start + limit, len(self._records))
+        records = self._records[start:stop]
+        results = [
+            {field: (record.synopsis or "") if field == "synopsis" else getattr(record, field) for field in fields}
+            for record in records
+        ]
+        next_cursor = records[-1].id if records and stop < len(self._records) else None
+        payload = {"count": len(results), "results": results, "next_cursor": next_cursor}
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+        return RenderedPage(body, f"{self.meta.catalog_version}-{digest}")
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+subtitle_pipeline.py
+Role : pipeline ETL en flux, des archives de sous-titres jusqu'a la table
+tvshow_term, sans fichiers intermediaires.
+
+Remplace la chaine extract_subtitles.py -> count_words_series.py ->
+clean_word_frequency.py -> import_series_terms.py : chaque serie est lue
+(fichiers .srt/.sub et archives .zip/.7z, imbriquees ou non, ouvertes en
+memoire), comptee, filtree (stopwords, mots <= 2 lettres) puis inseree.
+Une seule serie est en memoire a la fois.
+
+Chaque fichier lu est inscrit dans la table etl_manifest (taille, mtime,
+empreinte du contenu, compteurs du fichier). Avec --incremental, seuls les
+fichiers ajoutes, modifies ou supprimes depuis le dernier passage sont
+relus, et leur difference de compteurs est appliquee a tvshow_term.
+
+Usage:
+    python subtitle_pipeline.py --data-dir sous-titres [--db database/tvshow.db]
+                                [--incremental] [--debug-dir debug]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from catalog import bump_catalog_version
+from clean_word_frequency import is_index_token
+from count_words_series import (
+    count_words_in_source,
+    get_available_series,
+    list_subtitle_files,
+    merge_counters,
+    save_word_count,
+)
+from import_series_terms import TermDictionary, bulk_insert_terms, bulk_session, refresh_term_df
+
+# (path, series, size, mtime_ns, digest, counts)
+ManifestEntry = Tuple[str, str, int, int, str, str]
+
+
+# ----------------------
+# Lecture des sources
+# ----------------------
+def iter_series_sources(series_dir: Path) -> Iterator[Path]:
+    """Fichiers de sous-titres et archives d'une serie (count_words_series.list_subtitle_files)."""
+    yield from list_subtitle_files(series_dir)
+
+
+# ----------------------
+# Comptage et filtrage
+# ----------------------
+def count_series(data_dir: Path, series_name: str) -> Tuple[Counter, List[ManifestEntry], int, int]:
+    """
+    Relit tous les fichiers d'une serie.
+    Retourne (compteur de la serie, entrees du manifeste, nb de sous-titres, octets lus).
+    """
+    counters = []
+    entries = []
+    n_subtitles = n_bytes = 0
+    for path in iter_series_sources(data_dir / series_name):
+        stat = path.stat()
+        data = path.read_bytes()
+        counter, n_members = count_words_in_source(path, data)
+        # Entree ecrite avant la fusion : merge_counters modifie le premier compteur en place.
+        entries.append(_manifest_entry(data_dir, series_name, path, stat, data, counter))
+        counters.append(counter)
+        n_subtitles += n_members
+        n_bytes += len(data)
+    return merge_counters(counters), entries, n_subtitles, n_bytes
+
+
+def iter_clean_terms(counter: Counter) -> Iterator[Tuple[str, int]]:
+    """Memes regles que clean_word_frequency.py : ni stopword, ni mot de <= 2 lettres."""
+    for word, count in counter.most_common():
+        if is_index_token(word):
+            yield word, count
+
+
+def _write_debug_files(debug_dir: Path, series_name: str, counter: Counter) -> None:
+    raw_dir = debug_dir / "data_word_frequency"
+    clean_dir = debug_dir / "data_word_frequency_clean"
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    clean_dir.mkdir(parents=True, exist_ok=True)
+    save_word_count(counter, raw_dir / f"{series_name}.txt")
+    with open(clean_dir / f"{series_name}.txt", "w", encoding="utf-8") as f:
+        for word, count in iter_clean_terms(counter):
+            f.write(f"{word}:{count}\n")
+
+
+# ----------------------
+# Manifeste des fichiers
+# ----------------------
+def ensure_manifest(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS etl_manifest (
+            path TEXT PRIMARY KEY,
+            series TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            digest TEXT NOT NULL,
+            counts TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_etl_manifest_series ON etl_manifest(series)")
+
+
+def _fingerprint(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _manifest_entry(data_dir: Path, series_name: str, path: Path, stat: os.stat_result,
+                    data: bytes, counter: Counter) -> ManifestEntry:
+    # Seuls les termes conserves dans tvshow_term sont stockes (le filtre ne depend que du mot).
+    counts = json.dumps(dict(iter_clean_terms(counter)), ensure_ascii=False)
+    return (path.relative_to(data_dir).as_posix(), series_name, stat.st_size, stat.st_mtime_ns,
+            _fingerprint(data), counts)
+
+
+def _has_manifest(conn: sqlite3.Connection, series_name: str) -> bool:
+    return conn.execute("SELECT 1 FROM etl_manifest WHERE series = ? LIMIT 1", (series_name,)).fetchone() is not None
+
+
+def _save_manifest(conn: sqlite3.Connection, entries: List[ManifestEntry]) -> None:
+    conn.executemany(
+        "INSERT OR REPLACE INTO etl_manifest (path, series, size, mtime_ns, digest, counts) VALUES (?, ?, ?, ?, ?, ?)",
+        entries,
+    )
+
+
+# ----------------------
+# Base de donnees
+# ----------------------
+def get_or_create_show(cur: sqlite3.Cursor, series_name: str) -> int:
+    row = cur.execute("SELECT id FROM tvshow WHERE name = ?", (series_name,)).fetchone()
+    if row:
+        return row[0]
+    cur.execute("INSERT INTO tvshow (name) VALUES (?)", (series_name,))
+    return cur.lastrowid
+
+
+def clear_series_terms(conn: sqlite3.Connection, series_name: str) -> int:
+    """
+    Retire les termes et les entrees du manifeste d'une serie sans sous-titre
+    (dossier vide ou fichiers supprimes). Retourne le nb de lignes de tvshow_term supprimees.
+    """
+    with conn:
+        row = conn.execute("SELECT id FROM tvshow WHERE name = ?", (series_name,)).fetchone()
+        n_deleted = 0
+        if row:
+            n_deleted = conn.execute("DELETE FROM tvshow_term WHERE tvshow_id = ?", (row[0],)).rowcount
+        conn.execute("DELETE FROM etl_manifest WHERE series = ?", (series_name,))
+    return n_deleted
+
+
+def store_series_terms(conn: sqlite3.Connection, terms: TermDictionary, series_name: str, counter: Counter,
+                       entries: List[ManifestEntry]) -> Tuple[int, int]:
+    """
+    Remplace le sac de mots d'une serie dans tvshow_term, ainsi que ses entrees
+    du manifeste (une transaction par serie).
+    Les mots sont deja normalises (count_words_series) : seuls leurs ids sont resolus.
+    Retourne (lignes inserees, anciennes lignes supprimees).
+    """
+    with conn:
+        cur = conn.cursor()
+        show_id = get_or_create_show(cur, series_name)
+        n_deleted = cur.execute("DELETE FROM tvshow_term WHERE tvshow_id = ?", (show_id,)).rowcount
+        clean_terms = list(iter_clean_terms(counter))
+        ids = terms.ids(word for word, _ in clean_terms)
+        n_rows = bulk_insert_terms(
+            conn,
+            ((show_id, ids[word], float(count)) for word, count in clean_terms),
+            or_clause="OR REPLACE",
+        )
+        cur.execute("DELETE FROM etl_manifest WHERE series = ?", (series_name,))
+        _save_manifest(conn, entries)
+        return n_rows, n_deleted
+
+
+def apply_term_delta(conn: sqlite3.Connection, terms: TermDictionary, show_id: int,
+                     delta: Dict[str, int]) -> int:
+    """Ajoute `delta` aux compteurs de la serie ; les termes tombes a 0 sont supprimes."""
+    ids = terms.ids(term for term, diff in delta.items() if diff)
+    changes = [(show_id, ids[term], float(diff)) for term, diff in delta.items() if diff]
+    conn.executemany(
+        """
+        INSERT INTO tvshow_term (tvshow_id, term_id, count) VALUES (?, ?, ?)
+        ON CONFLICT(tvshow_id, term_id) DO UPDATE SET count = count + excluded.count
+        """,
+        changes,
+    )
+    if any(diff < 0 for _, _, diff in changes):
+        conn.execute("DELETE FROM tvshow_term WHERE tvshow_id = ? AND count <= 0", (show_id,))
+    return len(changes)
+
+
+def update_series_incremental(conn: sqlite3.Connection, terms: TermDictionary, data_dir: Path,
+                              series_name: str) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Ne relit que les fichiers dont la taille ou le mtime a change, et seulement si
+    leur empreinte differe. Retourne (fichiers relus, fichiers supprimes, termes
+    modifies, octets lus), ou None si la serie n'a pas encore de manifeste.
+    """
+    known = {
+        row[0]: row[1:]
+        for row in conn.execute(
+            "SELECT path, size, mtime_ns, digest, counts FROM etl_manifest WHERE series = ?", (series_name,)
+        )
+    }
+    if not known:
+        return None
+
+    delta = Counter()
+    changed: List[ManifestEntry] = []
+    touched = []
+    n_bytes = 0
+    for path in iter_series_sources(data_dir / series_name):
+        rel_path = path.relative_to(data_dir).as_posix()
+        stat = path.stat()
+        previous = known.pop(rel_path, None)
+        if previous and previous[0] == stat.st_size and previous[1] == stat.st_mtime_ns:
+            continue
+        data = path.read_bytes()
+        n_bytes += len(data)
+        if previous and previous[2] == _fingerprint(data):
+            touched.append((stat.st_mtime_ns, rel_path))
+            continue
+        counter, _ = count_words_in_source(path, data)
+        entry = _manifest_entry(data_dir, series_name, path, stat, data, counter)
+        if previous:
+            delta.subtract(json.loads(previous[3]))
+        delta.update(json.loads(entry[5]))
+        changed.append(entry)
+
+    removed = list(known)
+    for rel_path in removed:
+        delta.subtract(json.loads(known[rel_path][3]))
+
+    if not (changed or removed or touched):
+        return 0, 0, 0, n_bytes
+
+    with conn:
+        n_terms = 0
+        if changed or removed:
+            show_id = get_or_create_show(conn.cursor(), series_name)
+            n_terms = apply_term_delta(conn, terms, show_id, delta)
+        _save_manifest(conn, changed)
+        conn.executemany("UPDATE etl_manifest SET mtime_ns = ? WHERE path = ?", touched)
+        conn.executemany("DELETE FROM etl_manifest WHERE path = ?", [(p,) for p in removed])
+    return len(changed), len(removed), n_terms, n_bytes
+
+
+def run_pipeline(data_dir: Path, db_path: Path, debug_dir: Optional[Path] = None, drop_index: bool = False,
+                 incremental: bool = False) -> None:
+    series_list = get_available_series(data_dir)
+    if not series_list:
+        print("❌ Aucun sous-dossier trouvé dans le dossier principal.")
+        return
+
+    conn = sqlite3.connect(db_path)
+    ensure_manifest(conn)
+    start = time.perf_counter()
+    total_files = total_bytes = total_rows = total_deleted = 0
+    try:
+        with bulk_session(conn, drop_index=drop_index):
+            terms = TermDictionary(conn)
+            for series_name in series_list:
+                if incremental:
+                    result = update_series_incremental(conn, terms, data_dir, series_name)
+                    if result is not None:
+                        n_changed, n_removed, n_terms, n_bytes = result
+                        total_files += n_changed
+                        total_bytes += n_bytes
+                        total_rows += n_terms
+                        if n_removed and not _has_manifest(conn, series_name):
+                            # Plus aucun fichier : ce qui reste de la série est retiré.
+                            total_deleted += clear_series_terms(conn, series_name)
+                        if n_changed or n_removed:
+                            print(f"✅ {series_name}: {n_changed} fichiers relus, {n_removed} supprimés, "
+                                  f"{n_terms} termes mis à jour")
+                        continue
+
+                counter, entries, n_files, n_bytes = count_series(data_dir, series_name)
+                total_files += n_files
+                total_bytes += n_bytes
+                if not counter:
+                    # Anciens termes et manifeste retirés : la série n'a plus de sous-titres.
+                    n_deleted = clear_series_terms(conn, series_name)
+                    total_deleted += n_deleted
+                    print(f"⚠️ {series_name}: aucun fichier SRT/SUB trouvé ou vide"
+                          + (f", {n_deleted} anciens termes supprimés" if n_deleted else ""))
+                    continue
+                if debug_dir is not None:
+                    _write_debug_files(debug_dir, series_name, counter)
+                n_rows, n_deleted = store_series_terms(conn, terms, series_name, counter, entries)
+                total_rows += n_rows
+                total_deleted += n_deleted
+                print(f"✅ {series_name}: {n_files} fichiers, {sum(counter.values())} mots, {n_rows} termes importés")
+            # Frequences documentaires (term.df) recalculees une fois, en fin de passage,
+            # des qu'une ligne de tvshow_term a ete ecrite ou supprimee.
+            if total_rows or total_deleted:
+                with conn:
+                    refresh_term_df(conn)
+                    bump_catalog_version(conn)
+    finally:
+        conn.close()
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"⏱️ {total_files} fichiers, {total_bytes / (1024 * 1024):.1f} Mo, {total_rows} termes en {elapsed:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sous-titres -> tvshow_term en un seul passage")
+    parser.add_argument("--data-dir", type=str, required=True,
+                        help="Dossier contenant les séries (archives ou sous-titres, un sous-dossier par série)")
+    parser.add_argument("--db", type=str, default=os.path.join("database", "tvshow.db"),
+                        help="Chemin vers le fichier SQLite")
+    parser.add_argument("--debug-dir", type=str, default=None,
+                        help="Écrit aussi les fichiers intermédiaires (data_word_frequency[_clean]) dans ce dossier")
+    parser.add_argument("--drop-index", action="store_true",
+                        help="Supprime l'index secondaire de tvshow_term pendant l'import et le reconstruit à la fin")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Ne relit que les fichiers ajoutés, modifiés ou supprimés depuis le dernier passage")
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    db_path = Path(args.db)
+    if not data_dir.exists():
+        print(f"❌ Dossier introuvable : {data_dir}")
+        return
+    if not db_path.exists():
+        print(f"Base de données introuvable: {db_path}. Initialisez-la d'abord.")
+        return
+
+    run_pipeline(data_dir, db_path, Path(args.debug_dir) if args.debug_dir else None, args.drop_index,
+                 args.incremental)
+
+
+if __name__ == "__main__":
+    main()
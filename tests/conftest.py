@@ -0,0 +1,13 @@
+"""Fixtures partagees : base SQLite vide au schema de init_all.py."""
+
+import pytest
+
+import init_all
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = tmp_path / "tvshow.db"
+    monkeypatch.setattr(init_all, "DB_PATH", str(path))
+    init_all.main()
+    return path
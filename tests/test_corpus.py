@@ -0,0 +1,82 @@
+"""corpus.py : la lecture par paquets donne la meme matrice qu'une lecture ligne a ligne."""
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+from corpus import Corpus, drop_empty_rows, load_term_matrix
+
+SHOWS = ["Lost", "Sans termes", "Dexter", "House"]
+ROWS = [
+    ("Lost", "avion", 5), ("Lost", "ile", 8), ("Dexter", "meurtre", 9), ("Dexter", "police", 4),
+    ("House", "hopital", 8), ("House", "police", 0), ("Lost", "police", 1.5),
+]
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        ids = {name: conn.execute("INSERT INTO tvshow (name) VALUES (?)", (name,)).lastrowid for name in SHOWS}
+        for name, text, count in ROWS:
+            conn.execute("INSERT OR IGNORE INTO term (text) VALUES (?)", (text,))
+            term_id = conn.execute("SELECT id FROM term WHERE text = ?", (text,)).fetchone()[0]
+            conn.execute(
+                "INSERT INTO tvshow_term (tvshow_id, term_id, count) VALUES (?, ?, ?)", (ids[name], term_id, count)
+            )
+        # Terme absent du dictionnaire et serie supprimee de tvshow : ignores.
+        conn.execute("INSERT INTO tvshow_term (tvshow_id, term_id, count) VALUES (?, 999, 3)", (ids["Lost"],))
+        conn.execute("INSERT INTO tvshow_term (tvshow_id, term_id, count) VALUES (999, 1, 3)")
+    yield conn
+    conn.close()
+
+
+def row_by_row(conn, names):
+    """Lecture d'origine : un dictionnaire {serie: {terme: compte}}."""
+    counts = {name: {} for name in names}
+    for name, text, count in conn.execute(
+        "SELECT s.name, t.text, st.count FROM tvshow_term st "
+        "JOIN tvshow s ON s.id = st.tvshow_id JOIN term t ON t.id = st.term_id WHERE st.count > 0"
+    ):
+        if name in counts:
+            counts[name][text] = count
+    return counts
+
+
+def as_dicts(corpus):
+    dense = corpus.counts.toarray()
+    return {
+        name: {term: dense[i, j] for j, term in enumerate(corpus.terms) if dense[i, j]}
+        for i, name in enumerate(corpus.names)
+    }
+
+
+def test_from_db_matches_row_by_row(conn):
+    corpus = Corpus.from_db(conn)
+    assert corpus.names == SHOWS
+    assert list(corpus.show_ids) == sorted(corpus.show_ids)
+    assert as_dicts(corpus) == row_by_row(conn, SHOWS)
+    assert corpus.counts.shape == (len(SHOWS), len(corpus.terms))
+
+
+def test_from_db_subset(conn):
+    ids = [row[0] for row in conn.execute("SELECT id FROM tvshow WHERE name IN ('Dexter', 'Sans termes')")]
+    corpus = Corpus.from_db(conn, ids)
+    assert corpus.names == ["Sans termes", "Dexter"]
+    assert as_dicts(corpus) == row_by_row(conn, corpus.names)
+
+
+def test_chunk_size_does_not_change_the_matrix(conn):
+    row_ids, col_ids, whole = load_term_matrix(conn)
+    for chunk_rows in (1, 2, 3):
+        chunk_row_ids, chunk_col_ids, chunked = load_term_matrix(conn, chunk_rows=chunk_rows)
+        assert np.array_equal(chunk_row_ids, row_ids) and np.array_equal(chunk_col_ids, col_ids)
+        assert (chunked != whole).nnz == 0
+
+
+def test_drop_empty_rows(conn):
+    corpus = Corpus.from_db(conn)
+    matrix, kept = drop_empty_rows(corpus.counts)
+    assert [corpus.names[i] for i in kept] == ["Lost", "Dexter", "House"]
+    assert (matrix != corpus.counts[kept]).nnz == 0
@@ -0,0 +1,119 @@
+"""count_words_series.py : mode parallele, archives et analyse des sous-titres."""
+
+import io
+import re
+import zipfile
+from collections import Counter
+
+import pytest
+
+from count_words_series import (
+    count_series_parallel,
+    count_words_in_bytes,
+    count_words_in_file,
+    count_words_in_series,
+    count_words_in_source,
+)
+from tokenizer import tokenize
+
+
+def _srt(text, encoding="utf-8"):
+    return f"1\r\n00:00:01,000 --> 00:00:02,000\r\n{text}\r\n\r\n2\r\n00:00:03,000 --> 00:00:04,000\r\nFin.\r\n".encode(encoding)
+
+
+def _make_data_dir(root):
+    episodes = {
+        "Lost": ["Un avion tombe sur une île.", "L'île cache un mystère.", "Le mystère de l'avion."],
+        "Dexter": ["Le sang ne ment pas.", "La police enquête sur le meurtre."],
+        "Vide": [],
+    }
+    for series, texts in episodes.items():
+        series_dir = root / series
+        series_dir.mkdir()
+        for i, text in enumerate(texts):
+            (series_dir / f"e{i:02d}.srt").write_bytes(_srt(text))
+    with zipfile.ZipFile(root / "Dexter" / "saison2.zip", "w") as archive:
+        archive.writestr("e10.srt", _srt("Un meurtre de plus."))
+    return sorted(episodes)
+
+
+def test_parallel_counts_match_sequential(tmp_path):
+    series_list = _make_data_dir(tmp_path)
+    parallel = list(count_series_parallel(tmp_path, series_list, workers=2))
+    assert [name for name, _ in parallel] == series_list
+    for name, counter in parallel:
+        sequential = count_words_in_series(tmp_path / name)
+        assert counter == sequential
+        # Meme ordre de sortie (save_word_count ecrit most_common()).
+        assert counter.most_common() == sequential.most_common()
+    assert dict(parallel)["Vide"] == {}
+
+
+def test_archives_count_like_extracted_files(tmp_path):
+    texts = {"e01.srt": "Un avion tombe.", "e02.srt": "L'île cache un mystère.", "e03.srt": "Le mystère de l'avion."}
+    extracted = tmp_path / "extracted"
+    extracted.mkdir()
+    for name, text in texts.items():
+        (extracted / name).write_bytes(_srt(text))
+
+    inner = io.BytesIO()
+    with zipfile.ZipFile(inner, "w") as archive:
+        archive.writestr("e03.srt", _srt(texts["e03.srt"]))
+    archived = tmp_path / "archived"
+    archived.mkdir()
+    with zipfile.ZipFile(archived / "saison1.zip", "w") as archive:
+        archive.writestr("e01.srt", _srt(texts["e01.srt"]))
+        archive.writestr("sous/e02.srt", _srt(texts["e02.srt"]))
+        archive.writestr("lisezmoi.txt", "pas un sous-titre")
+        archive.writestr("bonus.zip", inner.getvalue())
+
+    assert count_words_in_series(archived) == count_words_in_series(extracted)
+    data = (archived / "saison1.zip").read_bytes()
+    assert count_words_in_source(archived / "saison1.zip", data)[1] == 3
+
+
+def test_unreadable_archive_is_skipped(tmp_path):
+    (tmp_path / "e01.srt").write_bytes(_srt("Un avion tombe."))
+    (tmp_path / "casse.zip").write_bytes(b"PK pas une archive")
+    assert count_words_in_file(tmp_path / "casse.zip") == {}
+    assert count_words_in_series(tmp_path) == count_words_in_file(tmp_path / "e01.srt")
+
+
+SRT = (
+    "1\n00:00:01,000 --> 00:00:02,000\n<i>Qu'est-ce que</i> tu fais là, Jack ?\n\n"
+    "2\n00:00:03,500 --> 00:00:05,000\n- Rien.\n- Tu mens : 42 fois, l'été dernier.\n\n"
+    "3\n00:00:06,000 --> 00:00:07,000\n<font color=\"red\">Naïve</font> Hélène…\n"
+)
+
+SUB = "00:00:01:00,00:00:02:00\nÇa suffit, Kate.\n\n00:00:03:00,00:00:04:00\n12\n<b>Où</b> est l'avion ?\n"
+
+
+def legacy_tokens(text, suffix):
+    """Filtrage ligne par ligne d'origine (numeros, timings, balises), puis tokenizer.py."""
+    kept = []
+    for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+        line = line.strip()
+        if not line or line.isdigit():
+            continue
+        if "-->" in line if suffix == ".srt" else re.match(r"^\d{2}:\d{2}:\d{2}", line):
+            continue
+        kept.append(re.sub(r"<[^>]+>", " ", line))
+    return Counter(tokenize(" ".join(kept)))
+
+
+@pytest.mark.parametrize("suffix, text", [(".srt", SRT), (".sub", SUB)])
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+def test_single_pass_parser_matches_line_filter(suffix, text, newline):
+    text = text.replace("\n", newline)
+    assert count_words_in_bytes(text.encode("utf-8"), suffix) == legacy_tokens(text, suffix)
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "utf-16", "cp1252"])
+def test_encoding_is_detected(encoding):
+    counts = count_words_in_bytes(SRT.encode(encoding), ".srt")
+    assert counts == legacy_tokens(SRT, ".srt")
+    assert counts["helene"] == counts["ete"] == 1
+
+
+def test_unknown_suffix_counts_nothing():
+    assert count_words_in_bytes(SRT.encode("utf-8"), ".txt") == Counter()
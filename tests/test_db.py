@@ -0,0 +1,61 @@
+"""db.py : reutilisation des connexions, lecture seule, transactions abandonnees."""
+
+import sqlite3
+
+import pytest
+
+from db import ConnectionPool, connection, get_pool
+
+
+def test_connections_are_reused(db_path):
+    pool = ConnectionPool(str(db_path))
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    stats = pool.stats()
+    assert (stats["opened"], stats["reused"], stats["in_use"], stats["idle"]) == (1, 1, 0, 1)
+    assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    pool.close_all()
+
+
+def test_concurrent_borrowers_get_distinct_connections(db_path):
+    pool = ConnectionPool(str(db_path), max_idle=1)
+    a, b = pool.acquire(), pool.acquire()
+    assert a is not b
+    assert pool.stats()["peak_in_use"] == 2
+    pool.release(a)
+    pool.release(b)
+    # Au-dela de max_idle, la connexion rendue est fermee.
+    assert (pool.stats()["idle"], pool.stats()["closed"]) == (1, 1)
+    pool.close_all()
+
+
+def test_readonly_connections_cannot_write(db_path):
+    with connection(str(db_path), readonly=True) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM tvshow").fetchone()[0] == 0
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO tvshow (name) VALUES ('Lost')")
+    assert get_pool(str(db_path), readonly=True) is not get_pool(str(db_path))
+
+
+def test_open_transaction_is_rolled_back_on_release(db_path):
+    pool = ConnectionPool(str(db_path))
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO tvshow (name) VALUES ('Lost')")
+        assert conn.in_transaction
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM tvshow").fetchone()[0] == 0
+    pool.close_all()
+
+
+def test_pool_is_not_reused_after_fork(db_path, monkeypatch):
+    pool = ConnectionPool(str(db_path))
+    with pool.connection() as parent:
+        pass
+    monkeypatch.setattr("db.os.getpid", lambda: -1)
+    with pool.connection() as child:
+        assert child is not parent
+    pool.close_all()
+    parent.close()
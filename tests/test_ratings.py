@@ -0,0 +1,74 @@
+"""ratings.py : rating_stats suit chaque note ; migrate_ratings.py convertit les anciennes bases."""
+
+import sqlite3
+
+import pytest
+
+from migrate_ratings import migrate
+from ratings import average_rating, rebuild_rating_stats, set_rating, uses_show_names
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany("INSERT INTO tvshow (name) VALUES (?)", [("Lost",), ("Dexter",), ("lost",)])
+    yield conn
+    conn.close()
+
+
+def stats(conn):
+    return sorted(conn.execute("SELECT tvshow_id, count, sum FROM rating_stats"))
+
+
+def aggregated(conn):
+    """Agregats d'origine : COUNT/SUM sur toutes les notes de chaque serie."""
+    return sorted(conn.execute("SELECT tvshow_id, COUNT(*), SUM(rating) FROM ratings GROUP BY tvshow_id"))
+
+
+def test_set_rating_keeps_stats_in_sync(conn):
+    assert average_rating(conn, 1) is None
+    for username, show_id, rating in [("alice", 1, 4), ("bob", 1, 5), ("alice", 2, 2), ("alice", 1, 1), ("bob", 1, 5)]:
+        set_rating(conn, username, show_id, rating)
+        assert stats(conn) == aggregated(conn)
+    assert stats(conn) == [(1, 2, 6), (2, 1, 2)]
+    assert average_rating(conn, 1) == 3.0
+    assert average_rating(conn, 3) is None
+
+
+def test_rebuild_rating_stats_matches_incremental_updates(conn):
+    for username, show_id, rating in [("alice", 1, 4), ("bob", 2, 3), ("alice", 1, 2)]:
+        set_rating(conn, username, show_id, rating)
+    incremental = stats(conn)
+    with conn:
+        assert rebuild_rating_stats(conn) == 2
+    assert stats(conn) == incremental
+
+
+def test_migrate_resolves_show_names(conn):
+    with conn:
+        conn.execute("DROP TABLE ratings")
+        conn.execute("DROP TABLE rating_stats")
+        conn.execute(
+            """
+            CREATE TABLE ratings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT, tvshow_name TEXT, rating INTEGER
+            )
+            """
+        )
+        conn.executemany(
+            "INSERT INTO ratings (username, tvshow_name, rating) VALUES (?, ?, ?)",
+            [
+                ("alice", "LOST", 2), ("alice", "Lost", 5), ("alice", "lost", 3),
+                ("bob", "DEXTER", 4), ("bob", "Inconnue", 1),
+            ],
+        )
+    assert uses_show_names(conn)
+    assert migrate(conn) == (4, 1)
+    assert not uses_show_names(conn)
+    # "LOST" -> Lost (plus petit id a la casse pres), "lost" -> sa propre serie ; la note la plus recente gagne.
+    assert sorted(conn.execute("SELECT username, tvshow_id, rating FROM ratings")) == [
+        ("alice", 1, 5), ("alice", 3, 3), ("bob", 2, 4),
+    ]
+    assert stats(conn) == aggregated(conn)
+    assert list(conn.execute("SELECT username, tvshow_name, rating FROM ratings_unmatched")) == [("bob", "Inconnue", 1)]
@@ -0,0 +1,197 @@
+"""
+recommend.py : la table de voisins, les recommandations precalculees et les
+mises a jour incrementales donnent les memes resultats que le calcul en direct
+sur un modele complet.
+"""
+
+import sqlite3
+
+import pytest
+
+pytest.importorskip("sklearn")
+
+import recommend  # noqa: E402
+from catalog import bump_catalog_version  # noqa: E402
+
+SHOWS = {
+    "Lost": ("Des naufragés sur une île mystérieuse.", {"avion": 5, "ile": 8, "mystere": 3, "jungle": 2}),
+    "Survivor": ("Une aventure sur une île déserte.", {"ile": 6, "aventure": 4, "jungle": 3}),
+    "Dexter": ("Un expert de la police scientifique tue des tueurs.", {"meurtre": 9, "police": 4, "sang": 6}),
+    "Columbo": ("Un inspecteur de police résout des meurtres.", {"meurtre": 4, "police": 8, "enquete": 9}),
+    "Urgences": ("Les médecins d'un hôpital de Chicago.", {"hopital": 10, "medecin": 7, "police": 1}),
+    "House": ("Un médecin brillant dans un hôpital.", {"hopital": 8, "medecin": 9, "diagnostic": 5}),
+}
+
+
+def _insert_terms(conn, show_id, counts):
+    for text, count in counts.items():
+        conn.execute("INSERT OR IGNORE INTO term (text) VALUES (?)", (text,))
+        term_id = conn.execute("SELECT id FROM term WHERE text = ?", (text,)).fetchone()[0]
+        conn.execute(
+            "INSERT INTO tvshow_term (tvshow_id, term_id, count) VALUES (?, ?, ?)", (show_id, term_id, count)
+        )
+
+
+@pytest.fixture
+def catalog(db_path, tmp_path, monkeypatch):
+    """Base de quelques series ; recommend.py pointe dessus, sans modele ni table chargee."""
+    conn = sqlite3.connect(db_path)
+    with conn:
+        for name, (synopsis, counts) in SHOWS.items():
+            show_id = conn.execute(
+                "INSERT INTO tvshow (name, synopsis) VALUES (?, ?)", (name, synopsis)
+            ).lastrowid
+            _insert_terms(conn, show_id, counts)
+        bump_catalog_version(conn)
+    conn.close()
+
+    monkeypatch.setattr(recommend, "DB_PATH", str(db_path))
+    monkeypatch.setattr(recommend, "NEIGHBOURS_DIR", str(tmp_path / "content_neighbours"))
+    monkeypatch.setattr(recommend, "_model", None)
+    monkeypatch.setattr(recommend, "_neighbours", None)
+    monkeypatch.setattr(recommend, "_neighbours_loaded", False)
+    return db_path
+
+
+def show_id(db_path, name):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT id FROM tvshow WHERE name = ?", (name,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def live_by_content(name, top_n):
+    """recommend_by_content calcule sur le modele, sans table de voisins."""
+    table = recommend._neighbours_from_table
+    try:
+        recommend._neighbours_from_table = lambda *args: None
+        return recommend.recommend_by_content(name, top_n)
+    finally:
+        recommend._neighbours_from_table = table
+
+
+def as_scores(results):
+    return {name: pytest.approx(score) for name, score in results}
+
+
+def test_neighbour_table_matches_live_recommendations(catalog):
+    written = recommend.build_neighbour_table(top_k=3, out_dir=recommend.NEIGHBOURS_DIR)
+    assert written == len(SHOWS)
+    recommend.reload_neighbour_table()
+    assert recommend.has_neighbour_table()
+    for name in SHOWS:
+        from_table = recommend._neighbours_from_table(name, 3)
+        assert from_table is not None
+        assert [n for n, _ in from_table] == [n for n, _ in live_by_content(name, 3)]
+        assert as_scores(from_table) == as_scores(live_by_content(name, 3))
+    # Au-dela de K, calcul en direct.
+    assert recommend._neighbours_from_table("Lost", 5) is None
+
+
+def test_stale_neighbour_table_is_ignored(catalog):
+    recommend.build_neighbour_table(top_k=3, out_dir=recommend.NEIGHBOURS_DIR)
+    conn = sqlite3.connect(catalog)
+    with conn:
+        bump_catalog_version(conn)
+    conn.close()
+    recommend._ensure_content_model(force=True)
+    assert not recommend.has_neighbour_table()
+
+
+def test_incremental_update_matches_full_rebuild(catalog):
+    recommend._ensure_content_model(force=True)
+    recommend.build_neighbour_table(top_k=3, out_dir=recommend.NEIGHBOURS_DIR)
+
+    conn = sqlite3.connect(catalog)
+    with conn:
+        lost, dexter = show_id(catalog, "Lost"), show_id(catalog, "Dexter")
+        conn.execute("UPDATE tvshow SET synopsis = ? WHERE id = ?", ("Un médecin perdu dans la jungle.", lost))
+        _insert_terms(conn, dexter, {"hopital": 2})
+        new_id = conn.execute("INSERT INTO tvshow (name, synopsis) VALUES ('Scrubs', 'Internes à l''hôpital.')").lastrowid
+        _insert_terms(conn, new_id, {"hopital": 6, "medecin": 4, "humour": 5})
+        bump_catalog_version(conn)
+    conn.close()
+
+    recommend.update_content_model([lost, dexter, new_id])
+    # La table ecrite avant la mise a jour ne correspond plus au modele servi.
+    recommend.reload_neighbour_table()
+    assert not recommend.has_neighbour_table()
+    names = list(SHOWS) + ["Scrubs"]
+    incremental = {name: recommend.recommend_by_content(name, len(names)) for name in names}
+
+    recommend.install_content_model(recommend.build_content_model())
+    full = {name: live_by_content(name, len(names)) for name in names}
+    for name in names:
+        assert as_scores(incremental[name]) == as_scores(full[name])
+
+
+def test_update_with_no_ids_keeps_the_model(catalog):
+    model = recommend._ensure_content_model(force=True)
+    recommend.update_content_model([])
+    assert recommend.content_model() is model
+
+
+def rate(db_path, username, ratings):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO ratings (username, tvshow_id, rating) VALUES (?, ?, ?)",
+            [(username, show_id(db_path, name), rating) for name, rating in ratings.items()],
+        )
+    conn.close()
+
+
+def legacy_for_user(model, ratings, top_n):
+    """Profil d'origine : somme ligne par ligne des series notees, moyenne, puis cosinus."""
+    from sklearn.metrics.pairwise import cosine_similarity
+    from sklearn.preprocessing import normalize
+
+    rated = [(model.names.index(name), float(rating)) for name, rating in ratings.items()]
+    profile, weight_sum = None, 0.0
+    for idx, weight in rated:
+        weight = max(weight, 0.0)
+        if weight == 0:
+            continue
+        weight_sum += weight
+        contribution = weight * model.matrix[idx]
+        profile = contribution if profile is None else profile + contribution
+    if profile is None:
+        return []
+    scores = cosine_similarity(normalize(profile / weight_sum), model.matrix).ravel()
+    for idx, _ in rated:
+        scores[idx] = 0.0
+    order = sorted((i for i in range(len(scores)) if scores[i] > 0), key=lambda i: -scores[i])
+    return [(model.names[i], float(scores[i])) for i in order[:top_n]]
+
+
+@pytest.mark.parametrize("ratings", [{"Lost": 5, "Dexter": 2}, {"House": 4, "Columbo": 0}, {"Survivor": 0}])
+def test_recommend_for_user_matches_row_by_row_profile(catalog, ratings):
+    rate(catalog, "alice", ratings)
+    model = recommend._ensure_content_model(force=True)
+    expected = legacy_for_user(model, ratings, 3)
+    actual = recommend.recommend_for_user("alice", 3)
+    assert [n for n, _ in actual] == [n for n, _ in expected]
+    assert as_scores(actual) == as_scores(expected)
+    assert recommend.recommend_for_user("nobody", 3) == []
+
+
+def assert_same_recos(actual, expected):
+    assert [n for n, _ in actual] == [n for n, _ in expected]
+    assert as_scores(actual) == as_scores(expected)
+
+
+def test_batch_user_recommendations_match_live(catalog):
+    rate(catalog, "alice", {"Lost": 5, "Dexter": 2})
+    rate(catalog, "bob", {"House": 4, "Columbo": 1})
+    rate(catalog, "carol", {"Survivor": 0})
+    recommend._ensure_content_model(force=True)
+    assert recommend.build_user_recommendations(top_n=3) == 3
+    for username in ("alice", "bob", "carol"):
+        assert_same_recos(recommend.get_user_recommendations(username, 3), recommend.recommend_for_user(username, 3))
+
+    # Recalcul d'un seul utilisateur : les autres lignes restent en place.
+    rate(catalog, "alice", {"Urgences": 5})
+    assert recommend.build_user_recommendations(["alice"], top_n=3) == 1
+    for username in ("alice", "bob"):
+        assert_same_recos(recommend.get_user_recommendations(username, 3), recommend.recommend_for_user(username, 3))
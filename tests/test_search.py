@@ -0,0 +1,159 @@
+"""
+SearchEngine : le classement par postings (search, rank_query, search_many)
+donne les memes series et les memes scores que les calculs denses d'origine.
+"""
+
+import pytest
+
+pytest.importorskip("sklearn")
+
+from search import MIN_COMBINED_SCORE, KEYWORD_WEIGHT, TFIDF_WEIGHT, SearchEngine  # noqa: E402
+
+# "Clone" a les memes mots que "Lost" : scores egaux, departage par ordre des series.
+CORPUS = {
+    "Lost": {"avion": 5, "ile": 8, "mystere": 3},
+    "Clone": {"avion": 5, "ile": 8, "mystere": 3},
+    "Dexter": {"meurtre": 9, "police": 4, "sang": 6},
+    "Urgences": {"hopital": 10, "medecin": 7, "police": 1},
+    "Columbo": {"meurtre": 4, "police": 8, "enquete": 9},
+    "Vide": {"zzz": 1},
+}
+
+QUERIES = [
+    "avion",
+    "ile mystere",
+    "police",
+    "meurtre police",
+    "police hopital",
+    "meurtre avion",
+    "enquete enquete police",
+    "inconnu",
+    "police inconnu",
+    "",
+]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return SearchEngine(CORPUS)
+
+
+def legacy_search(engine, query, top_n=50):
+    """search() d'origine : produit dense q @ X.T puis boucle sur les series."""
+    if not query:
+        return []
+    sims = (engine.vectorize_query(query) @ engine._X.T).toarray().ravel()
+    token_indices = [engine.vocabulary[t] for t in engine._query_to_counts(query) if t in engine.vocabulary]
+    scored = []
+    for index, name in enumerate(engine.series_names):
+        score = float(sims[index])
+        if score <= 0:
+            continue
+        row = engine._X.getrow(index)
+        if token_indices and all(row[0, idx] > 0 for idx in token_indices):
+            score = min(1.0, score + 0.05)
+        if score >= 0.05:
+            scored.append((name, score))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:top_n]
+
+
+def legacy_rank(engine, query, top_n=None):
+    """Classement /api/search d'origine : series couvrant tous les termes, 0.7 TF-IDF + 0.3 occurrences."""
+    counts = engine._query_to_counts(query)
+    if not counts or any(t not in engine.vocabulary for t in counts):
+        return []
+    sims = (engine.vectorize_query(query) @ engine._X.T).toarray().ravel()
+    dense_counts = engine._counts.toarray()
+    scored = []
+    for index, name in enumerate(engine.series_names):
+        occurrences = [dense_counts[index, engine.vocabulary[t]] for t in counts]
+        if not all(occurrences):
+            continue
+        score = TFIDF_WEIGHT * sims[index] + KEYWORD_WEIGHT * sum(occurrences)
+        if score >= MIN_COMBINED_SCORE:
+            scored.append((name, score))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored if top_n is None else scored[:top_n]
+
+
+def assert_same_ranking(actual, expected):
+    assert [name for name, _ in actual] == [name for name, _ in expected]
+    assert [score for _, score in actual] == pytest.approx([score for _, score in expected])
+
+
+@pytest.mark.parametrize("top_n", [1, 2, 3, 50])
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_dense_ranking(engine, query, top_n):
+    assert_same_ranking(engine.search(query, top_n=top_n), legacy_search(engine, query, top_n))
+
+
+def test_search_ties_keep_series_order(engine):
+    ranked = engine.search("avion ile", top_n=2)
+    assert [name for name, _ in ranked] == ["Lost", "Clone"]
+    assert ranked[0][1] == pytest.approx(ranked[1][1])
+
+
+def test_empty_and_unknown_queries(engine):
+    assert engine.search("") == []
+    assert engine.search(None) == []
+    assert engine.search("inconnu") == []
+    assert engine.search("avion", top_n=0) == []
+    assert SearchEngine({}).search("avion") == []
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_rank_query_matches_dense_ranking(engine, query):
+    assert_same_ranking(engine.rank_query(engine._query_to_counts(query)), legacy_rank(engine, query))
+
+
+@pytest.mark.parametrize("top_n", [None, 1, 3])
+def test_search_many_matches_rank_query(engine, top_n):
+    batch = engine.search_many(QUERIES, top_n=top_n)
+    assert len(batch) == len(QUERIES)
+    for query, ranked in zip(QUERIES, batch):
+        assert_same_ranking(ranked, engine.rank_query(engine._query_to_counts(query), top_n=top_n))
+
+
+def test_search_many_empty_batch(engine):
+    assert engine.search_many([]) == []
+    assert engine.search_many(["", "inconnu"]) == [[], []]
+
+
+def test_aligned_row_ignores_structure_differences():
+    import numpy as np
+    from scipy.sparse import csr_matrix
+
+    coverage = csr_matrix(np.array([[0.0, 2.0, 0.0, 4.0], [0.0, 0.0, 0.0, 0.0]]))
+    columns = np.array([0, 1, 3])
+    assert SearchEngine._aligned_row(coverage, 0, columns).tolist() == [0.0, 2.0, 4.0]
+    assert SearchEngine._aligned_row(coverage, 1, columns).tolist() == [0.0, 0.0, 0.0]
+
+
+def test_catalog_bump_makes_the_persisted_index_stale(db_path, tmp_path):
+    import sqlite3
+
+    from catalog import bump_catalog_version
+    from corpus import load_corpus
+    from search import index_catalog_version
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        show_id = conn.execute("INSERT INTO tvshow (name) VALUES ('Lost')").lastrowid
+        term_id = conn.execute("INSERT INTO term (text) VALUES ('avion')").lastrowid
+        conn.execute("INSERT INTO tvshow_term (tvshow_id, term_id, count) VALUES (?, ?, 5)", (show_id, term_id))
+        bump_catalog_version(conn)
+    index_dir = str(tmp_path / "search_index")
+    engine = SearchEngine.from_corpus(load_corpus(str(db_path)))
+    engine.save_index(index_dir)
+    assert index_catalog_version(index_dir) == engine.catalog_version == 1
+    assert_same_ranking(SearchEngine.load_index(index_dir).search("avion"), engine.search("avion"))
+
+    # Un import incremente la version : l'index ecrit ne correspond plus, la reconstruction si.
+    with conn:
+        bump_catalog_version(conn)
+    conn.close()
+    rebuilt = SearchEngine.from_corpus(load_corpus(str(db_path)))
+    assert index_catalog_version(index_dir) != rebuilt.catalog_version == 2
+    rebuilt.save_index(index_dir)
+    assert index_catalog_version(index_dir) == 2
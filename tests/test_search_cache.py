@@ -0,0 +1,43 @@
+"""SearchCache : versions, niveau partage SQLite et compteurs."""
+
+from search_cache import SHARED_PURGE_EVERY, SearchCache
+
+KEY = SearchCache.key_for({"police": 1.0, "meurtre": 1.0})
+
+
+def test_key_ignores_word_order():
+    assert KEY == SearchCache.key_for({"meurtre": 1.0, "police": 1.0})
+
+
+def test_other_version_counts_as_stale():
+    cache = SearchCache()
+    cache.put(KEY, "v1", [{"id": 1}])
+    assert cache.get(KEY, "v1") == [{"id": 1}]
+    assert cache.get(KEY, "v2") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["stale"], stats["expirations"], stats["misses"]) == (1, 1, 0, 1)
+
+
+def test_clear_keeps_shared_entries_of_other_workers(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    writer = SearchCache(shared_db_path=db_path)
+    reader = SearchCache(shared_db_path=db_path)
+    writer.put(KEY, "v1", [{"id": 1}])
+    reader.clear()
+    assert reader.get(KEY, "v1") == [{"id": 1}]
+    assert reader.stats()["shared_hits"] == 1
+
+
+def test_shared_purge_drops_expired_rows(tmp_path):
+    cache = SearchCache(ttl=-1.0, shared_db_path=str(tmp_path / "cache.db"))
+    for i in range(SHARED_PURGE_EVERY):
+        cache.put(SearchCache.key_for({f"mot{i}": 1.0}), "v1", [])
+    rows = cache._shared_connection().execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+    assert rows == 0
+
+
+def test_shared_connection_is_reopened_after_fork(tmp_path, monkeypatch):
+    cache = SearchCache(shared_db_path=str(tmp_path / "cache.db"))
+    parent_conn = cache._shared_connection()
+    monkeypatch.setattr("search_cache.os.getpid", lambda: -1)
+    assert cache._shared_connection() is not parent_conn
@@ -0,0 +1,49 @@
+"""SeriesMeta : memes series que les requetes par id et par nom qu'il remplace."""
+
+import sqlite3
+
+import pytest
+
+from series_meta import SeriesMeta
+
+SHOWS = [
+    ("Lost", "lost.jpg", "Des naufrages."),
+    ("Dexter", None, "Un expert de la police."),
+    ("dexter", "autre.jpg", None),
+    ("The Office", "office.jpg", ""),
+]
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany("INSERT INTO tvshow (name, image_url, synopsis) VALUES (?, ?, ?)", SHOWS)
+    yield conn
+    conn.close()
+
+
+def test_get_matches_lookup_by_id(conn):
+    meta = SeriesMeta.from_db(conn)
+    assert len(meta) == len(SHOWS)
+    for row in conn.execute("SELECT id, name, image_url, synopsis FROM tvshow"):
+        assert tuple(meta.get(row[0])) == row
+    assert meta.get(999) is None
+
+
+@pytest.mark.parametrize("name", ["Lost", "LOST", "the office", "Inconnue"])
+def test_find_matches_lookup_by_lowercase_name(conn, name):
+    meta = SeriesMeta.from_db(conn)
+    row = conn.execute(
+        "SELECT id, name, image_url, synopsis FROM tvshow WHERE lower(name) = ? ORDER BY id LIMIT 1", (name.lower(),)
+    ).fetchone()
+    record = meta.find(name)
+    assert (tuple(record) if record else None) == row
+
+
+def test_find_prefers_exact_name_then_smallest_id(conn):
+    meta = SeriesMeta.from_db(conn)
+    assert meta.find("Dexter").image_url is None
+    assert meta.find("dexter").image_url == "autre.jpg"
+    assert meta.find("DEXTER").name == "Dexter"
+    assert meta.find(None) is None
@@ -0,0 +1,87 @@
+"""SeriesPages : pagination par curseur, champs, ETag et variantes compressees."""
+
+import gzip
+import json
+
+import pytest
+
+from series_meta import SeriesMeta, SeriesRecord
+from series_pages import MIN_COMPRESS_BYTES, SERIES_FIELDS, SeriesPages, parse_fields
+
+RECORDS = [
+    SeriesRecord(i, f"Serie {i}" if i != 5 else "", f"{i}.jpg", None if i % 3 else f"Synopsis {i}")
+    for i in range(1, 40, 2)
+]
+
+
+def payload(page):
+    return json.loads(page.body)
+
+
+def full_list(records):
+    """Liste complete d'origine : series nommees, ids croissants, synopsis vide plutot que null."""
+    return [
+        {"id": r.id, "name": r.name, "image_url": r.image_url, "synopsis": r.synopsis or ""}
+        for r in sorted(records, key=lambda r: r.id)
+        if r.name
+    ]
+
+
+@pytest.mark.parametrize("limit", [1, 3, 7, 100])
+def test_cursor_pages_cover_the_full_list(limit):
+    pages = SeriesPages(SeriesMeta(RECORDS))
+    seen, cursor = [], None
+    while True:
+        data = payload(pages.page(SERIES_FIELDS, cursor, limit))
+        assert data["count"] == len(data["results"]) <= limit
+        seen.extend(data["results"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+        assert cursor == data["results"][-1]["id"]
+    assert seen == full_list(RECORDS)
+    assert payload(pages.page(SERIES_FIELDS))["results"] == full_list(RECORDS)
+
+
+def test_cursor_between_ids_starts_at_the_next_one():
+    pages = SeriesPages(SeriesMeta(RECORDS))
+    assert payload(pages.page(("id",), 6, 2))["results"] == [{"id": 7}, {"id": 9}]
+    assert payload(pages.page(("id",), 1000, 2)) == {"count": 0, "results": [], "next_cursor": None}
+
+
+def test_fields():
+    assert parse_fields("image_url, id") == ("id", "image_url")
+    assert parse_fields("") == SERIES_FIELDS
+    with pytest.raises(ValueError):
+        parse_fields("id,password")
+    page = SeriesPages(SeriesMeta(RECORDS)).page(parse_fields("id,name"), None, 1)
+    assert payload(page)["results"] == [{"id": 1, "name": "Serie 1"}]
+
+
+def test_etag_follows_content_and_catalog_version():
+    first = SeriesPages(SeriesMeta(RECORDS, catalog_version=1)).page(SERIES_FIELDS)
+    same = SeriesPages(SeriesMeta(RECORDS, catalog_version=1)).page(SERIES_FIELDS)
+    assert same.etag == first.etag
+    renamed = RECORDS[:-1] + [RECORDS[-1]._replace(name="Autre")]
+    assert SeriesPages(SeriesMeta(renamed, catalog_version=1)).page(SERIES_FIELDS).etag != first.etag
+    assert SeriesPages(SeriesMeta(RECORDS, catalog_version=2)).page(SERIES_FIELDS).etag != first.etag
+
+
+def test_compressed_variant_has_its_own_etag():
+    page = SeriesPages(SeriesMeta(RECORDS)).page(SERIES_FIELDS)
+    assert len(page.body) >= MIN_COMPRESS_BYTES
+    data, etag, encoding = page.variant("gzip")
+    assert (gzip.decompress(data), encoding) == (page.body, "gzip")
+    assert etag != page.etag
+    assert page.variant(None) == (page.body, page.etag, None)
+    small = SeriesPages(SeriesMeta(RECORDS)).page(("id",), None, 1)
+    assert small.variant("gzip") == (small.body, small.etag, None)
+
+
+def test_pages_are_cached():
+    pages = SeriesPages(SeriesMeta(RECORDS), max_entries=2)
+    first = pages.page(SERIES_FIELDS, None, 2)
+    assert pages.page(SERIES_FIELDS, None, 2) is first
+    pages.page(SERIES_FIELDS, None, 3)
+    pages.page(SERIES_FIELDS, None, 4)
+    assert pages.page(SERIES_FIELDS, None, 2) is not first
@@ -0,0 +1,109 @@
+"""subtitle_pipeline.py : memes fichiers et memes comptes que la chaine par lots."""
+
+import shutil
+import sqlite3
+import zipfile
+
+import pytest
+
+from catalog import catalog_version
+from count_words_series import count_words_in_series, list_subtitle_files
+from subtitle_pipeline import count_series, run_pipeline
+
+
+def _srt(text):
+    return f"1\n00:00:01,000 --> 00:00:02,000\n{text}\n".encode("utf-8")
+
+
+def _make_series(root):
+    series_dir = root / "Lost"
+    (series_dir / "extra").mkdir(parents=True)
+    (series_dir / "e01.srt").write_bytes(_srt("Un avion tombe sur une île."))
+    (series_dir / "E02.SRT").write_bytes(_srt("L'île cache un mystère."))
+    (series_dir / "notes.txt").write_text("pas un sous-titre")
+    (series_dir / "extra" / "bonus.srt").write_bytes(_srt("Bonus hors du dossier de la série."))
+    with zipfile.ZipFile(series_dir / "saison2.zip", "w") as archive:
+        archive.writestr("e03.srt", _srt("Le mystère de l'avion."))
+    return series_dir
+
+
+def test_streaming_and_batch_paths_read_the_same_files(tmp_path):
+    series_dir = _make_series(tmp_path)
+    assert [path.name for path in list_subtitle_files(series_dir)] == ["E02.SRT", "e01.srt", "saison2.zip"]
+
+    counter, entries, n_subtitles, _ = count_series(tmp_path, "Lost")
+    assert [entry[0] for entry in entries] == ["Lost/E02.SRT", "Lost/e01.srt", "Lost/saison2.zip"]
+    assert n_subtitles == 3
+    assert counter == count_words_in_series(series_dir)
+    assert "bonus" not in counter
+
+
+def _terms(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return sorted(conn.execute(
+            """
+            SELECT tvshow.name, term.text, tvshow_term.count FROM tvshow_term
+            JOIN tvshow ON tvshow.id = tvshow_term.tvshow_id
+            JOIN term ON term.id = tvshow_term.term_id
+            """
+        ))
+    finally:
+        conn.close()
+
+
+def _manifest_series(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {row[0] for row in conn.execute("SELECT series FROM etl_manifest")}
+    finally:
+        conn.close()
+
+
+def _catalog_version(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return catalog_version(conn)
+    finally:
+        conn.close()
+
+
+def test_incremental_run_matches_full_rerun(tmp_path, db_path):
+    data_dir = tmp_path / "sous-titres"
+    series_dir = _make_series(data_dir)
+    (data_dir / "Dexter").mkdir()
+    (data_dir / "Dexter" / "e01.srt").write_bytes(_srt("Le policier cache un meurtre."))
+    run_pipeline(data_dir, db_path)
+
+    # Un fichier modifie, un supprime, un ajoute.
+    (series_dir / "e01.srt").write_bytes(_srt("Un avion tombe encore sur une île déserte."))
+    (series_dir / "E02.SRT").unlink()
+    (data_dir / "Dexter" / "e02.srt").write_bytes(_srt("Un second meurtre au laboratoire."))
+    run_pipeline(data_dir, db_path, incremental=True)
+
+    full_db = tmp_path / "full.db"
+    shutil.copy(db_path, full_db)
+    conn = sqlite3.connect(full_db)
+    with conn:
+        conn.execute("DELETE FROM tvshow_term")
+        conn.execute("DELETE FROM etl_manifest")
+    conn.close()
+    run_pipeline(data_dir, full_db)
+    assert _terms(db_path) == _terms(full_db)
+    assert ("Dexter", "laboratoire", 1.0) in _terms(db_path)
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_emptied_series_is_removed_and_catalog_bumped(tmp_path, db_path, incremental):
+    data_dir = tmp_path / "sous-titres"
+    series_dir = _make_series(data_dir)
+    run_pipeline(data_dir, db_path)
+    version = _catalog_version(db_path)
+    assert _terms(db_path) and _manifest_series(db_path) == {"Lost"}
+
+    for path in list_subtitle_files(series_dir):
+        path.unlink()
+    run_pipeline(data_dir, db_path, incremental=incremental)
+    assert _terms(db_path) == []
+    assert _manifest_series(db_path) == set()
+    assert _catalog_version(db_path) == version + 1
@@ -0,0 +1,106 @@
+"""
+Rappel du tokenizer commun (tokenizer.py) : une requete sans accents, avec une
+elision ou une apostrophe typographique retrouve les series indexees depuis
+les sous-titres, ce que les anciens decoupages (copies ci-dessous) ratent.
+L'index est construit comme en production : count_words_series puis le filtre
+de clean_word_frequency (stopwords, mots de <= 2 lettres).
+"""
+
+import re
+import unicodedata
+
+import pytest
+
+from clean_word_frequency import is_index_token
+from count_words_series import count_words_in_bytes
+from import_series_terms import aggregate_terms
+from tokenizer import term_tokens, tokenize
+
+SUBTITLE = (
+    "1\n00:00:01,000 --> 00:00:03,000\n"
+    "Aujourd’hui, la série commence à l'hôpital.\n\n"
+    "2\n00:00:04,000 --> 00:00:06,000\n"
+    "C'est peut-être l'enquête de l'été.\n"
+)
+
+# (requete, mots gardes pour l'index) : chaque requete ratait avec l'ancien decoupage.
+QUERIES = [
+    ("aujourd’hui", ["aujourd", "hui"]),
+    ("hôpital", ["hopital"]),
+    ("hopital", ["hopital"]),
+    ("l’enquête", ["enquete"]),
+    ("enquete", ["enquete"]),
+]
+
+
+def _legacy_normalize(text):
+    normalized = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in normalized if unicodedata.category(ch) != "Mn").lower()
+
+
+def _legacy_index_tokens(text):
+    """Ancien count_words_series : \\w+(?:['-]\\w+)*, apostrophes typographiques remplacees."""
+    text = text.replace("’", "'").lower()
+    return {_legacy_normalize(t) for t in re.findall(r"\w+(?:['-]\w+)*", text)}
+
+
+def _legacy_query_tokens(query):
+    """Ancien SearchEngine._query_to_counts."""
+    return [_legacy_normalize(t) for t in re.findall(r"[^\W\d_]+(?:'[^\W\d_]+)*", query)]
+
+
+def _clean_counts(data, suffix=".srt"):
+    """Mots d'un sous-titre tels qu'ils arrivent dans tvshow_term (apres nettoyage)."""
+    return {word: count for word, count in count_words_in_bytes(data, suffix).items() if is_index_token(word)}
+
+
+def _indexed_words():
+    return set(_clean_counts(SUBTITLE.encode("cp1252")))
+
+
+def _query_tokens(query):
+    return [token for token in tokenize(query) if is_index_token(token)]
+
+
+@pytest.mark.parametrize("query,expected", QUERIES)
+def test_query_tokens_match_subtitle_index(query, expected):
+    tokens = _query_tokens(query)
+    assert tokens == expected
+    assert set(tokens) <= _indexed_words()
+    # Avant le tokenizer commun, au moins un mot de la requete manquait a l'index.
+    assert not set(_legacy_query_tokens(query)) <= _legacy_index_tokens(SUBTITLE)
+
+
+def test_subtitle_encodings_give_the_same_words():
+    assert set(_clean_counts(SUBTITLE.encode("utf-8"))) == _indexed_words()
+    assert not {"1", "00", "000", "l", "c", "est"} & _indexed_words()
+
+
+def test_stopword_only_query_keeps_no_token():
+    # "peut" et "etre" sont des stopwords : absents de l'index comme de la requete.
+    assert tokenize("peut-être") == ["peut", "etre"]
+    assert _query_tokens("peut-être") == []
+
+
+def test_stored_terms_match_unaccented_query():
+    # Termes bruts d'un fichier 'mot:compte' (ou de l'ancienne colonne tvshow_term.term).
+    counts = aggregate_terms([("Série", 2.0), ("aujourd'hui", 1.0), ("série", 1.0)])
+    assert counts == {"serie": 3.0, "aujourd": 1.0, "hui": 1.0}
+    assert set(tokenize("serie aujourd’hui")) <= set(counts)
+    assert term_tokens("Aujourd'hui") == tuple(tokenize("aujourd'hui"))
+
+
+@pytest.mark.parametrize("query", [query for query, _ in QUERIES])
+def test_rank_query_finds_accented_and_elided_queries(query):
+    pytest.importorskip("sklearn")
+    from search import SearchEngine
+
+    engine = SearchEngine({
+        "Urgences": _clean_counts(SUBTITLE.encode("cp1252")),
+        "Autre": _clean_counts("1\n00:00:01,000 --> 00:00:02,000\nUn dragon vole à l'aéroport.\n".encode("utf-8")),
+    })
+    query_counts = SearchEngine._query_to_counts(query)
+    assert list(query_counts) == dict(QUERIES)[query]
+    ranked = engine.rank_query(query_counts)
+    assert [name for name, _ in ranked] == ["Urgences"]
+    assert engine.search(query, top_n=1)[0][0] == "Urgences"
@@ -0,0 +1,53 @@
+"""
+tokenizer.py
+Role : decoupage et normalisation des mots, communs a l'ETL des sous-titres,
+au moteur de recherche et aux recommandations, pour qu'un meme mot tombe
+toujours dans la meme case du vocabulaire, a l'indexation comme a la requete.
+
+Regles :
+- un mot = une suite de lettres (ni chiffres, ni "_") ;
+- apostrophes et traits d'union separent les mots ("l'homme" -> "l", "homme",
+  "peut-être" -> "peut", "etre"), ce qui aligne les formes elidees du francais ;
+- minuscules, accents retires (NFD puis suppression des diacritiques).
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Iterator, List, Tuple
+
+# Expression d'un mot, reutilisable dans d'autres motifs (count_words_series).
+WORD_PATTERN = r"[^\W\d_]+"
+WORD_RE = re.compile(WORD_PATTERN)
+
+NORMALIZE_CACHE_SIZE = 262_144
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize(word: str) -> str:
+    """Forme canonique d'un mot : minuscules, sans accents. Memoisee (vocabulaire borne)."""
+    decomposed = unicodedata.normalize("NFD", word.lower())
+    if decomposed.isascii():
+        return decomposed
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def iter_tokens(text: str) -> Iterator[str]:
+    """Mots normalises d'un texte, au fil de l'eau."""
+    return map(normalize, WORD_RE.findall(text or ""))
+
+
+def tokenize(text: str) -> List[str]:
+    """Mots normalises d'un texte (requete, synopsis...)."""
+    return list(iter_tokens(text))
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def term_tokens(term: str) -> Tuple[str, ...]:
+    """
+    Mots normalises d'un terme brut (fichiers 'mot:compte', ancienne colonne
+    tvshow_term.term). "aujourd'hui" donne ("aujourd", "hui"), comme a la requete.
+    """
+    return tuple(iter_tokens(term))